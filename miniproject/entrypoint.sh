@@ -42,9 +42,19 @@ case "$1" in
         # Start server
         python manage.py runserver 0.0.0.0:8000
         ;;
+    "stream")
+        uvicorn miniproject.asgi:application --host 0.0.0.0 --port 8001
+        ;;
     "celery")
         celery -A miniproject worker --loglevel=info
         ;;
+    "matching")
+        # One single-process worker per shard keeps matching sequential per product
+        celery -A miniproject worker --loglevel=info \
+            -Q "matching.${MATCHING_SHARD:-0}" \
+            -n "matching${MATCHING_SHARD:-0}@%h" \
+            --concurrency=1 --prefetch-multiplier=1
+        ;;
     "celery-beat")
         celery -A miniproject beat --loglevel=info
         ;;
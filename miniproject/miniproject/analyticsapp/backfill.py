@@ -0,0 +1,120 @@
+import uuid
+from datetime import date, timedelta
+
+from celery import chord, group
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from .models import ProductPerformance, SalesMetrics, TradingMetrics
+from .reports import invalidate_reports
+
+# Every rollup upserts whole days, so any chunk can be rerun safely.
+ROLLUPS = {
+    'trading': TradingMetrics,
+    'sales': SalesMetrics,
+    'products': ProductPerformance,
+}
+
+
+def progress_key(backfill_id, field):
+    return f'analytics:backfill:{backfill_id}:{field}'
+
+
+def failure_key(backfill_id, first):
+    # One key per chunk: chunks fail concurrently on different workers, and
+    # a shared list would lose all but the last write.
+    return progress_key(backfill_id, f'failed:{first.isoformat()}')
+
+
+def chunks(start_date, end_date, chunk_days):
+    """``(first, last)`` day pairs covering the range, ``chunk_days`` days each."""
+    first = start_date
+    while first <= end_date:
+        last = min(first + timedelta(days=chunk_days - 1), end_date)
+        yield first, last
+        first = last + timedelta(days=1)
+
+
+def recompute(start_date, end_date, metrics):
+    for name in metrics:
+        ROLLUPS[name].rollup(start_date, end_date)
+    invalidate_reports()
+
+
+def start_backfill(start_date, end_date, metrics, chunk_days=1):
+    """
+    Fan the range out as one Celery task per chunk; a chord callback stamps
+    the run finished. Returns the id to read progress with.
+    """
+    from .tasks import backfill_chunk, finish_backfill
+
+    backfill_id = uuid.uuid4().hex
+    timeout = settings.ANALYTICS_BACKFILL_PROGRESS_TTL
+    cache.set_many({
+        progress_key(backfill_id, 'range'): (start_date.isoformat(), end_date.isoformat()),
+        progress_key(backfill_id, 'metrics'): list(metrics),
+        progress_key(backfill_id, 'total'): (end_date - start_date).days + 1,
+        progress_key(backfill_id, 'chunk_days'): chunk_days,
+        progress_key(backfill_id, 'done'): 0,
+        progress_key(backfill_id, 'started_at'): timezone.now().isoformat(),
+    }, timeout=timeout)
+
+    chord(group(
+        backfill_chunk.s(backfill_id, first.isoformat(), last.isoformat(), list(metrics))
+        for first, last in chunks(start_date, end_date, chunk_days)
+    ))(finish_backfill.s(backfill_id))
+    return backfill_id
+
+
+def run_chunk(backfill_id, first, last, metrics):
+    """
+    Recompute one chunk and record the outcome. Failures are recorded
+    rather than raised, so one bad day does not stop the chord callback.
+    """
+    first, last = date.fromisoformat(first), date.fromisoformat(last)
+    days = (last - first).days + 1
+    try:
+        recompute(first, last, metrics)
+    except Exception as error:
+        cache.set(
+            failure_key(backfill_id, first),
+            {'start': first.isoformat(), 'end': last.isoformat(), 'error': str(error)},
+            timeout=settings.ANALYTICS_BACKFILL_PROGRESS_TTL
+        )
+        return {'days': days, 'failed': True}
+    try:
+        cache.incr(progress_key(backfill_id, 'done'), days)
+    except ValueError:
+        pass
+    return {'days': days, 'failed': False}
+
+
+def finish(backfill_id):
+    cache.set(
+        progress_key(backfill_id, 'finished_at'),
+        timezone.now().isoformat(),
+        timeout=settings.ANALYTICS_BACKFILL_PROGRESS_TTL
+    )
+
+
+def get_progress(backfill_id):
+    """Progress of a run, or None once it has expired or if it never existed."""
+    fields = ['range', 'metrics', 'total', 'chunk_days', 'done', 'started_at', 'finished_at']
+    values = cache.get_many([progress_key(backfill_id, field) for field in fields])
+    progress = {field: values.get(progress_key(backfill_id, field)) for field in fields}
+    if progress['total'] is None:
+        return None
+    progress['id'] = backfill_id
+    start_date, end_date = (date.fromisoformat(day) for day in progress['range'])
+    keys = [
+        failure_key(backfill_id, first)
+        for first, _ in chunks(start_date, end_date, progress['chunk_days'])
+    ]
+    failures = cache.get_many(keys)
+    progress['failed'] = [failures[key] for key in keys if key in failures]
+    progress['failed_days'] = sum(
+        (date.fromisoformat(chunk['end']) - date.fromisoformat(chunk['start'])).days + 1
+        for chunk in progress['failed']
+    )
+    return progress
@@ -0,0 +1,18 @@
+import csv
+import io
+from itertools import islice
+
+
+def csv_chunks(header, rows, batch_size):
+    """The header row, then one encoded CSV chunk per ``batch_size`` rows."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(header)
+    yield buffer.getvalue().encode()
+
+    rows = iter(rows)
+    while batch := list(islice(rows, batch_size)):
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows(batch)
+        yield buffer.getvalue().encode()
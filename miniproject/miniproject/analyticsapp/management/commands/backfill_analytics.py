@@ -0,0 +1,89 @@
+import time
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from analyticsapp.backfill import (ROLLUPS, chunks, get_progress, recompute,
+                                   start_backfill)
+
+
+class Command(BaseCommand):
+    help = (
+        'Recompute TradingMetrics, SalesMetrics and ProductPerformance for a '
+        'past date range, fanned out over Celery workers in day-sized chunks '
+        '(or inline with --sync). Rerunning a range is safe: every day is upserted.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', type=date.fromisoformat, help='First day (YYYY-MM-DD).')
+        parser.add_argument('--end', type=date.fromisoformat, help='Last day, inclusive.')
+        parser.add_argument(
+            '--metrics', nargs='+', choices=list(ROLLUPS), default=list(ROLLUPS),
+            help='Which metrics to rebuild (default: all).'
+        )
+        parser.add_argument('--chunk-days', type=int, default=1)
+        parser.add_argument(
+            '--sync', action='store_true',
+            help='Recompute in this process, chunk by chunk, instead of on workers.'
+        )
+        parser.add_argument(
+            '--wait', action='store_true',
+            help='Follow the progress of the queued run until it finishes.'
+        )
+        parser.add_argument('--status', metavar='ID', help='Show the progress of a queued run.')
+
+    def handle(self, *args, **options):
+        if options['status']:
+            self._report(options['status'])
+            return
+
+        start, end = options['start'], options['end']
+        if start is None or end is None:
+            raise CommandError('--start and --end are required.')
+        if end < start:
+            raise CommandError('--end is before --start.')
+        if options['chunk_days'] < 1:
+            raise CommandError('--chunk-days must be at least 1.')
+
+        if options['sync']:
+            self._run_inline(start, end, options)
+            return
+
+        backfill_id = start_backfill(start, end, options['metrics'], options['chunk_days'])
+        self.stdout.write(self.style.SUCCESS(f'Queued backfill {backfill_id}'))
+        if options['wait']:
+            while not self._report(backfill_id):
+                time.sleep(2)
+
+    def _run_inline(self, start, end, options):
+        total = (end - start).days + 1
+        done = 0
+        started = time.perf_counter()
+        for first, last in chunks(start, end, options['chunk_days']):
+            recompute(first, last, options['metrics'])
+            done += (last - first).days + 1
+            self.stdout.write(f'{last.isoformat()}  {done}/{total} days')
+        self.stdout.write(self.style.SUCCESS(
+            f'Recomputed {total} days in {time.perf_counter() - started:.1f}s'
+        ))
+
+    def _report(self, backfill_id):
+        """Print one progress line; returns True once the run has finished."""
+        progress = get_progress(backfill_id)
+        if progress is None:
+            raise CommandError(f'No progress recorded for backfill {backfill_id}.')
+        first, last = progress['range']
+        line = (
+            f'{first}..{last} {",".join(progress["metrics"])}: '
+            f'{progress["done"]}/{progress["total"]} days done, '
+            f'{progress["failed_days"]} failed'
+        )
+        if progress['finished_at']:
+            self.stdout.write(self.style.SUCCESS(f'{line} (finished {progress["finished_at"]})'))
+            for chunk in progress['failed']:
+                self.stdout.write(self.style.ERROR(
+                    f'  {chunk["start"]}..{chunk["end"]}: {chunk["error"]}'
+                ))
+            return True
+        self.stdout.write(line)
+        return False
@@ -0,0 +1,158 @@
+import random
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.utils import timezone
+from productsapp.models import Category, Product
+from salesapp.models import SalesOrder, SalesOrderItem
+from tradingapp.management.commands.benchmark_matching import QueryCounter
+from tradingapp.models import Order, Transaction
+from usersapp.models import User
+
+from analyticsapp.models import ProductPerformance
+
+FIELDS = ['sales_quantity', 'sales_revenue', 'trading_volume', 'average_trading_price']
+
+
+class Command(BaseCommand):
+    help = (
+        "Compute today's ProductPerformance for a synthetic catalogue with the "
+        'per-product path and with the set-based rollup, and compare time, '
+        'queries and results.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=2000)
+        parser.add_argument(
+            '--active-ratio', type=float, default=0.3,
+            help='Share of products with sales and trades today.'
+        )
+        parser.add_argument('--sales', type=int, default=5000)
+        parser.add_argument('--trades', type=int, default=20000)
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument(
+            '--keep', action='store_true',
+            help='Keep the generated products, users, orders and metrics.'
+        )
+
+    def handle(self, *args, **options):
+        random.seed(options['seed'])
+        category = Category.objects.create(
+            name='Performance benchmark',
+            slug=f'performance-benchmark-{random.getrandbits(32)}'
+        )
+        users = User.objects.bulk_create([
+            User(username=f'{category.slug}-{i}') for i in range(2)
+        ])
+        try:
+            products = self._populate(category, users, options)
+            self._benchmark(products)
+        finally:
+            if not options['keep']:
+                category.delete()
+                User.objects.filter(id__in=[user.id for user in users]).delete()
+
+    def _populate(self, category, users, options):
+        products = Product.objects.bulk_create([
+            Product(
+                name=f'Performance benchmark {i}',
+                slug=f'{category.slug}-{i}',
+                description='',
+                price=Decimal('100.00'),
+                category=category,
+            )
+            for i in range(options['products'])
+        ])
+        active = products[:max(1, int(len(products) * options['active_ratio']))]
+        buyer, seller = users
+
+        sales_orders = SalesOrder.objects.bulk_create([
+            SalesOrder(
+                customer=buyer,
+                status=SalesOrder.COMPLETED,
+                total_amount=Decimal('100.00'),
+                final_amount=Decimal('100.00'),
+            )
+            for _ in range(options['sales'])
+        ])
+        SalesOrderItem.objects.bulk_create([
+            SalesOrderItem(
+                sales_order=sales_order,
+                product=random.choice(active),
+                quantity=random.randint(1, 5),
+                unit_price=Decimal('20.00'),
+                final_price=Decimal('20.00'),
+            )
+            for sales_order in sales_orders
+        ], batch_size=5000)
+
+        orders = []
+        for _ in range(options['trades']):
+            product = random.choice(active)
+            quantity = random.randint(1, 100)
+            price = Decimal(random.randint(9000, 11000)).scaleb(-2)
+            for user, order_type in ((buyer, Order.BUY), (seller, Order.SELL)):
+                orders.append(Order(
+                    user=user,
+                    product=product,
+                    order_type=order_type,
+                    quantity=quantity,
+                    price=price,
+                    status=Order.COMPLETED,
+                    filled_quantity=quantity,
+                    remaining_quantity=0,
+                ))
+        orders = Order.objects.bulk_create(orders, batch_size=5000)
+        Transaction.objects.bulk_create([
+            Transaction(
+                buy_order=buy_order,
+                sell_order=sell_order,
+                buyer=buyer,
+                seller=seller,
+                quantity=buy_order.quantity,
+                price=buy_order.price,
+            )
+            for buy_order, sell_order in zip(orders[::2], orders[1::2])
+        ], batch_size=5000)
+        return products
+
+    def _run(self, compute, products):
+        ProductPerformance.objects.filter(product__in=products).delete()
+        counter = QueryCounter()
+        started = time.perf_counter()
+        with connection.execute_wrapper(counter):
+            compute()
+        elapsed = time.perf_counter() - started
+        rows = {
+            row[0]: row[1:]
+            for row in ProductPerformance.objects.filter(product__in=products)
+            .exclude(sales_quantity=0, trading_volume=0)
+            .values_list('product_id', *FIELDS)
+        }
+        return elapsed, counter.count, rows
+
+    def _benchmark(self, products):
+        today = timezone.localdate()
+
+        def per_product():
+            for product in Product.objects.filter(id__in=[p.id for p in products]):
+                ProductPerformance.calculate_daily_metrics(product, today)
+
+        loop_elapsed, loop_queries, loop_rows = self._run(per_product, products)
+        set_elapsed, set_queries, set_rows = self._run(
+            lambda: ProductPerformance.rollup(today, today), products
+        )
+
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f'{len(products)} products, {len(set_rows)} with activity, on {connection.vendor}'
+        ))
+        self.stdout.write(
+            f'Per product:  {loop_elapsed * 1000:>10.0f} ms {loop_queries:>8} queries'
+        )
+        self.stdout.write(
+            f'Set-based:    {set_elapsed * 1000:>10.0f} ms {set_queries:>8} queries'
+        )
+        self.stdout.write(f'Speedup:      {loop_elapsed / set_elapsed:.1f}x')
+        self.stdout.write(f'Same results: {"yes" if loop_rows == set_rows else "NO"}')
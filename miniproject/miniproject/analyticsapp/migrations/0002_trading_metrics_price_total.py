@@ -0,0 +1,19 @@
+# Generated by Django 5.1.6 on 2026-10-17 17:42
+
+from decimal import Decimal
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analyticsapp', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tradingmetrics',
+            name='price_total',
+            field=models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=20),
+        ),
+    ]
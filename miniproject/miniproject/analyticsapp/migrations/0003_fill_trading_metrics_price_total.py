@@ -0,0 +1,26 @@
+from django.db import migrations, models
+from django.db.models import F
+
+
+def fill_price_total(apps, schema_editor):
+    # Days rolled up before price_total existed got zero, which would skew
+    # the running average record_trades keeps from it. Rebuilt from the
+    # stored average, exact to its rounding.
+    TradingMetrics = apps.get_model('analyticsapp', 'TradingMetrics')
+    TradingMetrics.objects.filter(number_of_trades__gt=0, price_total=0).update(
+        price_total=models.ExpressionWrapper(
+            F('average_price') * F('number_of_trades'),
+            output_field=models.DecimalField(max_digits=20, decimal_places=2)
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analyticsapp', '0002_trading_metrics_price_total'),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_price_total, migrations.RunPython.noop),
+    ]
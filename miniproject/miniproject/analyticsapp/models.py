@@ -1,12 +1,95 @@
+from collections import defaultdict
+from datetime import timedelta
 from decimal import Decimal
 
+from django.conf import settings
 from django.core.validators import MinValueValidator
-from django.db import models
-from django.db.models import Avg, Sum
+from django.db import IntegrityError, models, transaction
+from django.db.models import (Avg, Case, Count, DecimalField, F, Max, Min,
+                              Sum, Value, When)
+from django.db.models.functions import Greatest, Least, TruncDate
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
 from django.utils import timezone
 from productsapp.models import Product
-from salesapp.models import SalesOrder
-from tradingapp.models import Transaction
+from salesapp.models import SalesOrder, SalesOrderItem
+from tradingapp.models import Transaction, TransactionArchive
+from tradingapp.signals import trades_executed
+
+from .periods import day_bounds
+
+
+def _days(start_date, end_date):
+    return [start_date + timedelta(days=offset) for offset in range((end_date - start_date).days + 1)]
+
+
+def _amount(expression):
+    return models.ExpressionWrapper(
+        expression, output_field=DecimalField(max_digits=20, decimal_places=2)
+    )
+
+
+def _trade_totals(start_date, end_date, by_product=False):
+    """
+    Per-day (or per-product-and-day) trade totals over live and archived
+    trades: one GROUP BY on each table, merged here. Averages are left to
+    the caller as ``price_sum / trades`` so the two halves combine exactly.
+    """
+    start, _ = day_bounds(start_date)
+    _, end = day_bounds(end_date)
+    tzinfo = timezone.get_current_timezone()
+    sources = [
+        (Transaction, 'buy_order__product_id'),
+        (TransactionArchive, 'product_id'),
+    ]
+
+    totals = {}
+    for model, product_field in sources:
+        keys = {'day': TruncDate('executed_at', tzinfo=tzinfo)}
+        if by_product:
+            keys['product_key'] = F(product_field)
+        rows = model.objects.filter(
+            executed_at__gte=start,
+            executed_at__lt=end
+        ).values(**keys).annotate(
+            trades=Count('id'),
+            volume=Sum('quantity'),
+            price_sum=Sum('price'),
+            high=Max('price'),
+            low=Min('price')
+        ).order_by()
+        for row in rows:
+            key = (row['product_key'], row['day']) if by_product else row['day']
+            merged = totals.get(key)
+            if merged is None:
+                totals[key] = row
+            else:
+                merged['trades'] += row['trades']
+                merged['volume'] += row['volume']
+                merged['price_sum'] += row['price_sum']
+                merged['high'] = max(merged['high'], row['high'])
+                merged['low'] = min(merged['low'], row['low'])
+    return totals
+
+
+def _average(total, count):
+    return (Decimal(total) / count).quantize(Decimal('0.01'))
+
+
+def _increment(model, date, values, updates):
+    """
+    Add a delta to a day's running totals with a single UPDATE of F()
+    expressions, creating the row with ``values`` when it does not exist.
+    Concurrent writers never lose each other's increments.
+    """
+    if model.objects.filter(date=date).update(**updates):
+        return
+    try:
+        with transaction.atomic():
+            model.objects.create(date=date, **values)
+    except IntegrityError:
+        # Another writer created the day first; add to its row.
+        model.objects.filter(date=date).update(**updates)
 
 
 class TradingMetrics(models.Model):
@@ -24,6 +107,9 @@ class TradingMetrics(models.Model):
         validators=[MinValueValidator(Decimal('0.00'))]
     )
     number_of_trades = models.PositiveIntegerField(default=0)
+    # Running sum of trade prices, so average_price can be kept up to date
+    # one batch of trades at a time.
+    price_total = models.DecimalField(max_digits=20, decimal_places=2, default=Decimal('0.00'))
     highest_price = models.DecimalField(
         max_digits=10, 
         decimal_places=2, 
@@ -47,26 +133,74 @@ class TradingMetrics(models.Model):
     def calculate_daily_metrics(cls, date=None):
         if date is None:
             date = timezone.now().date()
+        cls.rollup(date, date)
+        return cls.objects.get(date=date)
 
-        daily_transactions = Transaction.objects.filter(
-            executed_at__date=date
-        )
+    @classmethod
+    def rollup(cls, start_date, end_date):
+        """
+        Recompute every day in ``[start_date, end_date]`` from live and
+        archived trades with one grouped aggregate per table and one upsert;
+        days without trades are reset to zero. Safe to repeat.
+        """
+        by_day = _trade_totals(start_date, end_date)
 
-        metrics, _ = cls.objects.get_or_create(date=date)
+        metrics = []
+        for day in _days(start_date, end_date):
+            row = by_day.get(day)
+            metrics.append(cls(
+                date=day,
+                total_volume=row['volume'] if row else 0,
+                average_price=_average(row['price_sum'], row['trades']) if row else 0,
+                number_of_trades=row['trades'] if row else 0,
+                price_total=row['price_sum'] if row else 0,
+                highest_price=row['high'] if row else 0,
+                lowest_price=row['low'] if row else 0,
+            ))
+        cls.objects.bulk_create(
+            metrics,
+            update_conflicts=True,
+            unique_fields=['date'],
+            update_fields=[
+                'total_volume', 'average_price', 'number_of_trades',
+                'price_total', 'highest_price', 'lowest_price'
+            ]
+        )
 
-        if daily_transactions.exists():
-            metrics.total_volume = daily_transactions.aggregate(
-                total=Sum('quantity'))['total'] or 0
-            metrics.average_price = daily_transactions.aggregate(
-                avg=Avg('price'))['avg'] or 0
-            metrics.number_of_trades = daily_transactions.count()
-            metrics.highest_price = daily_transactions.aggregate(
-                max=models.Max('price'))['max'] or 0
-            metrics.lowest_price = daily_transactions.aggregate(
-                min=models.Min('price'))['min'] or 0
-            metrics.save()
+    @classmethod
+    def record_trades(cls, trades):
+        """Fold new trades into their days' running totals, one UPDATE per day."""
+        days = defaultdict(list)
+        for trade in trades:
+            days[timezone.localdate(trade.executed_at)].append(trade)
 
-        return metrics
+        for date, day_trades in days.items():
+            count = len(day_trades)
+            volume = sum(trade.quantity for trade in day_trades)
+            price_sum = sum(trade.price for trade in day_trades)
+            high = max(trade.price for trade in day_trades)
+            low = min(trade.price for trade in day_trades)
+            _increment(cls, date, {
+                'total_volume': volume,
+                'average_price': (price_sum / count).quantize(Decimal('0.01')),
+                'number_of_trades': count,
+                'price_total': price_sum,
+                'highest_price': high,
+                'lowest_price': low,
+            }, {
+                'total_volume': F('total_volume') + volume,
+                'number_of_trades': F('number_of_trades') + count,
+                'price_total': F('price_total') + price_sum,
+                # Right-hand sides see the row as it was before the UPDATE.
+                'average_price': _amount(
+                    (F('price_total') + price_sum) / (F('number_of_trades') + count)
+                ),
+                'highest_price': Greatest('highest_price', Value(high)),
+                'lowest_price': Case(
+                    When(number_of_trades=0, then=Value(low)),
+                    default=Least('lowest_price', Value(low))
+                ),
+            })
 
 
 class SalesMetrics(models.Model):
@@ -86,27 +220,75 @@ class SalesMetrics(models.Model):
     def calculate_daily_metrics(cls, date=None):
         if date is None:
             date = timezone.now().date()
+        cls.rollup(date, date)
+        return cls.objects.get(date=date)
 
-        daily_orders = SalesOrder.objects.filter(
-            created_at__date=date,
-            status='completed'
-        )
+    @classmethod
+    def rollup(cls, start_date, end_date):
+        """
+        Recompute every day in ``[start_date, end_date]`` from completed
+        sales orders with one grouped aggregate and one upsert. Safe to
+        repeat.
+        """
+        start, _ = day_bounds(start_date)
+        _, end = day_bounds(end_date)
+        rows = SalesOrder.objects.filter(
+            created_at__gte=start,
+            created_at__lt=end,
+            status=SalesOrder.COMPLETED
+        ).annotate(
+            day=TruncDate('created_at', tzinfo=timezone.get_current_timezone())
+        ).values('day').annotate(
+            orders=Count('id'),
+            revenue=Sum('final_amount'),
+            discount=Sum('discount_amount')
+        ).order_by()
+        by_day = {row['day']: row for row in rows}
 
-        metrics, _ = cls.objects.get_or_create(date=date)
-
-        if daily_orders.exists():
-            metrics.total_revenue = daily_orders.aggregate(
-                total=Sum('final_amount'))['total'] or 0
-            metrics.total_discount = daily_orders.aggregate(
-                total=Sum('discount_amount'))['total'] or 0
-            metrics.number_of_orders = daily_orders.count()
-            metrics.average_order_value = (
-                metrics.total_revenue / metrics.number_of_orders
-                if metrics.number_of_orders > 0 else 0
-            )
-            metrics.save()
+        metrics = []
+        for day in _days(start_date, end_date):
+            row = by_day.get(day)
+            metrics.append(cls(
+                date=day,
+                total_revenue=row['revenue'] if row else 0,
+                total_discount=row['discount'] if row else 0,
+                number_of_orders=row['orders'] if row else 0,
+                average_order_value=_average(row['revenue'], row['orders']) if row else 0,
+            ))
+        cls.objects.bulk_create(
+            metrics,
+            update_conflicts=True,
+            unique_fields=['date'],
+            update_fields=[
+                'total_revenue', 'total_discount', 'number_of_orders', 'average_order_value'
+            ]
+        )
 
-        return metrics
+    @classmethod
+    def record_order(cls, date, orders, revenue, discount):
+        """
+        Add (or, with negative amounts, take back) completed orders to a
+        day's running totals in one UPDATE.
+        """
+        average = (revenue / orders).quantize(Decimal('0.01')) if orders > 0 else 0
+        _increment(cls, date, {
+            'total_revenue': revenue,
+            'total_discount': discount,
+            'number_of_orders': max(orders, 0),
+            'average_order_value': average,
+        }, {
+            'total_revenue': F('total_revenue') + revenue,
+            'total_discount': F('total_discount') + discount,
+            # Clamped: taking back an order the totals never saw (e.g. one
+            # bulk-created) must not break the column's non-negative check.
+            'number_of_orders': Greatest(F('number_of_orders') + orders, Value(0)),
+            'average_order_value': Case(
+                When(number_of_orders__lte=-orders, then=Value(Decimal('0'))),
+                default=_amount(
+                    (F('total_revenue') + revenue) / (F('number_of_orders') + orders)
+                ),
+            ),
+        })
 
 
 class ProductPerformance(models.Model):
@@ -129,14 +311,17 @@ class ProductPerformance(models.Model):
         if date is None:
             date = timezone.now().date()
 
+        start, end = day_bounds(date)
         sales_items = product.sales_items.filter(
-            sales_order__created_at__date=date,
+            sales_order__created_at__gte=start,
+            sales_order__created_at__lt=end,
             sales_order__status='completed'
         )
 
         trades = Transaction.objects.filter(
             buy_order__product=product,
-            executed_at__date=date
+            executed_at__gte=start,
+            executed_at__lt=end
         )
 
         metrics, _ = cls.objects.get_or_create(
@@ -158,3 +343,116 @@ class ProductPerformance(models.Model):
 
         metrics.save()
         return metrics
+
+    @classmethod
+    def rollup(cls, start_date, end_date, batch_size=None):
+        """
+        Set-based calculate_daily_metrics for every product and day in
+        ``[start_date, end_date]``: one GROUP BY over sales items and one
+        over trades (plus one over archived trades), then batched upserts.
+        Rows already stored for the range whose product had no activity are
+        reset to zero; products without activity get no new rows. Safe to
+        repeat.
+        """
+        batch_size = batch_size or settings.ANALYTICS_UPSERT_BATCH_SIZE
+        start, _ = day_bounds(start_date)
+        _, end = day_bounds(end_date)
+        tzinfo = timezone.get_current_timezone()
+
+        sales = SalesOrderItem.objects.filter(
+            sales_order__created_at__gte=start,
+            sales_order__created_at__lt=end,
+            sales_order__status=SalesOrder.COMPLETED
+        ).annotate(
+            day=TruncDate('sales_order__created_at', tzinfo=tzinfo)
+        ).values('product_id', 'day').annotate(
+            quantity=Sum('quantity'),
+            revenue=Sum('final_price')
+        ).order_by()
+
+        rows = {}
+        for row in sales:
+            metrics = rows[row['product_id'], row['day']] = cls(
+                product_id=row['product_id'], date=row['day']
+            )
+            metrics.sales_quantity = row['quantity']
+            metrics.sales_revenue = row['revenue']
+        for key, row in _trade_totals(start_date, end_date, by_product=True).items():
+            metrics = rows.get(key)
+            if metrics is None:
+                metrics = rows[key] = cls(product_id=key[0], date=key[1])
+            metrics.trading_volume = row['volume']
+            metrics.average_trading_price = _average(row['price_sum'], row['trades'])
+
+        stale = cls.objects.filter(
+            date__gte=start_date,
+            date__lte=end_date
+        ).values_list('product_id', 'date').iterator()
+        for key in stale:
+            if key not in rows:
+                rows[key] = cls(product_id=key[0], date=key[1])
+
+        cls.objects.bulk_create(
+            rows.values(),
+            batch_size=batch_size,
+            update_conflicts=True,
+            unique_fields=['product', 'date'],
+            update_fields=[
+                'sales_quantity', 'sales_revenue',
+                'trading_volume', 'average_trading_price'
+            ]
+        )
+        return len(rows)
+
+
+@receiver(trades_executed)
+def record_executed_trades(sender, trades, **kwargs):
+    # After commit: the day's row is shared by every matching shard, so its
+    # lock is not held for the rest of the matching transaction. A callback
+    # that fails only leaves drift for the nightly reconcile.
+    transaction.on_commit(lambda: TradingMetrics.record_trades(trades), robust=True)
+
+
+@receiver(post_save, sender=Transaction)
+def record_saved_trade(sender, instance, created, **kwargs):
+    if created:
+        transaction.on_commit(lambda: TradingMetrics.record_trades([instance]), robust=True)
+
+
+def _sales_contribution(order):
+    if order is None or order.status != SalesOrder.COMPLETED:
+        return None
+    return (timezone.localdate(order.created_at), order.final_amount, order.discount_amount)
+
+
+@receiver(pre_save, sender=SalesOrder)
+def remember_sales_contribution(sender, instance, **kwargs):
+    instance._metrics_contribution = _sales_contribution(
+        SalesOrder.objects.filter(pk=instance.pk).only(
+            'status', 'created_at', 'final_amount', 'discount_amount'
+        ).first() if instance.pk else None
+    )
+
+
+def _record_sales_change(before, after):
+    if before == after:
+        return
+    if before is not None:
+        date, revenue, discount = before
+        SalesMetrics.record_order(date, -1, -revenue, -discount)
+    if after is not None:
+        date, revenue, discount = after
+        SalesMetrics.record_order(date, 1, revenue, discount)
+
+
+@receiver(post_save, sender=SalesOrder)
+def record_sales_order(sender, instance, **kwargs):
+    before = getattr(instance, '_metrics_contribution', None)
+    after = _sales_contribution(instance)
+    transaction.on_commit(lambda: _record_sales_change(before, after), robust=True)
+
+
+@receiver(post_delete, sender=SalesOrder)
+def remove_sales_order(sender, instance, **kwargs):
+    before = _sales_contribution(instance)
+    transaction.on_commit(lambda: _record_sales_change(before, None), robust=True)
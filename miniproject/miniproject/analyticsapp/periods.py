@@ -0,0 +1,27 @@
+from datetime import datetime, time, timedelta
+
+from django.utils import timezone
+
+
+def day_bounds(day):
+    """
+    Half-open ``[start, end)`` datetimes covering ``day`` in the current
+    timezone. Filtering on ``__gte``/``__lt`` keeps the column bare, so the
+    timestamp indexes can be used where ``__date`` would wrap it in a cast.
+    """
+    start = timezone.make_aware(datetime.combine(day, time.min))
+    end = timezone.make_aware(datetime.combine(day + timedelta(days=1), time.min))
+    return start, end
+
+
+def week_bounds(day):
+    """First and last day (Monday to Sunday) of the week containing ``day``."""
+    first = day - timedelta(days=day.weekday())
+    return first, first + timedelta(days=6)
+
+
+def month_bounds(day):
+    """First and last day of the month containing ``day``."""
+    first = day.replace(day=1)
+    following = (first + timedelta(days=32)).replace(day=1)
+    return first, following - timedelta(days=1)
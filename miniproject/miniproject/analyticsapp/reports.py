@@ -0,0 +1,157 @@
+import json
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Max, Min, Q, Sum
+from django.utils import timezone
+
+from .models import SalesMetrics, TradingMetrics
+from .periods import month_bounds, week_bounds
+
+# Bump when the payload layout changes; readers then miss the old entries
+# instead of misreading them.
+REPORT_VERSION = 2
+
+PERIODS = {
+    'weekly': week_bounds,
+    'monthly': month_bounds,
+}
+
+# Bumped whenever past days are recomputed, so no cached report outlives
+# the rollups it was built from.
+GENERATION_KEY = 'analytics:report:generation'
+
+CENTS = Decimal('0.01')
+
+
+def _generation():
+    generation = cache.get(GENERATION_KEY)
+    if generation is None:
+        cache.add(GENERATION_KEY, 1, timeout=None)
+        generation = cache.get(GENERATION_KEY, 1)
+    return generation
+
+
+def invalidate_reports():
+    """Orphan every cached report; the next read rebuilds it."""
+    try:
+        cache.incr(GENERATION_KEY)
+    except ValueError:
+        cache.add(GENERATION_KEY, 1, timeout=None)
+
+
+def report_key(period, first_day):
+    return f'analytics:report:v{REPORT_VERSION}:{_generation()}:{period}:{first_day.isoformat()}'
+
+
+def _money(value):
+    return Decimal(value or 0).quantize(CENTS)
+
+
+def _ratio(total, count):
+    return (Decimal(total) / count).quantize(CENTS) if count else Decimal('0.00')
+
+
+def summarize(first_day, last_day):
+    """
+    Totals and averages over the daily rollups in ``[first_day, last_day]``:
+    one aggregate over TradingMetrics and one over SalesMetrics.
+    """
+    days = (last_day - first_day).days + 1
+    trading = TradingMetrics.objects.filter(date__range=[first_day, last_day]).aggregate(
+        volume=Sum('total_volume'),
+        trades=Sum('number_of_trades'),
+        price_sum=Sum('price_total'),
+        high=Max('highest_price'),
+        # Days without trades store a lowest price of zero.
+        low=Min('lowest_price', filter=Q(number_of_trades__gt=0)),
+    )
+    sales = SalesMetrics.objects.filter(date__range=[first_day, last_day]).aggregate(
+        revenue=Sum('total_revenue'),
+        discount=Sum('total_discount'),
+        orders=Sum('number_of_orders'),
+    )
+    volume = _money(trading['volume'])
+    trades = trading['trades'] or 0
+    revenue = _money(sales['revenue'])
+    orders = sales['orders'] or 0
+    return {
+        'trading': {
+            'total_volume': volume,
+            'number_of_trades': trades,
+            'average_price': _ratio(trading['price_sum'] or 0, trades),
+            'highest_price': _money(trading['high']),
+            'lowest_price': _money(trading['low']),
+            'average_daily_volume': _ratio(volume, days),
+        },
+        'sales': {
+            'total_revenue': revenue,
+            'total_discount': _money(sales['discount']),
+            'number_of_orders': orders,
+            'average_order_value': _ratio(revenue, orders),
+            'average_daily_revenue': _ratio(revenue, days),
+        },
+    }
+
+
+def _deltas(current, previous):
+    """Change against the previous period per figure; percent is None from zero."""
+    deltas = {}
+    for section, figures in current.items():
+        deltas[section] = {}
+        for name, value in figures.items():
+            before = previous[section][name]
+            change = value - before
+            deltas[section][name] = {
+                'change': change,
+                'percent': (Decimal(change) * 100 / before).quantize(CENTS) if before else None,
+            }
+    return deltas
+
+
+def build_report(period, day):
+    """The report for the ``period`` containing ``day``, compared with the one before it."""
+    bounds = PERIODS[period]
+    first_day, last_day = bounds(day)
+    previous_first, previous_last = bounds(first_day - timedelta(days=1))
+    current = summarize(first_day, last_day)
+    previous = summarize(previous_first, previous_last)
+    return {
+        'version': REPORT_VERSION,
+        'period': period,
+        'start_date': first_day,
+        'end_date': last_day,
+        'complete': last_day < timezone.localdate(),
+        'generated_at': timezone.now(),
+        'previous_start_date': previous_first,
+        'summary': current,
+        'previous': previous,
+        'deltas': _deltas(current, previous),
+    }
+
+
+def materialize(period, day):
+    """Build the report and cache it as compact JSON; returns the JSON string."""
+    report = build_report(period, day)
+    # ISO 8601 dates and times, decimals as strings, as DRF renders them.
+    payload = json.dumps(report, cls=DjangoJSONEncoder, separators=(',', ':'))
+    # A closed period rarely changes (backfills bump the generation anyway);
+    # the running one keeps picking up new trades and sales.
+    timeout = (
+        settings.ANALYTICS_REPORT_TTL if report['complete']
+        else settings.ANALYTICS_REPORT_CURRENT_TTL
+    )
+    cache.set(report_key(period, report['start_date']), payload, timeout=timeout)
+    return payload
+
+
+def get_report(period, day):
+    """Cached JSON payload for the ``period`` containing ``day``, built on a miss."""
+    first_day, _ = PERIODS[period](day)
+    payload = cache.get(report_key(period, first_day))
+    if payload is None:
+        payload = materialize(period, day)
+    return payload
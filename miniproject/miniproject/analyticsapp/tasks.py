@@ -4,38 +4,50 @@ from celery import shared_task
 from django.utils import timezone
 from productsapp.models import Product
 
+from .backfill import finish, run_chunk
 from .models import ProductPerformance, SalesMetrics, TradingMetrics
+from .reports import materialize
 
 
 @shared_task
 def calculate_daily_metrics():
     date = timezone.now().date()
 
-    TradingMetrics.calculate_daily_metrics(date)
-    SalesMetrics.calculate_daily_metrics(date)
-
-    for product in Product.objects.all():
-        ProductPerformance.calculate_daily_metrics(product, date)
+    # Trades and completed sales orders keep the day totals current as they
+    # happen; this only reconciles the day that just closed and today.
+    TradingMetrics.rollup(date - timedelta(days=1), date)
+    SalesMetrics.rollup(date - timedelta(days=1), date)
+    ProductPerformance.rollup(date - timedelta(days=1), date)
 
 
 @shared_task
 def generate_weekly_report():
-    end_date = timezone.now().date()
-    start_date = end_date - timedelta(days=7)
-    trading_metrics = TradingMetrics.objects.filter(
-        date__range=[start_date, end_date]
-    )
-    sales_metrics = SalesMetrics.objects.filter(
-        date__range=[start_date, end_date]
-    )
+    today = timezone.localdate()
+    # The week that just closed, then the new one so first reads are warm.
+    materialize('weekly', today - timedelta(days=7))
+    materialize('weekly', today)
+
 
-    from django.core.cache import cache
-    cache.set('weekly_trading_metrics', trading_metrics, timeout=3600)
-    cache.set('weekly_sales_metrics', sales_metrics, timeout=3600)
+@shared_task
+def generate_monthly_report():
+    today = timezone.localdate()
+    materialize('monthly', today.replace(day=1) - timedelta(days=1))
+    materialize('monthly', today)
 
 
 @shared_task
 def update_product_metrics(product_id):
     product = Product.objects.get(id=product_id)
     date = timezone.now().date()
-    ProductPerformance.calculate_daily_metrics(product, date)
\ No newline at end of file
+    ProductPerformance.calculate_daily_metrics(product, date)
+
+
+@shared_task
+def backfill_chunk(backfill_id, start_date, end_date, metrics):
+    # Results are kept: the chord callback waits on them.
+    return run_chunk(backfill_id, start_date, end_date, metrics)
+
+
+@shared_task(ignore_result=True)
+def finish_backfill(results, backfill_id):
+    finish(backfill_id)
@@ -1,3 +1,291 @@
-from django.test import TestCase
+from datetime import date, datetime, time
+import gzip
+import json
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from miniproject.celery import app as celery_app
+from productsapp.models import Category, Product
+from rest_framework.test import APIClient
+from salesapp.models import SalesOrder, SalesOrderItem
+from tradingapp.models import Order, Transaction
+from usersapp.models import User
+
+from . import backfill
+from .exports import csv_chunks
+from .models import ProductPerformance, SalesMetrics, TradingMetrics
+from .periods import month_bounds, week_bounds
+from .reports import get_report
+
+DAY = date(2024, 3, 6)
+
+
+def at(day, hour=12):
+    return timezone.make_aware(datetime.combine(day, time(hour)))
+
+
+@override_settings(
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+    TRADING_STREAMING_ENABLED=False,
+    TRADING_NOTIFICATIONS_ASYNC=False,
+)
+class AnalyticsTestCase(TestCase):
+    """Trades and sales on fixed past days, with the cache in memory."""
+
+    def setUp(self):
+        cache.clear()
+        category = Category.objects.create(name='Test', slug='test')
+        self.product = Product.objects.create(
+            name='Widget', slug='widget', description='',
+            price=Decimal('10.00'), category=category
+        )
+        self.alice = User.objects.create_user('alice', password='secret')
+        self.bob = User.objects.create_user('bob', password='secret')
+
+    def trade(self, quantity, price, executed_at, product=None):
+        """A committed trade between Bob and Alice at ``executed_at``."""
+        product = product or self.product
+        orders = [
+            Order.objects.create(
+                user=user, product=product, order_type=order_type,
+                quantity=quantity, price=Decimal(price), status=Order.COMPLETED
+            )
+            for user, order_type in ((self.alice, Order.BUY), (self.bob, Order.SELL))
+        ]
+        trade = Transaction.objects.create(
+            buy_order=orders[0], sell_order=orders[1], quantity=quantity, price=Decimal(price)
+        )
+        # executed_at is auto_now_add; move the trade to the day under test.
+        Transaction.objects.filter(id=trade.id).update(executed_at=executed_at)
+        trade.executed_at = executed_at
+        return trade
+
+    def sale(self, final_amount, discount='0.00', status=SalesOrder.COMPLETED, day=None):
+        """A sales order placed now, or moved to ``day`` behind the signals' back."""
+        order = SalesOrder.objects.create(
+            customer=self.alice, status=status,
+            total_amount=Decimal(final_amount) + Decimal(discount),
+            discount_amount=Decimal(discount), final_amount=Decimal(final_amount)
+        )
+        if day is not None:
+            SalesOrder.objects.filter(id=order.id).update(created_at=at(day))
+            order.created_at = at(day)
+        return order
+
+
+class TradingMetricsTests(AnalyticsTestCase):
+    def unsaved(self, quantity, price):
+        return Transaction(quantity=quantity, price=Decimal(price), executed_at=at(DAY))
+
+    def test_running_average_spans_batches(self):
+        TradingMetrics.record_trades([self.unsaved(1, '10.00'), self.unsaved(2, '12.00')])
+        TradingMetrics.record_trades([self.unsaved(3, '20.00')])
+
+        metrics = TradingMetrics.objects.get(date=DAY)
+        self.assertEqual(metrics.number_of_trades, 3)
+        self.assertEqual(metrics.total_volume, 6)
+        self.assertEqual(metrics.price_total, Decimal('42.00'))
+        self.assertEqual(metrics.average_price, Decimal('14.00'))
+        self.assertEqual((metrics.highest_price, metrics.lowest_price), (Decimal('20.00'), Decimal('10.00')))
+
+    def test_rollup_overwrites_drifted_days_and_zeroes_quiet_ones(self):
+        self.trade(2, '10.00', at(DAY, 9))
+        self.trade(4, '13.00', at(DAY, 15))
+        next_day = date(2024, 3, 7)
+        TradingMetrics.objects.create(date=next_day, number_of_trades=5, total_volume=9)
+        TradingMetrics.objects.create(date=DAY, number_of_trades=99, average_price=Decimal('1.00'))
+
+        for _ in range(2):
+            TradingMetrics.rollup(DAY, next_day)
+
+        metrics = TradingMetrics.objects.get(date=DAY)
+        self.assertEqual(
+            (metrics.number_of_trades, metrics.total_volume, metrics.average_price, metrics.price_total),
+            (2, 6, Decimal('11.50'), Decimal('23.00'))
+        )
+        quiet = TradingMetrics.objects.get(date=next_day)
+        self.assertEqual((quiet.number_of_trades, quiet.total_volume), (0, 0))
+
+
+class SalesMetricsTests(AnalyticsTestCase):
+    def test_completed_orders_are_added_and_taken_back(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            first = self.sale('30.00', discount='5.00')
+        with self.captureOnCommitCallbacks(execute=True):
+            second = self.sale('10.00', status=SalesOrder.PENDING)
+        with self.captureOnCommitCallbacks(execute=True):
+            second.status = SalesOrder.COMPLETED
+            second.save()
+
+        metrics = SalesMetrics.objects.get(date=timezone.localdate())
+        self.assertEqual(
+            (metrics.number_of_orders, metrics.total_revenue, metrics.total_discount, metrics.average_order_value),
+            (2, Decimal('40.00'), Decimal('5.00'), Decimal('20.00'))
+        )
+
+        with self.captureOnCommitCallbacks(execute=True):
+            first.status = SalesOrder.CANCELLED
+            first.save()
+        metrics.refresh_from_db()
+        self.assertEqual(
+            (metrics.number_of_orders, metrics.total_revenue, metrics.average_order_value),
+            (1, Decimal('10.00'), Decimal('10.00'))
+        )
+
+
+class ProductPerformanceTests(AnalyticsTestCase):
+    def test_rollup_covers_every_product_in_one_pass(self):
+        gadget = Product.objects.create(
+            name='Gadget', slug='gadget', description='',
+            price=Decimal('7.00'), category=self.product.category
+        )
+        idle = Product.objects.create(
+            name='Idle', slug='idle', description='',
+            price=Decimal('1.00'), category=self.product.category
+        )
+        self.trade(2, '10.00', at(DAY, 9))
+        self.trade(4, '13.00', at(DAY, 15))
+        self.trade(1, '7.00', at(DAY), product=gadget)
+        for status, product in ((SalesOrder.COMPLETED, self.product), (SalesOrder.CANCELLED, gadget)):
+            SalesOrderItem.objects.create(
+                sales_order=self.sale('15.00', status=status, day=DAY),
+                product=product, quantity=3, unit_price=Decimal('5.00')
+            )
+        next_day = date(2024, 3, 7)
+        ProductPerformance.objects.create(product=gadget, date=next_day, trading_volume=8)
+
+        ProductPerformance.rollup(DAY, next_day, batch_size=2)
+
+        rows = {
+            (row.product_id, row.date): (
+                row.sales_quantity, row.sales_revenue, row.trading_volume, row.average_trading_price
+            )
+            for row in ProductPerformance.objects.all()
+        }
+        self.assertEqual(rows, {
+            (self.product.id, DAY): (3, Decimal('15.00'), 6, Decimal('11.50')),
+            (gadget.id, DAY): (0, Decimal('0.00'), 1, Decimal('7.00')),
+            (gadget.id, next_day): (0, Decimal('0.00'), 0, Decimal('0.00')),
+        })
+        self.assertFalse(ProductPerformance.objects.filter(product=idle).exists())
+
+
+class BackfillTests(AnalyticsTestCase):
+    def setUp(self):
+        super().setUp()
+        celery_app.conf.task_always_eager = True
+        self.addCleanup(setattr, celery_app.conf, 'task_always_eager', False)
+
+    def test_chunks_cover_the_range(self):
+        self.assertEqual(
+            list(backfill.chunks(date(2024, 3, 1), date(2024, 3, 7), 3)),
+            [
+                (date(2024, 3, 1), date(2024, 3, 3)),
+                (date(2024, 3, 4), date(2024, 3, 6)),
+                (date(2024, 3, 7), date(2024, 3, 7)),
+            ]
+        )
+
+    def test_chunks_run_as_tasks_and_report_progress(self):
+        self.trade(2, '10.00', at(DAY))
+        start, end = date(2024, 3, 4), date(2024, 3, 8)
+        recompute = backfill.recompute
+
+        def fail_some(first, last, metrics):
+            if first.day in (4, 8):
+                raise RuntimeError(f'no data for {first}')
+            recompute(first, last, metrics)
+
+        with mock.patch.object(backfill, 'recompute', fail_some):
+            backfill_id = backfill.start_backfill(start, end, ['trading'], chunk_days=2)
+
+        progress = backfill.get_progress(backfill_id)
+        self.assertEqual((progress['total'], progress['done'], progress['failed_days']), (5, 2, 3))
+        self.assertEqual(
+            [(chunk['start'], chunk['end']) for chunk in progress['failed']],
+            [('2024-03-04', '2024-03-05'), ('2024-03-08', '2024-03-08')]
+        )
+        self.assertIsNotNone(progress['finished_at'])
+        self.assertEqual(TradingMetrics.objects.get(date=DAY).number_of_trades, 1)
+        self.assertFalse(TradingMetrics.objects.filter(date=start).exists())
+
+
+class PeriodTests(TestCase):
+    def test_week_runs_monday_to_sunday(self):
+        self.assertEqual(week_bounds(DAY), (date(2024, 3, 4), date(2024, 3, 10)))
+        self.assertEqual(week_bounds(date(2024, 3, 10)), (date(2024, 3, 4), date(2024, 3, 10)))
+
+    def test_month_ends_on_its_last_day(self):
+        self.assertEqual(month_bounds(date(2024, 2, 29)), (date(2024, 2, 1), date(2024, 2, 29)))
+        self.assertEqual(month_bounds(date(2023, 12, 31)), (date(2023, 12, 1), date(2023, 12, 31)))
+
+
+class ReportTests(AnalyticsTestCase):
+    def test_backfill_invalidates_cached_reports(self):
+        first = self.trade(2, '10.00', at(DAY))
+        self.trade(4, '14.00', at(DAY))
+        # The rollup saw only the first trade when the report was cached.
+        TradingMetrics.record_trades([first])
+        self.assertEqual(
+            json.loads(get_report('weekly', DAY))['summary']['trading']['number_of_trades'], 1
+        )
+
+        backfill.recompute(DAY, DAY, ['trading'])
+
+        report = json.loads(get_report('weekly', DAY))
+        self.assertEqual(report['summary']['trading']['number_of_trades'], 2)
+        self.assertEqual(report['summary']['trading']['average_price'], '12.00')
+
+    def test_endpoint_returns_the_cached_json(self):
+        client = APIClient()
+        client.force_authenticate(self.alice)
+
+        response = client.get('/api/reports/monthly/', {'date': DAY.isoformat()})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/json')
+        report = json.loads(response.content)
+        self.assertEqual((report['start_date'], report['end_date']), ('2024-03-01', '2024-03-31'))
+        self.assertTrue(report['complete'])
+        self.assertIn('T', report['generated_at'])
+        self.assertIsNotNone(parse_datetime(report['generated_at']))
+
+        for value in ('2024-02-30', 'next week'):
+            response = client.get('/api/reports/weekly/', {'date': value})
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(response.data, {'error': 'date must be YYYY-MM-DD'})
+
+
+class CsvExportTests(AnalyticsTestCase):
+    def test_csv_chunks_batch_rows_after_the_header(self):
+        chunks = list(csv_chunks(['a', 'b'], [(1, 'x'), (2, 'y,z'), (3, '')], 2))
+        self.assertEqual(chunks, [b'a,b\r\n', b'1,x\r\n2,"y,z"\r\n', b'3,\r\n'])
+
+    @override_settings(ANALYTICS_EXPORT_CHUNK_SIZE=1)
+    def test_export_streams_plain_and_gzipped(self):
+        for offset, volume in ((0, 6), (1, 3)):
+            ProductPerformance.objects.create(
+                product=self.product, date=date(2024, 3, 6 + offset),
+                sales_quantity=1, sales_revenue=Decimal('5.00'),
+                trading_volume=volume, average_trading_price=Decimal('11.50')
+            )
+        client = APIClient()
+        client.force_authenticate(self.alice)
+        url = '/api/product-performance/export_csv/?start_date=2024-03-01&end_date=2024-03-31'
+
+        response = client.get(url)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename=product_performance.csv')
+        body = b''.join(response.streaming_content)
+        self.assertEqual(body.decode().splitlines(), [
+            'Date,Product,Sales Quantity,Sales Revenue,Trading Volume,Average Trading Price',
+            '2024-03-07,Widget,1,5.00,3,11.50',
+            '2024-03-06,Widget,1,5.00,6,11.50',
+        ])
+
+        response = client.get(url + '&gzip=true')
+        self.assertEqual(response['Content-Type'], 'application/gzip')
+        self.assertEqual(gzip.decompress(b''.join(response.streaming_content)), body)
@@ -1,13 +1,14 @@
 from django.urls import include, path
 from rest_framework.routers import DefaultRouter
 
-from .views import (ProductPerformanceViewSet, SalesMetricsViewSet,
-                    TradingMetricsViewSet)
+from .views import (ProductPerformanceViewSet, ReportViewSet,
+                    SalesMetricsViewSet, TradingMetricsViewSet)
 
 router = DefaultRouter()
 router.register(r'trading-metrics', TradingMetricsViewSet, basename='trading-metrics')
 router.register(r'sales-metrics', SalesMetricsViewSet, basename='sales-metrics')
 router.register(r'product-performance', ProductPerformanceViewSet, basename='product-performance')
+router.register(r'reports', ReportViewSet, basename='reports')
 
 urlpatterns = [
     path('', include(router.urls)),
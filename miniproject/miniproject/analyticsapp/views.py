@@ -1,18 +1,28 @@
-import csv
-import io
 from datetime import datetime, timedelta
 
-from django.http import HttpResponse
-from rest_framework import permissions, viewsets
+from django.conf import settings
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from drf_yasg import openapi
+from drf_yasg.utils import swagger_auto_schema
+from rest_framework import permissions, status, viewsets
 from rest_framework.decorators import action
+from rest_framework.response import Response
+from tradingapp.exports import gzip_stream
 
+from .exports import csv_chunks
 from .models import ProductPerformance, SalesMetrics, TradingMetrics
+from .reports import get_report
 from .serializers import (ProductPerformanceSerializer, SalesMetricsSerializer,
                           TradingMetricsSerializer)
 
 
 class BaseMetricsViewSet(viewsets.ReadOnlyModelViewSet):
     permission_classes = [permissions.IsAuthenticated]
+    # (CSV header, field lookup) pairs and file name for export_csv
+    csv_columns = []
+    csv_filename = None
 
     def get_date_range(self, request):
         start_date = request.query_params.get('start_date')
@@ -27,108 +37,121 @@ class BaseMetricsViewSet(viewsets.ReadOnlyModelViewSet):
             end_date = datetime.now().date()
         return start_date, end_date
 
+    @swagger_auto_schema(manual_parameters=[
+        openapi.Parameter(
+            'gzip',
+            openapi.IN_QUERY,
+            description="Gzip the CSV on the fly (true/false, default false)",
+            type=openapi.TYPE_BOOLEAN
+        ),
+    ])
+    @action(detail=False, methods=['get'])
+    def export_csv(self, request):
+        """
+        Stream the filtered rows as CSV, read through a server-side cursor
+        as plain tuples, so large ranges start at once in constant memory.
+        """
+        headers = [header for header, _ in self.csv_columns]
+        rows = self.get_queryset().values_list(
+            *[field for _, field in self.csv_columns]
+        ).iterator(chunk_size=settings.ANALYTICS_EXPORT_CHUNK_SIZE)
+        chunks = csv_chunks(headers, rows, settings.ANALYTICS_EXPORT_CHUNK_SIZE)
+
+        filename = self.csv_filename
+        if request.query_params.get('gzip', '').lower() in ('1', 'true', 'yes'):
+            response = StreamingHttpResponse(gzip_stream(chunks), content_type='application/gzip')
+            filename += '.gz'
+        else:
+            response = StreamingHttpResponse(chunks, content_type='text/csv')
+        response['Content-Disposition'] = f'attachment; filename={filename}'
+        return response
+
 
 class TradingMetricsViewSet(BaseMetricsViewSet):
     serializer_class = TradingMetricsSerializer
+    csv_columns = [
+        ('Date', 'date'),
+        ('Total Volume', 'total_volume'),
+        ('Average Price', 'average_price'),
+        ('Number of Trades', 'number_of_trades'),
+        ('Highest Price', 'highest_price'),
+        ('Lowest Price', 'lowest_price'),
+    ]
+    csv_filename = 'trading_metrics.csv'
 
     def get_queryset(self):
         start_date, end_date = self.get_date_range(self.request)
         return TradingMetrics.objects.filter(date__range=[start_date, end_date])
 
-    @action(detail=False, methods=['get'])
-    def export_csv(self, request):
-        queryset = self.get_queryset()
-        
-        output = io.StringIO()
-        writer = csv.writer(output)
-        writer.writerow([
-            'Date', 'Total Volume', 'Average Price',
-            'Number of Trades', 'Highest Price', 'Lowest Price'
-        ])
-        
-        for metric in queryset:
-            writer.writerow([
-                metric.date,
-                metric.total_volume,
-                metric.average_price,
-                metric.number_of_trades,
-                metric.highest_price,
-                metric.lowest_price
-            ])
-            
-        response = HttpResponse(output.getvalue(), content_type='text/csv')
-        response['Content-Disposition'] = 'attachment; filename=trading_metrics.csv'
-        return response
 
 class SalesMetricsViewSet(BaseMetricsViewSet):
     serializer_class = SalesMetricsSerializer
-    
+    csv_columns = [
+        ('Date', 'date'),
+        ('Total Revenue', 'total_revenue'),
+        ('Total Discount', 'total_discount'),
+        ('Number of Orders', 'number_of_orders'),
+        ('Average Order Value', 'average_order_value'),
+    ]
+    csv_filename = 'sales_metrics.csv'
+
     def get_queryset(self):
         start_date, end_date = self.get_date_range(self.request)
         return SalesMetrics.objects.filter(date__range=[start_date, end_date])
 
-    @action(detail=False, methods=['get'])
-    def export_csv(self, request):
-        queryset = self.get_queryset()
-        
-        output = io.StringIO()
-        writer = csv.writer(output)
-        writer.writerow([
-            'Date', 'Total Revenue', 'Total Discount',
-            'Number of Orders', 'Average Order Value'
-        ])
-        
-        for metric in queryset:
-            writer.writerow([
-                metric.date,
-                metric.total_revenue,
-                metric.total_discount,
-                metric.number_of_orders,
-                metric.average_order_value
-            ])
-            
-        response = HttpResponse(output.getvalue(), content_type='text/csv')
-        response['Content-Disposition'] = 'attachment; filename=sales_metrics.csv'
-        return response
-
 
 class ProductPerformanceViewSet(BaseMetricsViewSet):
     serializer_class = ProductPerformanceSerializer
-    
+    # The product name comes through the same join, not a query per row.
+    csv_columns = [
+        ('Date', 'date'),
+        ('Product', 'product__name'),
+        ('Sales Quantity', 'sales_quantity'),
+        ('Sales Revenue', 'sales_revenue'),
+        ('Trading Volume', 'trading_volume'),
+        ('Average Trading Price', 'average_trading_price'),
+    ]
+    csv_filename = 'product_performance.csv'
+
     def get_queryset(self):
         start_date, end_date = self.get_date_range(self.request)
         queryset = ProductPerformance.objects.filter(
             date__range=[start_date, end_date]
-        )
-        
+        ).select_related('product')
+
         product_id = self.request.query_params.get('product_id')
         if product_id:
             queryset = queryset.filter(product_id=product_id)
-            
+
         return queryset
 
+
+class ReportViewSet(viewsets.ViewSet):
+    """
+    Materialized weekly and monthly summaries, read from the cache and built
+    on a miss. ``?date=YYYY-MM-DD`` picks the period containing that day.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def _report(self, request, period):
+        value = request.query_params.get('date')
+        try:
+            # None when malformed; ValueError for impossible dates like 02-30.
+            day = parse_date(value) if value else timezone.localdate()
+        except ValueError:
+            day = None
+        if day is None:
+            return Response(
+                {'error': 'date must be YYYY-MM-DD'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        # Already JSON in the cache; sent as-is instead of parsed and re-rendered.
+        return HttpResponse(get_report(period, day), content_type='application/json')
+
     @action(detail=False, methods=['get'])
-    def export_csv(self, request):
-        queryset = self.get_queryset()
-        
-        output = io.StringIO()
-        writer = csv.writer(output)
-        writer.writerow([
-            'Date', 'Product', 'Sales Quantity',
-            'Sales Revenue', 'Trading Volume',
-            'Average Trading Price'
-        ])
-        
-        for metric in queryset:
-            writer.writerow([
-                metric.date,
-                metric.product.name,
-                metric.sales_quantity,
-                metric.sales_revenue,
-                metric.trading_volume,
-                metric.average_trading_price
-            ])
-            
-        response = HttpResponse(output.getvalue(), content_type='text/csv')
-        response['Content-Disposition'] = 'attachment; filename=product_performance.csv'
-        return response
+    def weekly(self, request):
+        return self._report(request, 'weekly')
+
+    @action(detail=False, methods=['get'])
+    def monthly(self, request):
+        return self._report(request, 'monthly')
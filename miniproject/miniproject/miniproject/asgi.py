@@ -2,6 +2,8 @@
 ASGI config for miniproject project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+The ``stream`` service serves it with uvicorn so the server-sent event
+endpoint (``/api/stream/``) can hold long-lived connections.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/3.2/howto/deployment/asgi/
@@ -12,6 +12,7 @@ https://docs.djangoproject.com/en/3.2/ref/settings/
 
 import os
 from datetime import timedelta
+from decimal import Decimal
 from pathlib import Path
 
 from celery.schedules import crontab
@@ -100,6 +101,15 @@ DATABASES = {
     }
 }
 
+# Local runs without Docker (e.g. benchmarks) can use SQLite instead
+if os.environ.get('DB_ENGINE') == 'sqlite':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': BASE_DIR / 'db.sqlite3',
+        }
+    }
+
 # Redis settings
 REDIS_URL = os.environ.get('REDIS_URL', 'redis://redis:6379/0')
 
@@ -112,6 +122,101 @@ CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = TIME_ZONE
 
+# Orders are matched by one single-process worker per shard, consuming the
+# ``matching.<shard>`` queue; a product always maps to the same shard.
+TRADING_MATCHING_SHARDS = int(os.environ.get('TRADING_MATCHING_SHARDS', '2'))
+
+# Matching and cancel tasks are acknowledged once they finish, so an order
+# whose worker died is redelivered; a failed one is retried with exponential
+# backoff up to TRADING_MATCHING_MAX_RETRIES times, queued behind the orders
+# sent meanwhile.
+TRADING_MATCHING_MAX_RETRIES = 5
+
+# Number of aggregated price levels per side kept in the cached book snapshot
+TRADING_ORDER_BOOK_DEPTH = 50
+
+# Seconds a cached book snapshot is served. The engine rewrites it whenever
+# the visible levels change; the expiry bounds how long anything it did not
+# rewrite for (or a snapshot filled from the database) can lag behind.
+TRADING_ORDER_BOOK_SNAPSHOT_TTL = 60
+
+# What the matching engine does when an order would trade with a resting
+# order of the same user: 'cancel_newest' cancels the incoming order's
+# remainder, 'cancel_oldest' cancels the resting order and keeps matching,
+# 'decrement' shrinks both by the smaller remainder and cancels whichever
+# is used up
+TRADING_SELF_TRADE_PREVENTION = 'cancel_newest'
+
+# Maximum number of OHLCV bars returned by one /api/candles/ request
+TRADING_CANDLE_LIMIT = 1000
+
+# Page sizes for the keyset-paginated order, transaction and notification
+# listings (``?page_size=`` is capped at the maximum)
+TRADING_PAGE_SIZE = 100
+TRADING_MAX_PAGE_SIZE = 1000
+
+# Trade and cancel notifications are buffered in Redis once the matching
+# transaction commits and written in batches by flush_notifications, which
+# runs TRADING_NOTIFICATION_FLUSH_DELAY seconds after the first of a burst.
+# False writes them inside the matching transaction instead.
+TRADING_NOTIFICATIONS_ASYNC = True
+TRADING_NOTIFICATION_FLUSH_DELAY = 1
+TRADING_NOTIFICATION_BATCH_SIZE = 1000
+
+# Lifetime of a cached unread notification counter before it is recounted
+TRADING_UNREAD_COUNT_TTL = 60 * 60
+
+# Largest number of orders accepted by one POST /api/orders/batch/
+TRADING_MAX_BATCH_ORDERS = 500
+
+# Matching workers journal every committed book operation per product under
+# TRADING_JOURNAL_DIR and snapshot the book every TRADING_JOURNAL_SNAPSHOT_EVERY
+# operations, so a restarted worker replays instead of reloading all open
+# orders. TRADING_JOURNAL_FSYNC forces each append to disk.
+TRADING_JOURNAL_ENABLED = True
+TRADING_JOURNAL_DIR = BASE_DIR / 'journal'
+TRADING_JOURNAL_SNAPSHOT_EVERY = 1000
+TRADING_JOURNAL_FSYNC = False
+
+# Rows per server-side cursor fetch and per output chunk in /api/exports/
+TRADING_EXPORT_CHUNK_SIZE = 5000
+
+# Pre-trade risk limits. Sellable quantity and open notional per user are
+# cached for TRADING_RISK_STATE_TTL seconds and reloaded after fills/cancels.
+# Setting TRADING_ALLOW_SHORT_SELLING to False caps sells at the seller's
+# position less their open sells; positions only come from fills, so seed
+# holdings (Position rows) before turning it off.
+TRADING_ALLOW_SHORT_SELLING = True
+TRADING_MAX_ORDER_NOTIONAL = Decimal('1000000.00')
+TRADING_MAX_OPEN_NOTIONAL = Decimal('5000000.00')
+TRADING_RISK_STATE_TTL = 5 * 60
+
+# Trades and closed orders older than this are moved to the archive tables
+# by the nightly archive_history task, TRADING_ARCHIVE_BATCH_SIZE rows per
+# transaction
+TRADING_ARCHIVE_AFTER_DAYS = 365
+TRADING_ARCHIVE_BATCH_SIZE = 5000
+
+# Rows per INSERT ... ON CONFLICT statement when analytics rollups upsert
+# ProductPerformance
+ANALYTICS_UPSERT_BATCH_SIZE = 2000
+
+# How long backfill_analytics progress stays readable after a run starts
+ANALYTICS_BACKFILL_PROGRESS_TTL = 7 * 24 * 60 * 60
+
+# Rows per server-side cursor fetch and per output chunk in the analytics
+# export_csv actions
+ANALYTICS_EXPORT_CHUNK_SIZE = 5000
+
+# Cache lifetime of materialized weekly/monthly reports. Backfills invalidate
+# them at once; later edits to old sales orders show up within a day for
+# closed periods and within ANALYTICS_REPORT_CURRENT_TTL for the running one
+ANALYTICS_REPORT_TTL = 24 * 60 * 60
+ANALYTICS_REPORT_CURRENT_TTL = 15 * 60
+
+# Publish book, trade and notification events to Redis for /api/stream/
+TRADING_STREAMING_ENABLED = True
+
 # Add these new settings to fix the warning
 CELERY_BROKER_CONNECTION_RETRY = True
 CELERY_BROKER_CONNECTION_RETRY_ON_STARTUP = True
@@ -227,6 +332,10 @@ CORS_ALLOW_ALL_ORIGINS = True
 CORS_ALLOW_CREDENTIALS = True
 
 CELERY_BEAT_SCHEDULE = {
+    'flush-notifications': {
+        'task': 'tradingapp.tasks.flush_notifications',
+        'schedule': 60.0,  # Picks up a buffer whose flush task was lost
+    },
     'calculate-daily-metrics': {
         'task': 'analyticsapp.tasks.calculate_daily_metrics',
         'schedule': crontab(hour=0, minute=0),  # Run at midnight
@@ -235,4 +344,12 @@ CELERY_BEAT_SCHEDULE = {
         'task': 'analyticsapp.tasks.generate_weekly_report',
         'schedule': crontab(hour=1, minute=0, day_of_week=1),  # Run at 1 AM on Mondays
     },
+    'generate-monthly-report': {
+        'task': 'analyticsapp.tasks.generate_monthly_report',
+        'schedule': crontab(hour=1, minute=15, day_of_month=1),  # Run at 1:15 AM on the 1st
+    },
+    'archive-trading-history': {
+        'task': 'tradingapp.tasks.archive_history',
+        'schedule': crontab(hour=2, minute=30),  # Run at 2:30 AM
+    },
 }
@@ -1,3 +1,6 @@
+from decimal import Decimal
+
+from django.core.validators import MinValueValidator
 from django.db import models
 from django.utils.text import slugify
 
@@ -39,6 +42,14 @@ class Product(models.Model):
     slug = models.SlugField(unique=True, blank=True)
     description = models.TextField()
     price = models.DecimalField(max_digits=10, decimal_places=2)
+    # Order prices must be a multiple of this; the matching engine keeps
+    # prices as whole ticks.
+    tick_size = models.DecimalField(
+        max_digits=10,
+        decimal_places=2,
+        default=Decimal('0.01'),
+        validators=[MinValueValidator(Decimal('0.01'))]
+    )
     category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name='products')
     tags = models.ManyToManyField(Tag, blank=True, related_name='products')
     stock = models.PositiveIntegerField(default=0)
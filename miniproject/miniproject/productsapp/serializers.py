@@ -1,4 +1,5 @@
 from rest_framework import serializers
+from tradingapp.models import Order
 
 from .models import Category, Product, ProductImage, Tag
 
@@ -31,7 +32,7 @@ class ProductSerializer(serializers.ModelSerializer):
     class Meta:
         model = Product
         fields = [
-            'id', 'name', 'slug', 'description', 'price',
+            'id', 'name', 'slug', 'description', 'price', 'tick_size',
             'category', 'category_name', 'tags', 'stock',
             'is_active', 'images', 'created_at', 'updated_at'
         ]
@@ -55,13 +56,26 @@ class ProductCreateUpdateSerializer(serializers.ModelSerializer):
     class Meta:
         model = Product
         fields = [
-            'id', 'name', 'slug', 'description', 'price',
+            'id', 'name', 'slug', 'description', 'price', 'tick_size',
             'category', 'category_name', 'tags', 'tag_ids',
             'stock', 'is_active', 'images', 'created_at',
             'updated_at'
         ]
         read_only_fields = ['slug', 'created_at', 'updated_at']
 
+    def validate_tick_size(self, value):
+        # Open orders must stay on the price grid the matching engine uses.
+        if self.instance is not None and value != self.instance.tick_size:
+            open_prices = self.instance.orders.filter(
+                execution_type=Order.LIMIT,
+                status__in=Order.OPEN_STATUSES
+            ).values_list('price', flat=True).distinct()
+            if any(price % value for price in open_prices):
+                raise serializers.ValidationError(
+                    'Open orders are priced off this tick size; cancel them first.'
+                )
+        return value
+
     def create(self, validated_data):
         images = validated_data.pop('images', [])
         tag_ids = validated_data.pop('tag_ids', [])
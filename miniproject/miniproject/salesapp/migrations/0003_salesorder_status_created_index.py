@@ -0,0 +1,19 @@
+# Generated by Django 5.1.6 on 2026-10-17 17:17
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('salesapp', '0002_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='salesorder',
+            index=models.Index(fields=['status', 'created_at'], name='salesorder_status_created_idx'),
+        ),
+    ]
@@ -68,6 +68,12 @@ class SalesOrder(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            # Daily sales metrics read one status over a created_at range.
+            models.Index(fields=['status', 'created_at'], name='salesorder_status_created_idx'),
+        ]
+
     def __str__(self):
         return f"Order #{self.id} - {self.customer.username}"
 
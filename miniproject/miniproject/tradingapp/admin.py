@@ -1,6 +1,7 @@
 from django.contrib import admin
 
-from .models import Notification, Order, OrderBook, Transaction
+from .models import (Candle, Notification, Order, OrderArchive, OrderBook,
+                     Position, Transaction, TransactionArchive)
 
 
 @admin.register(Order)
@@ -14,7 +15,7 @@ class OrderAdmin(admin.ModelAdmin):
 class TransactionAdmin(admin.ModelAdmin):
     list_display = ['id', 'buy_order', 'sell_order', 'quantity', 'price', 'executed_at']
     list_filter = ['executed_at']
-    search_fields = ['buy_order__user__username', 'sell_order__user__username']
+    search_fields = ['buyer__username', 'seller__username']
 
 
 @admin.register(OrderBook)
@@ -29,3 +30,29 @@ class NotificationAdmin(admin.ModelAdmin):
     list_display = ['id', 'user', 'notification_type', 'read', 'created_at']
     list_filter = ['notification_type', 'read', 'created_at']
     search_fields = ['user__username', 'message']
+
+
+@admin.register(Candle)
+class CandleAdmin(admin.ModelAdmin):
+    list_display = ['product', 'interval', 'start', 'open', 'high', 'low', 'close', 'volume']
+    list_filter = ['interval', 'start']
+    search_fields = ['product__name']
+
+
+@admin.register(Position)
+class PositionAdmin(admin.ModelAdmin):
+    list_display = ['user', 'product', 'quantity', 'average_cost', 'realized_pnl', 'updated_at']
+    search_fields = ['user__username', 'product__name']
+
+
+@admin.register(OrderArchive)
+class OrderArchiveAdmin(admin.ModelAdmin):
+    list_display = ['id', 'user_id', 'product_id', 'order_type', 'quantity', 'price', 'status', 'created_at']
+    list_filter = ['order_type', 'status']
+    search_fields = ['=id', '=user_id']
+
+
+@admin.register(TransactionArchive)
+class TransactionArchiveAdmin(admin.ModelAdmin):
+    list_display = ['id', 'product_id', 'buyer_id', 'seller_id', 'quantity', 'price', 'executed_at']
+    search_fields = ['=id', '=buyer_id', '=seller_id']
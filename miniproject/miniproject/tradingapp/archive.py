@@ -0,0 +1,98 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+from .models import Order, OrderArchive, Transaction, TransactionArchive
+
+CLOSED_STATUSES = [Order.COMPLETED, Order.CANCELLED]
+
+
+def archive_cutoff(days=None):
+    days = settings.TRADING_ARCHIVE_AFTER_DAYS if days is None else days
+    return timezone.now() - timedelta(days=days)
+
+
+def _archive_transactions(cutoff, batch_size):
+    rows = list(
+        Transaction.objects.filter(executed_at__lt=cutoff).order_by('executed_at', 'id').values(
+            'id', 'buy_order_id', 'sell_order_id', 'quantity', 'price', 'executed_at',
+            'buy_order__product_id', 'buyer_id', 'seller_id'
+        )[:batch_size]
+    )
+    if not rows:
+        return 0
+    # ignore_conflicts keeps a rerun after a failed delete idempotent.
+    TransactionArchive.objects.bulk_create([
+        TransactionArchive(
+            id=row['id'],
+            buy_order_id=row['buy_order_id'],
+            sell_order_id=row['sell_order_id'],
+            product_id=row['buy_order__product_id'],
+            buyer_id=row['buyer_id'],
+            seller_id=row['seller_id'],
+            quantity=row['quantity'],
+            price=row['price'],
+            executed_at=row['executed_at']
+        )
+        for row in rows
+    ], ignore_conflicts=True)
+    Transaction.objects.filter(id__in=[row['id'] for row in rows]).delete()
+    return len(rows)
+
+
+def _archive_orders(cutoff, batch_size):
+    # An order closed before the cutoff only traded before it, so its trades
+    # are already archived; the Exists guards keep any stragglers live.
+    orders = list(
+        Order.objects.filter(status__in=CLOSED_STATUSES, updated_at__lt=cutoff).exclude(
+            Exists(Transaction.objects.filter(buy_order=OuterRef('pk')))
+        ).exclude(
+            Exists(Transaction.objects.filter(sell_order=OuterRef('pk')))
+        ).order_by('updated_at', 'id')[:batch_size]
+    )
+    if not orders:
+        return 0
+    OrderArchive.objects.bulk_create([
+        OrderArchive(
+            id=order.id,
+            user_id=order.user_id,
+            product_id=order.product_id,
+            order_type=order.order_type,
+            execution_type=order.execution_type,
+            quantity=order.quantity,
+            price=order.price,
+            status=order.status,
+            filled_quantity=order.filled_quantity,
+            remaining_quantity=order.remaining_quantity,
+            created_at=order.created_at,
+            updated_at=order.updated_at
+        )
+        for order in orders
+    ], ignore_conflicts=True)
+    Order.objects.filter(id__in=[order.id for order in orders]).delete()
+    return len(orders)
+
+
+def archive_trading_history(cutoff=None, batch_size=None):
+    """
+    Move trades executed before ``cutoff`` and orders closed before it into
+    the archive tables, one short transaction per batch so matching never
+    waits long on the rows being moved. Returns ``(trades, orders)`` moved.
+    """
+    cutoff = cutoff or archive_cutoff()
+    batch_size = batch_size or settings.TRADING_ARCHIVE_BATCH_SIZE
+
+    counts = []
+    for archive_batch in (_archive_transactions, _archive_orders):
+        moved = 0
+        while True:
+            with transaction.atomic():
+                batch = archive_batch(cutoff, batch_size)
+            moved += batch
+            if batch < batch_size:
+                break
+        counts.append(moved)
+    return tuple(counts)
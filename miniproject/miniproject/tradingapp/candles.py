@@ -0,0 +1,80 @@
+from datetime import datetime, timezone as dt_timezone
+
+from django.db.models import Q
+
+from .models import Candle
+
+
+def bucket_start(moment, interval):
+    seconds = Candle.INTERVAL_SECONDS[interval]
+    timestamp = int(moment.timestamp()) // seconds * seconds
+    return datetime.fromtimestamp(timestamp, tz=dt_timezone.utc)
+
+
+def _merge(candle, trade):
+    if trade.price > candle.high:
+        candle.high = trade.price
+    if trade.price < candle.low:
+        candle.low = trade.price
+    candle.close = trade.price
+    candle.volume += trade.quantity
+    candle.trade_count += 1
+
+
+def update_candles(product_id, trades):
+    """
+    Fold a batch of trades (in execution order) into the product's bars at
+    every interval: one read of the affected bars, then one bulk update and
+    one bulk insert.
+    """
+    if not trades:
+        return
+
+    bars = {}
+    for trade in trades:
+        for interval in Candle.INTERVAL_SECONDS:
+            key = (interval, bucket_start(trade.executed_at, interval))
+            bar = bars.get(key)
+            if bar is None:
+                bars[key] = Candle(
+                    product_id=product_id,
+                    interval=key[0],
+                    start=key[1],
+                    open=trade.price,
+                    high=trade.price,
+                    low=trade.price,
+                    close=trade.price,
+                    volume=trade.quantity,
+                    trade_count=1
+                )
+            else:
+                _merge(bar, trade)
+
+    lookup = Q()
+    for interval, start in bars:
+        lookup |= Q(interval=interval, start=start)
+    existing = {
+        (candle.interval, candle.start): candle
+        for candle in Candle.objects.filter(lookup, product_id=product_id)
+    }
+
+    updated = []
+    for key, bar in bars.items():
+        candle = existing.get(key)
+        if candle is None:
+            continue
+        # The stored bar keeps its open; the batch extends the rest.
+        candle.high = max(candle.high, bar.high)
+        candle.low = min(candle.low, bar.low)
+        candle.close = bar.close
+        candle.volume += bar.volume
+        candle.trade_count += bar.trade_count
+        updated.append(candle)
+
+    if updated:
+        Candle.objects.bulk_update(
+            updated, ['high', 'low', 'close', 'volume', 'trade_count']
+        )
+    Candle.objects.bulk_create(
+        [bar for key, bar in bars.items() if key not in existing]
+    )
@@ -0,0 +1,632 @@
+from bisect import bisect_left, insort
+from collections import deque
+from dataclasses import dataclass
+from threading import RLock
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import transaction
+from django.db.models import Count, Sum
+from django.utils import timezone
+from productsapp.models import Product
+
+from .candles import update_candles
+from .journal import (accept_event, cancel_event, decrement_event,
+                      default_journal, fill_event)
+from .models import (Order, OrderBook, Transaction, build_cancel_notification,
+                     build_trade_notifications)
+from .notifications import dispatch_notifications
+from .positions import update_positions
+from .risk import release_risk
+from .signals import trades_executed
+from .snapshot import clear_snapshot, store_snapshot
+from .streaming import publish_book_changes, publish_trades
+from .ticks import DEFAULT_TICK_SIZE, to_price, to_ticks
+
+
+def resting_orders(product_id):
+    """
+    Open limit orders of a product that the engine has processed and left
+    resting, marked by their OrderBook entry. Orders committed but not yet
+    matched (an incoming order, the rest of its batch, orders still queued)
+    stay out; they are matched when their task runs.
+    """
+    return Order.objects.filter(
+        product_id=product_id,
+        execution_type=Order.LIMIT,
+        status__in=Order.OPEN_STATUSES,
+        order_book_entry__isnull=False,
+    )
+
+
+@dataclass
+class Fill:
+    buy_order: Order
+    sell_order: Order
+    quantity: int
+    price: object
+    ticks: int
+
+
+# Self-trade prevention modes (TRADING_SELF_TRADE_PREVENTION): what happens
+# when an incoming order reaches a resting order of the same user.
+CANCEL_NEWEST = 'cancel_newest'
+CANCEL_OLDEST = 'cancel_oldest'
+DECREMENT = 'decrement'
+
+
+@dataclass
+class SelfTrade:
+    """
+    An order cancelled, or shrunk by ``quantity``, to prevent a self-trade
+    at the level ``ticks``.
+    """
+    order: Order
+    quantity: int = 0
+    ticks: int = None
+
+
+class PriceLevel:
+    """FIFO queue of resting orders sharing one price, in whole ticks."""
+
+    __slots__ = ('ticks', 'orders', 'quantity')
+
+    def __init__(self, ticks):
+        self.ticks = ticks
+        self.orders = deque()
+        self.quantity = 0
+
+    def append(self, order):
+        self.orders.append(order)
+        self.quantity += order.remaining_quantity
+
+    def prune(self):
+        self.orders = deque(
+            o for o in self.orders
+            if o.remaining_quantity and o.status in Order.OPEN_STATUSES
+        )
+
+
+class BookSide:
+    """
+    One side of a book: price levels keyed by integer ticks, kept in a
+    sorted tick array.
+    """
+
+    def __init__(self, order_type):
+        self.order_type = order_type
+        self.levels = {}
+        self.ticks = []
+
+    def __len__(self):
+        return len(self.ticks)
+
+    def add(self, order, ticks):
+        level = self.levels.get(ticks)
+        if level is None:
+            level = self.levels[ticks] = PriceLevel(ticks)
+            insort(self.ticks, ticks)
+        level.append(order)
+
+    def remove(self, order, ticks):
+        level = self.levels[ticks]
+        # By identity: deque.remove() would compare with Model.__eq__, which
+        # costs far more per resting order than the scan itself.
+        for index, resting in enumerate(level.orders):
+            if resting is order:
+                del level.orders[index]
+                break
+        level.quantity -= order.remaining_quantity
+        if not level.orders:
+            self.remove_level(ticks)
+
+    def remove_level(self, ticks):
+        del self.levels[ticks]
+        del self.ticks[bisect_left(self.ticks, ticks)]
+
+    def iter_levels(self):
+        # Bids are best at the top of the array, asks at the bottom. Levels
+        # emptied by the caller between steps drop out of the array.
+        index = 0
+        while index < len(self.ticks):
+            if self.order_type == Order.BUY:
+                ticks = self.ticks[-1 - index]
+            else:
+                ticks = self.ticks[index]
+            yield self.levels[ticks]
+            if ticks in self.levels:
+                index += 1
+
+    def top_levels(self, depth):
+        if self.order_type == Order.BUY:
+            ticks = self.ticks[-depth:][::-1]
+        else:
+            ticks = self.ticks[:depth]
+        return [self.levels[level_ticks] for level_ticks in ticks]
+
+    def within_depth(self, ticks, depth):
+        if len(self.ticks) <= depth:
+            return True
+        if self.order_type == Order.BUY:
+            return ticks >= self.ticks[-depth]
+        return ticks <= self.ticks[depth - 1]
+
+    def crosses(self, level_ticks, limit_ticks):
+        if self.order_type == Order.BUY:
+            return level_ticks >= limit_ticks
+        return level_ticks <= limit_ticks
+
+
+class ProductBook:
+    """
+    In-memory price-time priority book for a single product. Prices are
+    whole multiples of the product's tick size and are compared as integer
+    ticks; Decimal prices stay on the orders for persistence.
+    """
+
+    def __init__(self, product_id, tick_size=DEFAULT_TICK_SIZE):
+        self.product_id = product_id
+        self.tick_size = tick_size
+        self.bids = BookSide(Order.BUY)
+        self.asks = BookSide(Order.SELL)
+        # Resting orders by id, with their price in ticks, so removing one
+        # never converts its Decimal price again.
+        self.orders = {}
+        self.sequence = 0
+
+    def side(self, order_type):
+        return self.bids if order_type == Order.BUY else self.asks
+
+    def opposite(self, order_type):
+        return self.asks if order_type == Order.BUY else self.bids
+
+    def ticks(self, price):
+        return to_ticks(price, self.tick_size)
+
+    def price(self, ticks):
+        return to_price(ticks, self.tick_size)
+
+    def add(self, order, ticks=None):
+        if ticks is None:
+            ticks = self.ticks(order.price)
+        self.side(order.order_type).add(order, ticks)
+        self.orders[order.id] = (order, ticks)
+
+    def remove(self, order_id):
+        entry = self.orders.pop(order_id, None)
+        if entry is None:
+            return None
+        order, ticks = entry
+        self.side(order.order_type).remove(order, ticks)
+        return order
+
+    def reduce(self, order_id, quantity):
+        """Apply a fill replayed from the journal to a resting order."""
+        order, ticks = self.orders[order_id]
+        self.side(order.order_type).levels[ticks].quantity -= quantity
+        order.filled_quantity += quantity
+        order.remaining_quantity -= quantity
+        if order.remaining_quantity:
+            order.status = Order.PARTIALLY_FILLED
+        else:
+            order.status = Order.COMPLETED
+            self.remove(order_id)
+
+    def decrement(self, order_id, quantity):
+        """Shrink a resting order's size without a fill (self-trade decrement)."""
+        order, ticks = self.orders[order_id]
+        self.side(order.order_type).levels[ticks].quantity -= quantity
+        order.quantity -= quantity
+        order.remaining_quantity -= quantity
+
+    def crossing_levels(self, incoming, ticks=None):
+        """
+        Opposite levels the incoming order may trade with, best first.
+        ``ticks`` is the incoming limit if the caller already converted it.
+        """
+        book_side = self.opposite(incoming.order_type)
+        # Market orders carry no limit and cross every level.
+        if ticks is None and incoming.price is not None:
+            ticks = self.ticks(incoming.price)
+        for level in book_side.iter_levels():
+            if ticks is not None and not book_side.crosses(level.ticks, ticks):
+                break
+            yield level
+
+    def can_fill(self, incoming, ticks=None):
+        """Walk the book as match() would, without changing anything."""
+        mode = settings.TRADING_SELF_TRADE_PREVENTION
+        needed = incoming.remaining_quantity
+        for level in self.crossing_levels(incoming, ticks):
+            for resting in level.orders:
+                if resting.user_id == incoming.user_id:
+                    if mode == CANCEL_OLDEST:
+                        continue
+                    # The incoming order would be cancelled before it filled.
+                    if mode == CANCEL_NEWEST or resting.remaining_quantity >= needed:
+                        return False
+                needed -= resting.remaining_quantity
+                if needed <= 0:
+                    return True
+        return False
+
+    def _cancel_resting(self, resting, level):
+        # Still iterated by match(); the level is pruned after the walk.
+        resting.status = Order.CANCELLED
+        level.quantity -= resting.remaining_quantity
+        del self.orders[resting.id]
+
+    def _prevent_self_trade(self, mode, incoming, resting, level):
+        if mode == CANCEL_NEWEST:
+            incoming.status = Order.CANCELLED
+            return [SelfTrade(incoming, ticks=level.ticks)]
+        if mode == CANCEL_OLDEST:
+            self._cancel_resting(resting, level)
+            return [SelfTrade(resting, ticks=level.ticks)]
+        if mode != DECREMENT:
+            raise ImproperlyConfigured(f'Unknown self-trade prevention mode {mode!r}')
+
+        # Both shrink by the smaller remainder: the order that would be used
+        # up is cancelled (both when equal) and the other is decremented.
+        quantity = min(incoming.remaining_quantity, resting.remaining_quantity)
+        outcome = []
+        for order in (incoming, resting):
+            if order.remaining_quantity == quantity:
+                if order is incoming:
+                    incoming.status = Order.CANCELLED
+                else:
+                    self._cancel_resting(resting, level)
+                outcome.append(SelfTrade(order, ticks=level.ticks))
+            else:
+                order.quantity -= quantity
+                order.remaining_quantity -= quantity
+                if order is resting:
+                    level.quantity -= quantity
+                outcome.append(SelfTrade(order, quantity, level.ticks))
+        return outcome
+
+    def match(self, incoming, ticks=None):
+        """
+        Fill the incoming order against the book. Returns the fills and the
+        orders cancelled or decremented by self-trade prevention.
+        """
+        fills, prevented = [], []
+        mode = settings.TRADING_SELF_TRADE_PREVENTION
+        book_side = self.opposite(incoming.order_type)
+
+        for level in self.crossing_levels(incoming, ticks):
+            if not incoming.remaining_quantity or incoming.status == Order.CANCELLED:
+                break
+
+            for resting in level.orders:
+                if not incoming.remaining_quantity or incoming.status == Order.CANCELLED:
+                    break
+                if resting.user_id == incoming.user_id:
+                    prevented.extend(self._prevent_self_trade(mode, incoming, resting, level))
+                    continue
+
+                quantity = min(incoming.remaining_quantity, resting.remaining_quantity)
+                for order in (incoming, resting):
+                    order.filled_quantity += quantity
+                    order.remaining_quantity -= quantity
+                    order.status = (
+                        Order.COMPLETED if order.remaining_quantity == 0
+                        else Order.PARTIALLY_FILLED
+                    )
+                level.quantity -= quantity
+
+                if incoming.order_type == Order.BUY:
+                    fills.append(Fill(incoming, resting, quantity, resting.price, level.ticks))
+                else:
+                    fills.append(Fill(resting, incoming, quantity, resting.price, level.ticks))
+
+                if not resting.remaining_quantity:
+                    del self.orders[resting.id]
+
+            level.prune()
+            if not level.orders:
+                book_side.remove_level(level.ticks)
+
+        return fills, prevented
+
+
+class MatchingEngine:
+    """
+    Keeps one ProductBook per product in process memory and matches incoming
+    orders against it. The book for a product is loaded on first use, from
+    the journal when one is configured and otherwise from the database;
+    afterwards only the outcome of each incoming order is written.
+    """
+
+    def __init__(self, journal=None):
+        self._books = {}
+        self._lock = RLock()
+        self.journal = journal
+
+    def get_book(self, product_id):
+        book = self._books.get(product_id)
+        if book is None:
+            book = self._books[product_id] = self._load_book(product_id)
+        return book
+
+    def _load_book(self, product_id):
+        tick_size = Product.objects.values_list('tick_size', flat=True).get(id=product_id)
+        if self.journal is not None:
+            book = ProductBook(product_id, tick_size)
+            if self.journal.recover(book) and self._matches_database(book):
+                return book
+            book = self._load_from_database(product_id, tick_size)
+            # Start a fresh journal from the state just loaded.
+            book.sequence = self.journal.last_sequence(product_id)
+            self.journal.write_snapshot(book)
+            return book
+        return self._load_from_database(product_id, tick_size)
+
+    def _matches_database(self, book):
+        """
+        One aggregate guards the replayed book. It counts the orders a
+        database load would rest, so the incoming order (committed but not
+        yet processed when it triggers the load) is left out.
+        """
+        expected = resting_orders(book.product_id).aggregate(
+            orders=Count('id'), quantity=Sum('remaining_quantity')
+        )
+        replayed = sum(order.remaining_quantity for order, _ in book.orders.values())
+        return (
+            expected['orders'] == len(book.orders)
+            and (expected['quantity'] or 0) == replayed
+        )
+
+    def _load_from_database(self, product_id, tick_size):
+        """Rest the orders the engine has already processed, oldest first."""
+        book = ProductBook(product_id, tick_size)
+        for order in resting_orders(product_id).order_by('created_at', 'id').iterator():
+            book.add(order)
+        return book
+
+    def reset(self, product_id=None):
+        with self._lock:
+            product_ids = list(self._books) if product_id is None else [product_id]
+            for book_product_id in product_ids:
+                self._discard(book_product_id)
+
+    def process_order(self, order):
+        with self._lock:
+            book = self.get_book(order.product_id)
+            if order.id in book.orders:
+                # Already matched and resting: a redelivered or retried task.
+                return []
+            # The one Decimal-to-ticks conversion for this order.
+            ticks = None
+            if order.price is not None:
+                try:
+                    ticks = book.ticks(order.price)
+                except ValueError:
+                    # The product moved to a tick size that does not divide
+                    # the loaded one; reload the book with the new size.
+                    self._discard(order.product_id)
+                    book = self.get_book(order.product_id)
+                    try:
+                        ticks = book.ticks(order.price)
+                    except ValueError:
+                        # Priced on the grid it was validated against, which
+                        # has since changed. It can never rest or trade, and a
+                        # retry would fail the same way, so it is cancelled
+                        # and its owner told, as for an unfilled IOC order.
+                        order.status = Order.CANCELLED
+                        self._persist(order, [])
+                        return []
+            accepted = accept_event(order)
+            if order.execution_type == Order.FILL_OR_KILL and not book.can_fill(order, ticks):
+                fills, prevented = [], []
+            else:
+                fills, prevented = book.match(order, ticks)
+
+            resting = (
+                bool(order.remaining_quantity) and order.rests
+                and order.status in Order.OPEN_STATUSES
+            )
+            if resting:
+                book.add(order, ticks)
+            elif order.remaining_quantity:
+                # Market, IOC and unfillable FOK remainders never rest.
+                order.status = Order.CANCELLED
+            book.sequence += 1
+            try:
+                trades = self._persist(order, fills, prevented)
+            except Exception:
+                # The in-memory book no longer matches the database; rebuild
+                # it from the last committed state on next use.
+                self._discard(order.product_id)
+                raise
+
+            opposite = book.opposite(order.order_type)
+            # Self-trade cancels and decrements of resting orders happen at
+            # crossing levels too, so they are always visible.
+            prevented_changes = {
+                (opposite, self_trade.ticks) for self_trade in prevented
+                if self_trade.order is not order
+            }
+            changes = {(opposite, fill.ticks) for fill in fills} | prevented_changes
+            if resting:
+                changes.add((book.side(order.order_type), ticks))
+
+            # Fills always consume the best levels; a resting order only
+            # changes the snapshot if it lands inside the published depth.
+            depth = settings.TRADING_ORDER_BOOK_DEPTH
+            visible = fills or prevented_changes or (
+                resting and book.side(order.order_type).within_depth(ticks, depth)
+            )
+            self._publish(book, changes, visible, trades)
+            self._log(book, [accepted] + [fill_event(fill) for fill in fills] + [
+                decrement_event(self_trade.order, self_trade.quantity) if self_trade.quantity
+                else cancel_event([self_trade.order.id])
+                for self_trade in prevented
+            ])
+            return fills
+
+    def process_orders(self, orders):
+        """
+        Match a batch of orders in submission order inside one database
+        transaction. On failure every book the batch touched is rebuilt,
+        since the earlier orders' writes are rolled back with it.
+        """
+        with self._lock:
+            try:
+                with transaction.atomic():
+                    return [self.process_order(order) for order in orders]
+            except Exception:
+                for product_id in {order.product_id for order in orders}:
+                    self._discard(product_id)
+                raise
+
+    def cancel_orders(self, product_id, order_ids):
+        """
+        Cancel open orders of one product. Rows are locked before the book is
+        touched, so an order that already completed is left alone.
+        """
+        with self._lock:
+            book = self.get_book(product_id)
+            depth = settings.TRADING_ORDER_BOOK_DEPTH
+            try:
+                with transaction.atomic():
+                    orders = list(
+                        Order.objects.select_for_update().select_related('product').filter(
+                            id__in=order_ids,
+                            product_id=product_id,
+                            status__in=Order.OPEN_STATUSES
+                        )
+                    )
+                    if not orders:
+                        return []
+
+                    changes = set()
+                    visible = False
+                    now = timezone.now()
+                    for order in orders:
+                        book_side = book.side(order.order_type)
+                        if order.id in book.orders:
+                            _, ticks = book.orders[order.id]
+                            visible = visible or book_side.within_depth(ticks, depth)
+                            changes.add((book_side, ticks))
+                            book.remove(order.id).status = Order.CANCELLED
+                        order.status = Order.CANCELLED
+                        order.updated_at = now
+                    book.sequence += 1
+
+                    Order.objects.bulk_update(orders, ['status', 'updated_at'])
+                    OrderBook.objects.filter(order_id__in=[order.id for order in orders]).delete()
+                    dispatch_notifications(
+                        build_cancel_notification(order, order.product.name)
+                        for order in orders
+                    )
+                    transaction.on_commit(lambda: release_risk(
+                        {(order.user_id, product_id) for order in orders}
+                    ))
+            except Exception:
+                self._discard(product_id)
+                raise
+
+            self._publish(book, changes, visible)
+            self._log(book, [cancel_event(order.id for order in orders)])
+            return orders
+
+    def _discard(self, product_id):
+        self._books.pop(product_id, None)
+        clear_snapshot(product_id)
+
+    def _log(self, book, events):
+        if self.journal is not None:
+            sequence = book.sequence
+            transaction.on_commit(lambda: self.journal.append(book, sequence, events))
+
+    def _publish(self, book, changes, snapshot_changed, trades=()):
+        # Level quantities are read when the callback runs, so subscribers
+        # always see the committed state.
+        def publish():
+            if snapshot_changed:
+                store_snapshot(book)
+            if changes:
+                publish_book_changes(book, changes)
+            publish_trades(book.product_id, trades)
+
+        transaction.on_commit(publish)
+
+    # No savepoint: a failure always propagates and discards the book, and
+    # batches would otherwise pay for one savepoint per order.
+    @transaction.atomic(savepoint=False)
+    def _persist(self, order, fills, prevented=()):
+        now = timezone.now()
+        touched = {order.id: order}
+        for fill in fills:
+            touched[fill.buy_order.id] = fill.buy_order
+            touched[fill.sell_order.id] = fill.sell_order
+        for self_trade in prevented:
+            touched[self_trade.order.id] = self_trade.order
+        for touched_order in touched.values():
+            touched_order.updated_at = now
+
+        Order.objects.bulk_update(
+            touched.values(),
+            ['status', 'quantity', 'filled_quantity', 'remaining_quantity', 'updated_at']
+        )
+
+        trades, notifications = [], []
+        if fills:
+            trades = Transaction.objects.bulk_create([
+                Transaction(
+                    buy_order=fill.buy_order,
+                    sell_order=fill.sell_order,
+                    buyer_id=fill.buy_order.user_id,
+                    seller_id=fill.sell_order.user_id,
+                    quantity=fill.quantity,
+                    price=fill.price
+                )
+                for fill in fills
+            ])
+            update_candles(order.product_id, trades)
+            update_positions(order.product_id, trades)
+            trades_executed.send(sender=Transaction, product_id=order.product_id, trades=trades)
+
+        killed = order.status == Order.CANCELLED
+        cancelled_resting = [
+            self_trade.order for self_trade in prevented
+            if self_trade.order is not order and self_trade.order.status == Order.CANCELLED
+        ]
+        if trades or killed or cancelled_resting:
+            # bulk_create skips post_save, so notifications for the whole
+            # sweep are handed to the delivery pipeline here in one batch.
+            product_name = Product.objects.values_list('name', flat=True).get(
+                id=order.product_id
+            )
+            for trade in trades:
+                notifications.extend(build_trade_notifications(trade, product_name))
+            if killed:
+                notifications.append(build_cancel_notification(order, product_name))
+            for cancelled in cancelled_resting:
+                notifications.append(build_cancel_notification(cancelled, product_name))
+            dispatch_notifications(notifications)
+
+        closed_ids = [
+            order_id for order_id, touched_order in touched.items()
+            if touched_order.status not in Order.OPEN_STATUSES and order_id != order.id
+        ]
+        if closed_ids:
+            OrderBook.objects.filter(order_id__in=closed_ids).delete()
+        if order.status in Order.OPEN_STATUSES:
+            OrderBook.objects.create(product_id=order.product_id, order=order)
+
+        # Fills and cancellations change exposure and holdings; the next
+        # pre-trade check reloads them for everyone involved.
+        transaction.on_commit(lambda: release_risk(
+            {(touched_order.user_id, order.product_id) for touched_order in touched.values()}
+        ))
+
+        return trades
+
+
+_engine = MatchingEngine(journal=default_journal())
+
+
+def get_engine():
+    return _engine
@@ -0,0 +1,155 @@
+import json
+import zlib
+from itertools import chain, islice
+
+from django.conf import settings
+
+from .models import Order, OrderArchive, Transaction, TransactionArchive
+
+try:
+    import pyarrow as pa
+except ImportError:  # Arrow output is optional
+    pa = None
+
+
+class Export:
+    """
+    A flat export of live and archived rows in a time range. ``columns``
+    maps each output column to its field on the live and archive models.
+    """
+
+    def __init__(self, name, live, archive, time_field, columns):
+        self.name = name
+        self.live = live
+        self.archive = archive
+        self.time_field = time_field
+        self.columns = columns
+
+    @property
+    def names(self):
+        return [name for name, _, _, _ in self.columns]
+
+    def rows(self, start, end, chunk_size=None):
+        """Archived rows first (they are older), each read through a server-side cursor."""
+        chunk_size = chunk_size or settings.TRADING_EXPORT_CHUNK_SIZE
+        lookup = {f'{self.time_field}__gte': start, f'{self.time_field}__lt': end}
+        sources = [
+            (self.archive, [archive_field for _, _, archive_field, _ in self.columns]),
+            (self.live, [live_field for _, live_field, _, _ in self.columns]),
+        ]
+        return chain.from_iterable(
+            model.objects.filter(**lookup).order_by(self.time_field, 'id')
+            .values_list(*fields).iterator(chunk_size=chunk_size)
+            for model, fields in sources
+        )
+
+    def arrow_schema(self):
+        return pa.schema([(name, arrow_type()) for name, _, _, arrow_type in self.columns])
+
+
+def _price():
+    return pa.decimal128(10, 2)
+
+
+def _timestamp():
+    return pa.timestamp('us', tz='UTC')
+
+
+EXPORTS = {
+    'transactions': Export(
+        'transactions', Transaction, TransactionArchive, 'executed_at', [
+            ('id', 'id', 'id', lambda: pa.int64()),
+            ('buy_order_id', 'buy_order_id', 'buy_order_id', lambda: pa.int64()),
+            ('sell_order_id', 'sell_order_id', 'sell_order_id', lambda: pa.int64()),
+            ('product_id', 'buy_order__product_id', 'product_id', lambda: pa.int64()),
+            ('buyer_id', 'buyer_id', 'buyer_id', lambda: pa.int64()),
+            ('seller_id', 'seller_id', 'seller_id', lambda: pa.int64()),
+            ('quantity', 'quantity', 'quantity', lambda: pa.int64()),
+            ('price', 'price', 'price', _price),
+            ('executed_at', 'executed_at', 'executed_at', _timestamp),
+        ]
+    ),
+    'orders': Export(
+        'orders', Order, OrderArchive, 'created_at', [
+            ('id', 'id', 'id', lambda: pa.int64()),
+            ('user_id', 'user_id', 'user_id', lambda: pa.int64()),
+            ('product_id', 'product_id', 'product_id', lambda: pa.int64()),
+            ('order_type', 'order_type', 'order_type', lambda: pa.string()),
+            ('execution_type', 'execution_type', 'execution_type', lambda: pa.string()),
+            ('quantity', 'quantity', 'quantity', lambda: pa.int64()),
+            ('price', 'price', 'price', _price),
+            ('status', 'status', 'status', lambda: pa.string()),
+            ('filled_quantity', 'filled_quantity', 'filled_quantity', lambda: pa.int64()),
+            ('remaining_quantity', 'remaining_quantity', 'remaining_quantity', lambda: pa.int64()),
+            ('created_at', 'created_at', 'created_at', _timestamp),
+            ('updated_at', 'updated_at', 'updated_at', _timestamp),
+        ]
+    ),
+}
+
+
+def gzip_stream(chunks):
+    """Gzip an iterable of byte strings on the fly, one compressed piece per chunk."""
+    compressor = zlib.compressobj(wbits=31)
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+def _batches(rows, size):
+    rows = iter(rows)
+    while True:
+        batch = list(islice(rows, size))
+        if not batch:
+            return
+        yield batch
+
+
+def ndjson_chunks(export, rows, batch_size=None):
+    """One JSON object per row, joined into a byte string per batch."""
+    names = export.names
+    for batch in _batches(rows, batch_size or settings.TRADING_EXPORT_CHUNK_SIZE):
+        yield ''.join(
+            json.dumps(dict(zip(names, row)), default=str) + '\n' for row in batch
+        ).encode()
+
+
+class _Sink:
+    """Write-only file object handing Arrow's output back to the generator."""
+
+    def __init__(self):
+        self.pieces = []
+        self.closed = False
+
+    def write(self, data):
+        self.pieces.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self):
+        data = b''.join(self.pieces)
+        self.pieces = []
+        return data
+
+
+def arrow_chunks(export, rows, batch_size=None):
+    """Arrow IPC stream: the schema, then one record batch per chunk of rows."""
+    schema = export.arrow_schema()
+    sink = _Sink()
+    writer = pa.ipc.new_stream(pa.PythonFile(sink, mode='w'), schema)
+    for batch in _batches(rows, batch_size or settings.TRADING_EXPORT_CHUNK_SIZE):
+        columns = list(zip(*batch))
+        writer.write_batch(pa.record_batch(
+            [pa.array(column, type=field.type) for column, field in zip(columns, schema)],
+            schema=schema
+        ))
+        yield sink.drain()
+    writer.close()
+    yield sink.drain()
@@ -0,0 +1,230 @@
+import json
+import os
+from datetime import datetime
+from decimal import Decimal
+from pathlib import Path
+
+from django.conf import settings
+
+from .models import Order
+
+ACCEPT = 'accept'
+FILL = 'fill'
+CANCEL = 'cancel'
+DECREMENT = 'decrement'
+
+
+def order_state(order):
+    return {
+        'id': order.id,
+        'user_id': order.user_id,
+        'order_type': order.order_type,
+        'execution_type': order.execution_type,
+        'price': None if order.price is None else str(order.price),
+        'quantity': order.quantity,
+        'filled_quantity': order.filled_quantity,
+        'remaining_quantity': order.remaining_quantity,
+        'status': order.status,
+        'created_at': order.created_at.isoformat(),
+    }
+
+
+def order_from_state(product_id, state):
+    # Positional values in field order take Model.__init__'s fast path, as
+    # for rows read from the database; updated_at is rewritten on save.
+    return Order(
+        state['id'],
+        state['user_id'],
+        product_id,
+        state['order_type'],
+        state['execution_type'],
+        state['quantity'],
+        None if state['price'] is None else Decimal(state['price']),
+        state['status'],
+        state['filled_quantity'],
+        state['remaining_quantity'],
+        datetime.fromisoformat(state['created_at']),
+        None,
+    )
+
+
+def accept_event(order):
+    return {'type': ACCEPT, 'order': order_state(order)}
+
+
+def fill_event(fill):
+    return {
+        'type': FILL,
+        'buy_order': fill.buy_order.id,
+        'sell_order': fill.sell_order.id,
+        'quantity': fill.quantity,
+    }
+
+
+def cancel_event(order_ids):
+    return {'type': CANCEL, 'order_ids': list(order_ids)}
+
+
+def decrement_event(order, quantity):
+    return {'type': DECREMENT, 'order_id': order.id, 'quantity': quantity}
+
+
+class BookJournal:
+    """
+    Append-only log of committed book operations, one JSON line per event
+    and one file per product, plus a periodic full snapshot of the book.
+    Every event of one operation carries that operation's book sequence, so
+    replay resumes exactly after the snapshot. Only the product's matching
+    worker writes to these files.
+    """
+
+    def __init__(self, directory, snapshot_every=None, fsync=None):
+        self.directory = Path(directory)
+        self.snapshot_every = snapshot_every or settings.TRADING_JOURNAL_SNAPSHOT_EVERY
+        self.fsync = settings.TRADING_JOURNAL_FSYNC if fsync is None else fsync
+
+    def log_path(self, product_id):
+        return self.directory / f'{product_id}.log'
+
+    def snapshot_path(self, product_id):
+        return self.directory / f'{product_id}.snapshot.json'
+
+    def _sync(self, handle):
+        handle.flush()
+        if self.fsync:
+            os.fsync(handle.fileno())
+
+    def append(self, book, sequence, events):
+        """
+        Log one operation's events under its ``sequence``. Called after
+        commit, possibly once the book has moved on (batches), so a snapshot
+        taken here covers every later operation too.
+        """
+        self.directory.mkdir(parents=True, exist_ok=True)
+        with open(self.log_path(book.product_id), 'a') as handle:
+            for event in events:
+                handle.write(json.dumps({'seq': sequence, **event}) + '\n')
+            self._sync(handle)
+        if sequence % self.snapshot_every == 0:
+            self.write_snapshot(book)
+
+    def write_snapshot(self, book):
+        """
+        Write the whole book, then truncate the log: everything in it is
+        covered by the snapshot's sequence.
+        """
+        orders = []
+        for book_side in (book.bids, book.asks):
+            for ticks in book_side.ticks:
+                orders.extend(order_state(order) for order in book_side.levels[ticks].orders)
+
+        self.directory.mkdir(parents=True, exist_ok=True)
+        path = self.snapshot_path(book.product_id)
+        temporary = path.with_suffix('.tmp')
+        with open(temporary, 'w') as handle:
+            json.dump({'sequence': book.sequence, 'orders': orders}, handle)
+            self._sync(handle)
+        os.replace(temporary, path)
+        open(self.log_path(book.product_id), 'w').close()
+
+    def _read_snapshot(self, product_id):
+        try:
+            with open(self.snapshot_path(product_id)) as handle:
+                return json.load(handle)
+        except FileNotFoundError:
+            return None
+
+    def _read_log(self, product_id):
+        try:
+            with open(self.log_path(product_id)) as handle:
+                for line in handle:
+                    if line.endswith('\n'):
+                        yield json.loads(line)
+                    # A torn last line means the worker died mid-write;
+                    # the database check on recovery catches what it lost.
+        except FileNotFoundError:
+            return
+
+    def last_sequence(self, product_id):
+        sequence = 0
+        snapshot = self._read_snapshot(product_id)
+        if snapshot:
+            sequence = snapshot['sequence']
+        for event in self._read_log(product_id):
+            sequence = max(sequence, event['seq'])
+        return sequence
+
+    def recover(self, book):
+        """
+        Rebuild ``book`` from the last snapshot and the events after it.
+        Returns False when there is nothing usable to recover from.
+        """
+        try:
+            snapshot = self._read_snapshot(book.product_id)
+            if snapshot is None:
+                return False
+            self._replay(book, snapshot)
+        except (KeyError, ValueError):
+            # Unreadable or out of step with itself: load from the database.
+            return False
+        return True
+
+    def _replay(self, book, snapshot):
+        product_id = book.product_id
+
+        book.sequence = snapshot['sequence']
+        for state in snapshot['orders']:
+            book.add(order_from_state(product_id, state))
+
+        incoming = None
+        for event in self._read_log(product_id):
+            if event['seq'] <= snapshot['sequence']:
+                continue
+            if event['seq'] != book.sequence:
+                self._settle(book, incoming)
+                incoming = None
+                book.sequence = event['seq']
+
+            # The incoming order stays a plain dict; most never rest, so
+            # only the survivors become model instances.
+            if event['type'] == ACCEPT:
+                incoming = event['order']
+            elif event['type'] == FILL:
+                for order_id in (event['buy_order'], event['sell_order']):
+                    if incoming is not None and order_id == incoming['id']:
+                        incoming['remaining_quantity'] -= event['quantity']
+                        incoming['filled_quantity'] += event['quantity']
+                    else:
+                        book.reduce(order_id, event['quantity'])
+            elif event['type'] == CANCEL:
+                for order_id in event['order_ids']:
+                    if incoming is not None and order_id == incoming['id']:
+                        incoming = None
+                    else:
+                        book.remove(order_id)
+            elif event['type'] == DECREMENT:
+                if incoming is not None and event['order_id'] == incoming['id']:
+                    incoming['quantity'] -= event['quantity']
+                    incoming['remaining_quantity'] -= event['quantity']
+                else:
+                    book.decrement(event['order_id'], event['quantity'])
+        self._settle(book, incoming)
+
+    @staticmethod
+    def _settle(book, incoming):
+        # Only a limit order's remainder rests; the rest was cancelled.
+        if (
+            incoming is not None
+            and incoming['remaining_quantity']
+            and incoming['execution_type'] == Order.LIMIT
+        ):
+            incoming['status'] = (
+                Order.PARTIALLY_FILLED if incoming['filled_quantity'] else Order.PENDING
+            )
+            book.add(order_from_state(book.product_id, incoming))
+
+
+def default_journal():
+    if not settings.TRADING_JOURNAL_ENABLED:
+        return None
+    return BookJournal(settings.TRADING_JOURNAL_DIR)
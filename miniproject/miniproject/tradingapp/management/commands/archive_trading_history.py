@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from tradingapp.archive import (CLOSED_STATUSES, archive_cutoff,
+                                archive_trading_history)
+from tradingapp.models import Order, Transaction
+
+
+class Command(BaseCommand):
+    help = (
+        'Move old trades and closed orders into the archive tables. Defaults '
+        'to everything older than TRADING_ARCHIVE_AFTER_DAYS.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days', type=int, default=None,
+            help='Archive trades and closed orders older than this many days.'
+        )
+        parser.add_argument('--batch-size', type=int, default=None)
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Only count the rows that would be moved.'
+        )
+
+    def handle(self, *args, **options):
+        cutoff = archive_cutoff(options['days'])
+        self.stdout.write(f'Archiving history before {cutoff.isoformat()}')
+
+        if options['dry_run']:
+            trades = Transaction.objects.filter(executed_at__lt=cutoff).count()
+            orders = Order.objects.filter(
+                status__in=CLOSED_STATUSES,
+                updated_at__lt=cutoff
+            ).count()
+            self.stdout.write(f'Would move {trades} trades and up to {orders} orders')
+            return
+
+        started = timezone.now()
+        trades, orders = archive_trading_history(cutoff, options['batch_size'])
+        elapsed = (timezone.now() - started).total_seconds()
+        self.stdout.write(self.style.SUCCESS(
+            f'Moved {trades} trades and {orders} orders in {elapsed:.1f}s'
+        ))
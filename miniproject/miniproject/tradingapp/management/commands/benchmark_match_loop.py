@@ -0,0 +1,139 @@
+import gc
+import random
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+
+from tradingapp.engine import ProductBook
+from tradingapp.models import Order
+
+TICK = Decimal('0.01')
+
+
+class DecimalPriceBook(ProductBook):
+    """The same book keyed by Decimal prices, as before integer ticks."""
+
+    def ticks(self, price):
+        return price
+
+    def price(self, ticks):
+        return ticks
+
+
+class Command(BaseCommand):
+    help = (
+        'Time the in-memory match loop alone (no database, cache or Redis), '
+        'including cancels of resting orders, with prices as integer ticks '
+        'against the same book keyed by Decimal prices.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--orders', type=int, default=200_000)
+        parser.add_argument('--users', type=int, default=50)
+        parser.add_argument('--mid-price', type=Decimal, default=Decimal('100.00'))
+        parser.add_argument(
+            '--levels', type=int, default=200,
+            help='Ticks away from the mid price a resting order may land.'
+        )
+        parser.add_argument('--cross-ratio', type=float, default=0.2)
+        parser.add_argument(
+            '--cancel-ratio', type=float, default=0.3,
+            help='Share of steps that cancel a random resting order instead.'
+        )
+        parser.add_argument('--max-quantity', type=int, default=100)
+        parser.add_argument('--repeat', type=int, default=7)
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        random.seed(options['seed'])
+        stream = [self._spec(options) for _ in range(options['orders'])]
+
+        books = (('Decimal prices', DecimalPriceBook), ('Integer ticks', ProductBook))
+        results = {}
+        # Best of several runs, alternating the books so machine noise hits
+        # both alike; orders are rebuilt each time because matching mutates
+        # them, and building them is not timed.
+        for _ in range(options['repeat']):
+            for name, book_class in books:
+                steps = [
+                    spec if isinstance(spec, int) else self._order(index, spec)
+                    for index, spec in enumerate(stream, 1)
+                ]
+                elapsed, fills = self._run(book_class(product_id=0, tick_size=TICK), steps)
+                best, _ = results.get(name, (elapsed, fills))
+                results[name] = (min(best, elapsed), fills)
+
+        cancels = sum(isinstance(spec, int) for spec in stream)
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f'{len(stream) - cancels} orders and {cancels} cancel requests, '
+            f'best of {options["repeat"]} runs'
+        ))
+        for name, (elapsed, fills) in results.items():
+            self.stdout.write(
+                f'{name + ":":<18} {len(stream) / elapsed:>12,.0f} steps/sec '
+                f'({elapsed * 1000:.0f} ms, {fills} fills)'
+            )
+        baseline = results['Decimal prices'][0]
+        self.stdout.write(f'Speedup:           {baseline / results["Integer ticks"][0]:.2f}x')
+
+    def _spec(self, options):
+        if random.random() < options['cancel_ratio']:
+            # A cancel step; the number picks which resting order it hits.
+            return random.randrange(1 << 30)
+        order_type = random.choice([Order.BUY, Order.SELL])
+        offset = random.randint(1, options['levels'])
+        crossing = random.random() < options['cross_ratio']
+        if (order_type == Order.BUY) == crossing:
+            price = options['mid_price'] + offset * TICK
+        else:
+            price = options['mid_price'] - offset * TICK
+        return (
+            random.randint(1, options['users']),
+            order_type,
+            max(price, TICK),
+            random.randint(1, options['max_quantity']),
+        )
+
+    def _order(self, order_id, spec):
+        user_id, order_type, price, quantity = spec
+        return Order(
+            id=order_id,
+            user_id=user_id,
+            product_id=0,
+            order_type=order_type,
+            quantity=quantity,
+            # A fresh Decimal per order, as for rows read from the database.
+            price=Decimal(str(price)),
+            remaining_quantity=quantity,
+        )
+
+    def _run(self, book, steps):
+        # The book steps of MatchingEngine.process_order for limit orders and
+        # of MatchingEngine.cancel_orders for resting ones.
+        fills = 0
+        resting = []
+        gc_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            started = time.perf_counter()
+            for step in steps:
+                if isinstance(step, int):
+                    # Swap-remove a resting id; ids already filled are no-ops,
+                    # as for a cancel that loses the race with a match.
+                    if resting:
+                        index = step % len(resting)
+                        resting[index], resting[-1] = resting[-1], resting[index]
+                        book.remove(resting.pop())
+                    continue
+                ticks = book.ticks(step.price)
+                matched, _ = book.match(step, ticks)
+                fills += len(matched)
+                if step.remaining_quantity and step.status in Order.OPEN_STATUSES:
+                    book.add(step, ticks)
+                    resting.append(step.id)
+            elapsed = time.perf_counter() - started
+        finally:
+            if gc_enabled:
+                gc.enable()
+        return elapsed, fills
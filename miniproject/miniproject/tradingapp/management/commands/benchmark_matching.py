@@ -0,0 +1,165 @@
+import random
+import statistics
+import time
+from decimal import Decimal
+
+from analyticsapp.models import TradingMetrics
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import override_settings
+from django.utils import timezone
+from productsapp.models import Category, Product
+from usersapp.models import User
+
+from tradingapp.engine import MatchingEngine
+from tradingapp.models import Order
+
+TICK = Decimal('0.01')
+
+OFFLINE_SETTINGS = {
+    'CACHES': {
+        'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}
+    },
+    'TRADING_STREAMING_ENABLED': False,
+    'TRADING_NOTIFICATIONS_ASYNC': False,
+}
+
+
+class QueryCounter:
+    """Execute wrapper counting statements without keeping a query log."""
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+class Command(BaseCommand):
+    help = (
+        'Drive a synthetic buy/sell order stream through the matching path and '
+        'report throughput, latency and queries per order.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--orders', type=int, default=10_000)
+        parser.add_argument('--products', type=int, default=10)
+        parser.add_argument('--users', type=int, default=20)
+        parser.add_argument('--mid-price', type=Decimal, default=Decimal('100.00'))
+        parser.add_argument(
+            '--price-spread', type=Decimal, default=Decimal('1.00'),
+            help='Scale of price offsets from the mid price.'
+        )
+        parser.add_argument(
+            '--distribution', choices=['normal', 'uniform'], default='normal',
+            help='Distribution of price offsets from the mid price.'
+        )
+        parser.add_argument(
+            '--cross-ratio', type=float, default=0.3,
+            help='Share of orders priced through the mid price (likely to fill).'
+        )
+        parser.add_argument('--max-quantity', type=int, default=100)
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument(
+            '--online', action='store_true',
+            help='Keep the configured cache and Redis publishing instead of '
+                 'in-process stand-ins.'
+        )
+        parser.add_argument(
+            '--keep', action='store_true',
+            help='Keep the generated products, users and orders.'
+        )
+
+    def handle(self, *args, **options):
+        random.seed(options['seed'])
+        if options['online']:
+            self._run(options)
+        else:
+            with override_settings(**OFFLINE_SETTINGS):
+                self._run(options)
+
+    def _run(self, options):
+        first_day = timezone.localdate()
+        category = Category.objects.create(
+            name='Matching benchmark',
+            slug=f'matching-benchmark-{random.getrandbits(32)}'
+        )
+        users = User.objects.bulk_create([
+            User(username=f'{category.slug}-{i}')
+            for i in range(options['users'])
+        ])
+        products = Product.objects.bulk_create([
+            Product(
+                name=f'Matching benchmark {i}',
+                slug=f'{category.slug}-{i}',
+                description='',
+                price=options['mid_price'],
+                category=category,
+            )
+            for i in range(options['products'])
+        ])
+
+        try:
+            self._benchmark(MatchingEngine(), users, products, options)
+        finally:
+            if not options['keep']:
+                category.delete()
+                User.objects.filter(id__in=[user.id for user in users]).delete()
+                # Trades feed the daily trading metrics as they commit;
+                # recount the days the run touched without them.
+                TradingMetrics.rollup(first_day, timezone.localdate())
+
+    def _price(self, order_type, options):
+        if options['distribution'] == 'normal':
+            offset = abs(random.gauss(0, 1))
+        else:
+            offset = random.random() * 2
+        offset = (options['price_spread'] * Decimal(offset)).quantize(TICK) + TICK
+
+        crossing = random.random() < options['cross_ratio']
+        if (order_type == Order.BUY) == crossing:
+            price = options['mid_price'] + offset
+        else:
+            price = options['mid_price'] - offset
+        return max(price, TICK)
+
+    def _order(self, users, products, options):
+        order_type = random.choice([Order.BUY, Order.SELL])
+        return Order(
+            user=random.choice(users),
+            product=random.choice(products),
+            order_type=order_type,
+            quantity=random.randint(1, options['max_quantity']),
+            price=self._price(order_type, options),
+        )
+
+    def _benchmark(self, engine, users, products, options):
+        latencies = []
+        fills = 0
+        counter = QueryCounter()
+
+        started = time.perf_counter()
+        with connection.execute_wrapper(counter):
+            for _ in range(options['orders']):
+                order = self._order(users, products, options)
+
+                # Same steps as the API plus the matching worker: insert the
+                # order, then match and persist its outcome.
+                order_started = time.perf_counter()
+                order.save()
+                fills += len(engine.process_order(order))
+                latencies.append(time.perf_counter() - order_started)
+        elapsed = time.perf_counter() - started
+
+        count = len(latencies)
+        percentiles = statistics.quantiles(latencies, n=100) if count > 1 else latencies * 99
+
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f'{count} orders over {len(products)} products on {connection.vendor}'
+        ))
+        self.stdout.write(f'Orders/sec:        {count / elapsed:,.0f}')
+        self.stdout.write(f'Fills/sec:         {fills / elapsed:,.0f} ({fills} fills)')
+        self.stdout.write(f'Latency p50:       {percentiles[49] * 1000:.3f} ms')
+        self.stdout.write(f'Latency p99:       {percentiles[98] * 1000:.3f} ms')
+        self.stdout.write(f'Queries per order: {counter.count / count:.2f}')
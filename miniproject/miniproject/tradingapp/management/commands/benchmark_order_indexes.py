@@ -0,0 +1,146 @@
+import random
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Count, Sum
+from productsapp.models import Category, Product
+from usersapp.models import User
+
+from tradingapp.engine import resting_orders
+from tradingapp.models import Order, OrderBook
+
+STATUS_WEIGHTS = {
+    Order.COMPLETED: 0.80,
+    Order.CANCELLED: 0.15,
+    Order.PENDING: 0.03,
+    Order.PARTIALLY_FILLED: 0.02,
+}
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        'Seed a large synthetic order history and print the PostgreSQL plans of '
+        'the matching and order book queries with and without the open-order '
+        'indexes.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--orders', type=int, default=1_000_000)
+        parser.add_argument('--products', type=int, default=100)
+        parser.add_argument('--users', type=int, default=50)
+        parser.add_argument('--batch-size', type=int, default=10_000)
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument(
+            '--keep', action='store_true',
+            help='Keep the seeded rows instead of deleting them afterwards.'
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('Query plans are only meaningful on PostgreSQL.')
+
+        random.seed(options['seed'])
+        category = Category.objects.create(
+            name='Index benchmark',
+            slug=f'index-benchmark-{random.getrandbits(32)}'
+        )
+        try:
+            products = self._seed(category, options)
+            with connection.cursor() as cursor:
+                cursor.execute(f'ANALYZE {Order._meta.db_table}')
+
+            product_id = products[len(products) // 2].id
+            self.stdout.write(self.style.MIGRATE_HEADING('With open-order indexes'))
+            self._explain(product_id)
+
+            self.stdout.write(self.style.MIGRATE_HEADING('Without open-order indexes'))
+            try:
+                with transaction.atomic():
+                    with connection.schema_editor() as editor:
+                        for index in Order._meta.indexes:
+                            editor.remove_index(Order, index)
+                    self._explain(product_id)
+                    raise _Rollback
+            except _Rollback:
+                pass
+        finally:
+            if not options['keep']:
+                # Cascades to the seeded products and orders.
+                category.delete()
+                User.objects.filter(username__startswith='index-bench-').delete()
+
+    def _seed(self, category, options):
+        products = Product.objects.bulk_create([
+            Product(
+                name=f'Index benchmark {i}',
+                slug=f'{category.slug}-{i}',
+                description='',
+                price=Decimal('100.00'),
+                category=category,
+            )
+            for i in range(options['products'])
+        ])
+        users = User.objects.bulk_create([
+            User(username=f'index-bench-{category.slug}-{i}')
+            for i in range(options['users'])
+        ])
+
+        statuses = list(STATUS_WEIGHTS)
+        weights = list(STATUS_WEIGHTS.values())
+        remaining = options['orders']
+        while remaining:
+            size = min(options['batch_size'], remaining)
+            batch = []
+            for _ in range(size):
+                quantity = random.randint(1, 100)
+                order_status = random.choices(statuses, weights)[0]
+                filled = quantity if order_status == Order.COMPLETED else 0
+                batch.append(Order(
+                    user=random.choice(users),
+                    product=random.choice(products),
+                    order_type=random.choice([Order.BUY, Order.SELL]),
+                    quantity=quantity,
+                    price=Decimal(random.randint(9000, 11000)) / 100,
+                    status=order_status,
+                    filled_quantity=filled,
+                    remaining_quantity=quantity - filled,
+                ))
+            Order.objects.bulk_create(batch)
+            # Open orders rest in the engine's book, as after matching.
+            OrderBook.objects.bulk_create([
+                OrderBook(order=order, product=order.product)
+                for order in batch if order.status in Order.OPEN_STATUSES
+            ])
+            remaining -= size
+            self.stdout.write(f'Seeded {options["orders"] - remaining} orders')
+        return products
+
+    def _explain(self, product_id):
+        open_orders = Order.objects.filter(
+            product_id=product_id,
+            status__in=Order.OPEN_STATUSES
+        )
+        queries = {
+            'Matching (asks crossing a buy at 100.00)': open_orders.filter(
+                order_type=Order.SELL,
+                price__lte=Decimal('100.00')
+            ).order_by('price', 'created_at')[:50],
+            # The same filters as the snapshot's database fallback and the
+            # engine's book load.
+            'Order book depth (bids)': resting_orders(product_id).filter(
+                order_type=Order.BUY
+            ).values('price').annotate(
+                quantity=Sum('remaining_quantity'),
+                orders=Count('id')
+            ).order_by('-price')[:10],
+            'Engine book load': resting_orders(product_id).order_by('created_at', 'id'),
+        }
+        for title, queryset in queries.items():
+            self.stdout.write(self.style.SUCCESS(title))
+            self.stdout.write(queryset.explain(analyze=True))
+            self.stdout.write('')
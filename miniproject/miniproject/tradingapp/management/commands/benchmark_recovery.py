@@ -0,0 +1,111 @@
+import tempfile
+import time
+
+from django.db import connection, transaction
+
+from tradingapp.engine import MatchingEngine
+from tradingapp.journal import BookJournal
+from tradingapp.models import Order
+
+from .benchmark_matching import TICK
+from .benchmark_matching import Command as MatchingBenchmark
+
+
+def book_state(book):
+    return {
+        order_id: (order.quantity, order.remaining_quantity)
+        for order_id, (order, _) in book.orders.items()
+    }
+
+
+class RecordingEngine(MatchingEngine):
+    """Counts the books that fell back to loading from the database."""
+
+    def __init__(self, journal=None):
+        super().__init__(journal=journal)
+        self.database_loads = 0
+
+    def _load_from_database(self, product_id, tick_size):
+        self.database_loads += 1
+        return super()._load_from_database(product_id, tick_size)
+
+
+class Command(MatchingBenchmark):
+    help = (
+        'Build books with a synthetic order stream while journaling, then '
+        'restart the engine and time the first order per product, which '
+        'recovers its book by snapshot and journal replay, against the same '
+        'order with a book reloaded from the database.'
+    )
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument(
+            '--snapshot-every', type=int, default=1000,
+            help='Operations per product between journal snapshots.'
+        )
+
+    def _restart(self, engine, restart_orders):
+        """
+        Process one committed order per product on a restarted engine, as a
+        matching worker would after a restart, then roll it all back so both
+        strategies start from the same state.
+        """
+        with transaction.atomic():
+            orders = list(Order.objects.filter(id__in=[order.id for order in restart_orders]))
+            started = time.perf_counter()
+            for order in orders:
+                engine.process_order(order)
+            elapsed = time.perf_counter() - started
+            books = {order.product_id: book_state(engine.get_book(order.product_id)) for order in orders}
+            transaction.set_rollback(True)
+        return elapsed, books
+
+    def _benchmark(self, engine, users, products, options):
+        with tempfile.TemporaryDirectory() as directory:
+            journal = BookJournal(directory, snapshot_every=options['snapshot_every'])
+            engine = MatchingEngine(journal=journal)
+            for _ in range(options['orders']):
+                order = self._order(users, products, options)
+                order.save()
+                engine.process_order(order)
+
+            live = {product.id: book_state(engine.get_book(product.id)) for product in products}
+            events = sum(
+                sum(1 for _ in open(journal.log_path(product.id)))
+                for product in products if journal.log_path(product.id).exists()
+            )
+
+            # Committed but not yet matched when the worker restarts; a bid
+            # at the lowest tick rests without trading.
+            restart_orders = []
+            for product in products:
+                order = Order(
+                    user=users[0], product=product, order_type=Order.BUY,
+                    quantity=1, price=TICK,
+                )
+                order.save()
+                restart_orders.append(order)
+                live[product.id][order.id] = (1, 1)
+
+            try:
+                replaying = RecordingEngine(journal=journal)
+                journal_elapsed, journal_books = self._restart(replaying, restart_orders)
+                reloading = RecordingEngine()
+                database_elapsed, database_books = self._restart(reloading, restart_orders)
+            finally:
+                Order.objects.filter(id__in=[order.id for order in restart_orders]).delete()
+
+        consistent = journal_books == live and database_books == live
+        resting = sum(len(state) for state in live.values()) - len(restart_orders)
+
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f'{len(products)} books, {resting} resting orders, {events} journal '
+            f'events after the last snapshots, on {connection.vendor}'
+        ))
+        self.stdout.write(f'Database reload:   {database_elapsed * 1000:.1f} ms')
+        self.stdout.write(
+            f'Journal recovery:  {journal_elapsed * 1000:.1f} ms '
+            f'({len(products) - replaying.database_loads} of {len(products)} books replayed)'
+        )
+        self.stdout.write(f'Books identical:   {"yes" if consistent else "NO"}')
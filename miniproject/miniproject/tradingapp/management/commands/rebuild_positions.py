@@ -0,0 +1,58 @@
+from itertools import chain
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from tradingapp.models import Position, Transaction, TransactionArchive
+from tradingapp.positions import fold_fills
+
+
+class Command(BaseCommand):
+    help = (
+        'Recompute positions by replaying archived and live trades in '
+        'execution order. Run it with matching stopped for the products '
+        'being rebuilt.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--product-id', type=int, action='append', dest='product_ids',
+            help='Only rebuild this product (repeatable).'
+        )
+        parser.add_argument('--chunk-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        product_ids = options['product_ids']
+        if not product_ids:
+            product_ids = sorted(
+                set(Transaction.objects.values_list('buy_order__product_id', flat=True).distinct())
+                | set(TransactionArchive.objects.values_list('product_id', flat=True).distinct())
+            )
+
+        for product_id in product_ids:
+            with transaction.atomic():
+                count = self._rebuild(product_id, options['chunk_size'])
+            self.stdout.write(f'Product {product_id}: {count} positions')
+
+    def _rebuild(self, product_id, chunk_size):
+        # Archived trades all precede the live ones.
+        archived = TransactionArchive.objects.filter(product_id=product_id).order_by(
+            'executed_at', 'id'
+        ).values_list('buyer_id', 'seller_id', 'quantity', 'price')
+        live = Transaction.objects.filter(buy_order__product_id=product_id).order_by(
+            'executed_at', 'id'
+        ).values_list('buyer_id', 'seller_id', 'quantity', 'price')
+
+        positions = {}
+        trades = chain(archived.iterator(chunk_size), live.iterator(chunk_size))
+        for buyer_id, seller_id, quantity, price in trades:
+            _, created = fold_fills(
+                product_id,
+                [(buyer_id, quantity, price), (seller_id, -quantity, price)],
+                positions
+            )
+            positions.update((position.user_id, position) for position in created)
+
+        Position.objects.filter(product_id=product_id).delete()
+        Position.objects.bulk_create(positions.values(), batch_size=chunk_size)
+        return len(positions)
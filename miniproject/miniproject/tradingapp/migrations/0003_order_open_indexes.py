@@ -0,0 +1,24 @@
+# Generated by Django 5.1.6 on 2026-10-17 16:18
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('productsapp', '0001_initial'),
+        ('tradingapp', '0002_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(condition=models.Q(('status__in', ['pending', 'partially_filled'])), fields=['product', 'order_type', 'price', 'created_at'], name='order_open_book_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(condition=models.Q(('status__in', ['pending', 'partially_filled'])), fields=['product', 'created_at', 'id'], name='order_open_product_idx'),
+        ),
+    ]
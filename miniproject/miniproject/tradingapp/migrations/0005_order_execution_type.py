@@ -0,0 +1,32 @@
+# Generated by Django 5.1.6 on 2026-10-17 16:23
+
+import django.core.validators
+from decimal import Decimal
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('productsapp', '0001_initial'),
+        ('tradingapp', '0004_candle'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='execution_type',
+            field=models.CharField(choices=[('limit', 'Limit'), ('market', 'Market'), ('ioc', 'Immediate or Cancel'), ('fok', 'Fill or Kill')], default='limit', max_length=6),
+        ),
+        migrations.AlterField(
+            model_name='order',
+            name='price',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True, validators=[django.core.validators.MinValueValidator(Decimal('0.01'))]),
+        ),
+        migrations.AddConstraint(
+            model_name='order',
+            constraint=models.CheckConstraint(condition=models.Q(('execution_type', 'market'), ('price__isnull', False), _connector='OR'), name='order_price_unless_market'),
+        ),
+    ]
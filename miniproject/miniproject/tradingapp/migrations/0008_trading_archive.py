@@ -0,0 +1,52 @@
+# Generated by Django 5.1.6 on 2026-10-17 17:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tradingapp', '0007_notification_unread_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrderArchive',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('user_id', models.BigIntegerField()),
+                ('product_id', models.BigIntegerField()),
+                ('order_type', models.CharField(choices=[('buy', 'Buy'), ('sell', 'Sell')], max_length=4)),
+                ('execution_type', models.CharField(choices=[('limit', 'Limit'), ('market', 'Market'), ('ioc', 'Immediate or Cancel'), ('fok', 'Fill or Kill')], max_length=6)),
+                ('quantity', models.PositiveIntegerField()),
+                ('price', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('completed', 'Completed'), ('cancelled', 'Cancelled'), ('partially_filled', 'Partially Filled')], max_length=20)),
+                ('filled_quantity', models.PositiveIntegerField()),
+                ('remaining_quantity', models.PositiveIntegerField()),
+                ('created_at', models.DateTimeField()),
+                ('updated_at', models.DateTimeField()),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user_id', 'created_at', 'id'], name='orderarchive_user_created_idx'), models.Index(fields=['created_at'], name='orderarchive_created_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='TransactionArchive',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('buy_order_id', models.BigIntegerField()),
+                ('sell_order_id', models.BigIntegerField()),
+                ('product_id', models.BigIntegerField()),
+                ('buyer_id', models.BigIntegerField()),
+                ('seller_id', models.BigIntegerField()),
+                ('quantity', models.PositiveIntegerField()),
+                ('price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('executed_at', models.DateTimeField()),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['executed_at', 'id'], name='txarchive_executed_idx'), models.Index(fields=['product_id', 'executed_at'], name='txarchive_product_idx')],
+            },
+        ),
+    ]
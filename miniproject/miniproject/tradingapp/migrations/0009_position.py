@@ -0,0 +1,34 @@
+# Generated by Django 5.1.6 on 2026-10-17 17:19
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('productsapp', '0001_initial'),
+        ('tradingapp', '0008_trading_archive'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Position',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.IntegerField(default=0)),
+                ('average_cost', models.DecimalField(decimal_places=4, default=Decimal('0'), max_digits=14)),
+                ('realized_pnl', models.DecimalField(decimal_places=4, default=Decimal('0'), max_digits=16)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='positions', to='productsapp.product')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='positions', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['product'],
+                'unique_together': {('user', 'product')},
+            },
+        ),
+    ]
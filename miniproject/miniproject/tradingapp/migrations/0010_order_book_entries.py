@@ -0,0 +1,32 @@
+from django.db import migrations
+
+OPEN_STATUSES = ['pending', 'partially_filled']
+
+
+def add_missing_entries(apps, schema_editor):
+    # Books are loaded from OrderBook entries, which the matching engine
+    # writes for orders it has processed. Open limit orders placed before
+    # the engine had none; they were matched on save, so they rest as-is.
+    # Run with the matching queues drained.
+    Order = apps.get_model('tradingapp', 'Order')
+    OrderBook = apps.get_model('tradingapp', 'OrderBook')
+    missing = Order.objects.filter(
+        execution_type='limit',
+        status__in=OPEN_STATUSES,
+        order_book_entry__isnull=True,
+    ).values_list('id', 'product_id')
+    OrderBook.objects.bulk_create(
+        (OrderBook(order_id=order_id, product_id=product_id) for order_id, product_id in missing.iterator()),
+        batch_size=5000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tradingapp', '0009_position'),
+    ]
+
+    operations = [
+        migrations.RunPython(add_missing_entries, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,24 @@
+from django.db import migrations
+from django.db.models import OuterRef, Subquery
+
+
+def fill_users(apps, schema_editor):
+    # A separate migration from the NOT NULL change: PostgreSQL refuses to
+    # alter a table with foreign key checks still pending from the UPDATE.
+    Order = apps.get_model('tradingapp', 'Order')
+    Transaction = apps.get_model('tradingapp', 'Transaction')
+    Transaction.objects.filter(buyer__isnull=True).update(
+        buyer_id=Subquery(Order.objects.filter(id=OuterRef('buy_order_id')).values('user_id')[:1]),
+        seller_id=Subquery(Order.objects.filter(id=OuterRef('sell_order_id')).values('user_id')[:1]),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tradingapp', '0011_transaction_buyer_seller'),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_users, migrations.RunPython.noop),
+    ]
@@ -26,14 +26,29 @@ class Order(models.Model):
         (CANCELLED, 'Cancelled'),
         (PARTIALLY_FILLED, 'Partially Filled'),
     ]
+    OPEN_STATUSES = [PENDING, PARTIALLY_FILLED]
+
+    LIMIT = 'limit'
+    MARKET = 'market'
+    IMMEDIATE_OR_CANCEL = 'ioc'
+    FILL_OR_KILL = 'fok'
+    EXECUTION_TYPES = [
+        (LIMIT, 'Limit'),
+        (MARKET, 'Market'),
+        (IMMEDIATE_OR_CANCEL, 'Immediate or Cancel'),
+        (FILL_OR_KILL, 'Fill or Kill'),
+    ]
 
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='orders')
     product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='orders')
     order_type = models.CharField(max_length=4, choices=ORDER_TYPES)
+    execution_type = models.CharField(max_length=6, choices=EXECUTION_TYPES, default=LIMIT)
     quantity = models.PositiveIntegerField(validators=[MinValueValidator(1)])
     price = models.DecimalField(
         max_digits=10, 
         decimal_places=2, 
+        null=True,
+        blank=True,
         validators=[MinValueValidator(Decimal('0.01'))]
     )
     status = models.CharField(max_length=20, choices=ORDER_STATUS, default=PENDING)
@@ -42,22 +57,79 @@ class Order(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            # Partial indexes over the open book only: matching and depth
+            # queries never look at completed or cancelled orders.
+            models.Index(
+                fields=['product', 'order_type', 'price', 'created_at'],
+                condition=models.Q(status__in=['pending', 'partially_filled']),
+                name='order_open_book_idx',
+            ),
+            models.Index(
+                fields=['product', 'created_at', 'id'],
+                condition=models.Q(status__in=['pending', 'partially_filled']),
+                name='order_open_product_idx',
+            ),
+            # Keyset pagination of a user's order history.
+            models.Index(
+                fields=['user', 'created_at', 'id'],
+                name='order_user_created_idx',
+            ),
+        ]
+        constraints = [
+            models.CheckConstraint(
+                condition=models.Q(execution_type='market') | models.Q(price__isnull=False),
+                name='order_price_unless_market',
+            ),
+        ]
+
+    @property
+    def rests(self):
+        """Only limit orders may keep an unfilled remainder in the book."""
+        return self.execution_type == self.LIMIT
+
     def save(self, *args, **kwargs):
         if not self.id:  # New order
             self.remaining_quantity = self.quantity
         super().save(*args, **kwargs)
 
     def __str__(self):
-        return f"{self.order_type.upper()} {self.quantity} {self.product.name} at {self.price}"
+        price = self.price if self.price is not None else 'market'
+        return f"{self.order_type.upper()} {self.quantity} {self.product.name} at {price}"
 
 
 class Transaction(models.Model):
     buy_order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='buy_transactions')
     sell_order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='sell_transactions')
+    # Copied from the orders, as on TransactionArchive, so a user's trades
+    # are read from their own index instead of joining every order.
+    buyer = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name='buy_trades', db_index=False
+    )
+    seller = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name='sell_trades', db_index=False
+    )
     quantity = models.PositiveIntegerField()
     price = models.DecimalField(max_digits=10, decimal_places=2)
     executed_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['executed_at', 'id'], name='transaction_executed_idx'),
+            # Keyset pagination of a user's trades, one index per side.
+            models.Index(fields=['buyer', 'executed_at', 'id'], name='transaction_buyer_idx'),
+            models.Index(fields=['seller', 'executed_at', 'id'], name='transaction_seller_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        # The matching engine sets both when it bulk-creates trades.
+        if self.buyer_id is None:
+            self.buyer_id = self.buy_order.user_id
+        if self.seller_id is None:
+            self.seller_id = self.sell_order.user_id
+        super().save(*args, **kwargs)
+
     def __str__(self):
         return f"Transaction: {self.quantity} at {self.price}"
 
@@ -71,6 +143,122 @@ class OrderBook(models.Model):
         ordering = ['-order__price', '-created_at']
 
 
+class OrderArchive(models.Model):
+    """
+    Completed and cancelled orders moved out of the live Order table. Keys
+    are plain columns rather than foreign keys, so the archive puts no
+    constraints on the live tables.
+    """
+
+    id = models.BigIntegerField(primary_key=True)
+    user_id = models.BigIntegerField()
+    product_id = models.BigIntegerField()
+    order_type = models.CharField(max_length=4, choices=Order.ORDER_TYPES)
+    execution_type = models.CharField(max_length=6, choices=Order.EXECUTION_TYPES)
+    quantity = models.PositiveIntegerField()
+    price = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    status = models.CharField(max_length=20, choices=Order.ORDER_STATUS)
+    filled_quantity = models.PositiveIntegerField()
+    remaining_quantity = models.PositiveIntegerField()
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user_id', 'created_at', 'id'], name='orderarchive_user_created_idx'),
+            models.Index(fields=['created_at'], name='orderarchive_created_idx'),
+        ]
+
+    def __str__(self):
+        return f"Archived order {self.id}"
+
+
+class TransactionArchive(models.Model):
+    """
+    Trades moved out of the live Transaction table, with the product and
+    both users denormalized so reports need no join to archived orders.
+    """
+
+    id = models.BigIntegerField(primary_key=True)
+    buy_order_id = models.BigIntegerField()
+    sell_order_id = models.BigIntegerField()
+    product_id = models.BigIntegerField()
+    buyer_id = models.BigIntegerField()
+    seller_id = models.BigIntegerField()
+    quantity = models.PositiveIntegerField()
+    price = models.DecimalField(max_digits=10, decimal_places=2)
+    executed_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['executed_at', 'id'], name='txarchive_executed_idx'),
+            models.Index(fields=['product_id', 'executed_at'], name='txarchive_product_idx'),
+        ]
+
+    def __str__(self):
+        return f"Archived transaction {self.id}"
+
+
+class Candle(models.Model):
+    ONE_MINUTE = '1m'
+    FIVE_MINUTES = '5m'
+    ONE_HOUR = '1h'
+    ONE_DAY = '1d'
+    INTERVALS = [
+        (ONE_MINUTE, '1 Minute'),
+        (FIVE_MINUTES, '5 Minutes'),
+        (ONE_HOUR, '1 Hour'),
+        (ONE_DAY, '1 Day'),
+    ]
+    INTERVAL_SECONDS = {
+        ONE_MINUTE: 60,
+        FIVE_MINUTES: 5 * 60,
+        ONE_HOUR: 60 * 60,
+        ONE_DAY: 24 * 60 * 60,
+    }
+
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='candles')
+    interval = models.CharField(max_length=2, choices=INTERVALS)
+    start = models.DateTimeField()
+    open = models.DecimalField(max_digits=10, decimal_places=2)
+    high = models.DecimalField(max_digits=10, decimal_places=2)
+    low = models.DecimalField(max_digits=10, decimal_places=2)
+    close = models.DecimalField(max_digits=10, decimal_places=2)
+    volume = models.PositiveIntegerField(default=0)
+    trade_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ['product', 'interval', 'start']
+        ordering = ['start']
+
+    def __str__(self):
+        return f"{self.product_id} {self.interval} candle at {self.start}"
+
+
+class Position(models.Model):
+    """
+    Net holding of one product for one user, kept up to date by the matching
+    engine. ``quantity`` is signed: a negative value is a short position,
+    and ``average_cost`` is the average entry price of what is still open.
+    """
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='positions')
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='positions')
+    quantity = models.IntegerField(default=0)
+    average_cost = models.DecimalField(max_digits=14, decimal_places=4, default=Decimal('0'))
+    realized_pnl = models.DecimalField(max_digits=16, decimal_places=4, default=Decimal('0'))
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ['user', 'product']
+        ordering = ['product']
+
+    def __str__(self):
+        return f"{self.user_id} holds {self.quantity} of {self.product_id}"
+
+
 class Notification(models.Model):
     TRADE_EXECUTION = 'trade_execution'
     ORDER_MATCH = 'order_match'
@@ -89,23 +277,59 @@ class Notification(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(
+                fields=['user', 'created_at', 'id'],
+                name='notification_user_created_idx',
+            ),
+            # Recounts an unread badge after its cached counter expired.
+            models.Index(
+                fields=['user'],
+                condition=models.Q(read=False),
+                name='notification_unread_idx',
+            ),
+        ]
 
     def __str__(self):
         return f"{self.notification_type}: {self.message[:50]}"
 
 
+def build_trade_notifications(trade, product_name):
+    """Unsaved buyer and seller notifications for an executed trade."""
+    return [
+        Notification(
+            user_id=trade.buy_order.user_id,
+            notification_type=Notification.TRADE_EXECUTION,
+            message=f"Buy order executed: {trade.quantity} {product_name} at {trade.price}"
+        ),
+        Notification(
+            user_id=trade.sell_order.user_id,
+            notification_type=Notification.TRADE_EXECUTION,
+            message=f"Sell order executed: {trade.quantity} {product_name} at {trade.price}"
+        ),
+    ]
+
+
+def build_cancel_notification(order, product_name):
+    """Unsaved notification telling the owner an order's remainder was cancelled."""
+    price = order.price if order.price is not None else 'market'
+    return Notification(
+        user_id=order.user_id,
+        notification_type=Notification.ORDER_CANCEL,
+        message=(
+            f"{order.order_type.capitalize()} order cancelled: "
+            f"{order.remaining_quantity} {product_name} at {price}"
+        )
+    )
+
+
 @receiver(post_save, sender=Transaction)
 def create_transaction_notification(sender, instance, created, **kwargs):
+    # The matching engine bulk-creates trades and their notifications; this
+    # covers transactions saved one at a time (admin, shell, fixtures).
     if created:
-        # Notify buyer
-        Notification.objects.create(
-            user=instance.buy_order.user,
-            notification_type=Notification.TRADE_EXECUTION,
-            message=f"Buy order executed: {instance.quantity} {instance.buy_order.product.name} at {instance.price}"
-        )
-        # Notify seller
-        Notification.objects.create(
-            user=instance.sell_order.user,
-            notification_type=Notification.TRADE_EXECUTION,
-            message=f"Sell order executed: {instance.quantity} {instance.sell_order.product.name} at {instance.price}"
+        # Imported here: the pipeline module depends on these models.
+        from .notifications import dispatch_notifications
+        dispatch_notifications(
+            build_trade_notifications(instance, instance.buy_order.product.name)
         )
@@ -0,0 +1,141 @@
+import json
+import logging
+from collections import Counter
+
+import redis
+from celery import current_app
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import Notification
+from .streaming import get_client, publish_notifications
+
+logger = logging.getLogger(__name__)
+
+PENDING_KEY = 'notifications:pending'
+FLUSH_SCHEDULED_KEY = 'notifications:flush-scheduled'
+
+
+def unread_key(user_id):
+    return f'notifications:unread:{user_id}'
+
+
+def get_unread_count(user_id):
+    """
+    Cached unread count. A miss is filled from the partial unread index and
+    expires after ``TRADING_UNREAD_COUNT_TTL``, so any drift heals itself.
+    """
+    key = unread_key(user_id)
+    count = cache.get(key)
+    if count is None:
+        count = Notification.objects.filter(user_id=user_id, read=False).count()
+        # add() so increments that raced with the count are not overwritten.
+        if not cache.add(key, count, timeout=settings.TRADING_UNREAD_COUNT_TTL):
+            count = cache.get(key, count)
+    return max(count, 0)
+
+
+def adjust_unread(deltas):
+    """
+    Apply per-user unread deltas. incr/decr are atomic and leave missing
+    counters alone; the next read counts those from the database.
+    """
+    for user_id, delta in deltas.items():
+        if not delta:
+            continue
+        try:
+            if delta > 0:
+                cache.incr(unread_key(user_id), delta)
+            else:
+                cache.decr(unread_key(user_id), -delta)
+        except ValueError:
+            pass
+
+
+def write_notifications(notifications):
+    """
+    Insert a batch in one statement, grouped by user, then bump each user's
+    counter once and publish after commit.
+    """
+    notifications = sorted(notifications, key=lambda notification: notification.user_id)
+    with transaction.atomic():
+        created = Notification.objects.bulk_create(notifications)
+
+        def after_commit():
+            adjust_unread(Counter(notification.user_id for notification in created))
+            publish_notifications(created)
+
+        transaction.on_commit(after_commit)
+    return created
+
+
+def _payload(notification):
+    return json.dumps({
+        'user_id': notification.user_id,
+        'notification_type': notification.notification_type,
+        'message': notification.message,
+    })
+
+
+def _enqueue(notifications):
+    client = get_client()
+    try:
+        client.rpush(PENDING_KEY, *[_payload(notification) for notification in notifications])
+        # One flush per burst: later enqueues ride on the scheduled task.
+        delay = settings.TRADING_NOTIFICATION_FLUSH_DELAY
+        if client.set(FLUSH_SCHEDULED_KEY, 1, nx=True, ex=delay + 60):
+            current_app.send_task(
+                'tradingapp.tasks.flush_notifications',
+                countdown=delay
+            )
+    except redis.RedisError:
+        logger.warning(
+            'Could not buffer %d notifications, writing them inline',
+            len(notifications), exc_info=True
+        )
+        write_notifications(notifications)
+
+
+def dispatch_notifications(notifications):
+    """
+    Hand unsaved notifications to the delivery pipeline. With
+    ``TRADING_NOTIFICATIONS_ASYNC`` they are buffered in Redis once the
+    caller's transaction commits and written in batches by
+    ``flush_notifications``; otherwise they are written in the caller's
+    transaction.
+    """
+    notifications = list(notifications)
+    if not notifications:
+        return
+    if settings.TRADING_NOTIFICATIONS_ASYNC:
+        transaction.on_commit(lambda: _enqueue(notifications))
+    else:
+        write_notifications(notifications)
+
+
+def flush_pending(batch_size=None):
+    """Drain the buffer in batches; returns the number of notifications written."""
+    batch_size = batch_size or settings.TRADING_NOTIFICATION_BATCH_SIZE
+    client = get_client()
+    # Cleared first, so anything enqueued from here on schedules a new flush.
+    client.delete(FLUSH_SCHEDULED_KEY)
+
+    flushed = 0
+    while True:
+        with client.pipeline() as pipe:
+            pipe.lrange(PENDING_KEY, 0, batch_size - 1)
+            pipe.ltrim(PENDING_KEY, batch_size, -1)
+            payloads, _ = pipe.execute()
+        if not payloads:
+            break
+        try:
+            write_notifications([Notification(**json.loads(payload)) for payload in payloads])
+        except Exception:
+            # Put the batch back at the head for the next flush.
+            client.lpush(PENDING_KEY, *reversed(payloads))
+            raise
+        flushed += len(payloads)
+        if len(payloads) < batch_size:
+            break
+    return flushed
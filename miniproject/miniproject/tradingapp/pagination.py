@@ -0,0 +1,102 @@
+import base64
+import json
+from collections import OrderedDict
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Newest-first keyset pagination over ``(<ordering_field>, id)``. The
+    cursor carries the last row's key, so every page is one range scan of
+    the matching index however deep the client has paged.
+    """
+
+    ordering_field = 'created_at'
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def get_page_size(self, request):
+        page_size = request.query_params.get(self.page_size_query_param, '')
+        if page_size.isdigit() and int(page_size) > 0:
+            return min(int(page_size), settings.TRADING_MAX_PAGE_SIZE)
+        return settings.TRADING_PAGE_SIZE
+
+    def encode_cursor(self, row):
+        position = [getattr(row, self.ordering_field).isoformat(), row.id]
+        return base64.urlsafe_b64encode(json.dumps(position).encode()).decode()
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            moment, row_id = json.loads(base64.urlsafe_b64decode(encoded.encode()))
+            moment = parse_datetime(moment)
+            if moment is None or not isinstance(row_id, int):
+                raise ValueError(encoded)
+        except (TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+        return moment, row_id
+
+    def window(self, queryset, position, limit):
+        field = self.ordering_field
+        queryset = queryset.order_by(f'-{field}', '-id')
+        if position is not None:
+            moment, row_id = position
+            # The redundant ``<=`` bound gives the planner an index range;
+            # the OR only breaks ties on the boundary timestamp.
+            queryset = queryset.filter(**{f'{field}__lte': moment}).filter(
+                Q(**{f'{field}__lt': moment}) | Q(id__lt=row_id)
+            )
+        return list(queryset[:limit])
+
+    def paginate_queryset(self, queryset, request, view=None):
+        """
+        ``queryset`` may also be a list of querysets over one model, each
+        backed by its own index: every one is read as a separate range scan
+        of at most a page, and the pages are merged.
+        """
+        self.request = request
+        page_size = self.get_page_size(request)
+        position = self.decode_cursor(request)
+
+        if isinstance(queryset, (list, tuple)):
+            merged = {}
+            for branch in queryset:
+                merged.update((row.id, row) for row in self.window(branch, position, page_size + 1))
+            field = self.ordering_field
+            rows = sorted(
+                merged.values(), key=lambda row: (getattr(row, field), row.id), reverse=True
+            )[:page_size + 1]
+        else:
+            rows = self.window(queryset, position, page_size + 1)
+        self.next_cursor = self.encode_cursor(rows[page_size - 1]) if len(rows) > page_size else None
+        return rows[:page_size]
+
+    def get_next_link(self):
+        if self.next_cursor is None:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.next_cursor)
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('results', data),
+        ]))
+
+
+class CreatedAtPagination(KeysetPagination):
+    ordering_field = 'created_at'
+
+
+class ExecutedAtPagination(KeysetPagination):
+    ordering_field = 'executed_at'
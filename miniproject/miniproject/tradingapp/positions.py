@@ -0,0 +1,79 @@
+from decimal import Decimal
+
+from django.utils import timezone
+
+from .models import Position
+
+COST_PLACES = Decimal('0.0001')
+
+
+def apply_fill(position, quantity, price):
+    """
+    Fold one signed fill (positive buys, negative sells) into a position.
+    Adding to a position moves its average cost; reducing it realizes P&L
+    against that cost, and flipping through zero opens the rest at ``price``.
+    """
+    held = position.quantity
+    if held == 0 or (held > 0) == (quantity > 0):
+        total = abs(held) + abs(quantity)
+        position.average_cost = (
+            (position.average_cost * abs(held) + price * abs(quantity)) / total
+        ).quantize(COST_PLACES)
+    else:
+        closed = min(abs(held), abs(quantity))
+        direction = 1 if held > 0 else -1
+        position.realized_pnl += (price - position.average_cost) * closed * direction
+        if abs(quantity) > abs(held):
+            position.average_cost = price
+        elif abs(quantity) == abs(held):
+            position.average_cost = Decimal('0')
+    position.quantity = held + quantity
+
+
+def fold_fills(product_id, fills, existing):
+    """
+    Apply ``(user_id, signed_quantity, price)`` fills in order to the
+    ``existing`` positions by user id; returns the positions that were
+    updated and the ones that must be created.
+    """
+    updated, created = {}, {}
+    for user_id, quantity, price in fills:
+        position = existing.get(user_id) or created.get(user_id)
+        if position is None:
+            position = created[user_id] = Position(user_id=user_id, product_id=product_id)
+        elif user_id in existing:
+            updated[user_id] = position
+        apply_fill(position, quantity, price)
+    return list(updated.values()), list(created.values())
+
+
+def update_positions(product_id, trades):
+    """
+    Fold a batch of trades (in execution order) into both sides' positions:
+    one read of the affected rows, then one bulk update and one bulk insert.
+    """
+    if not trades:
+        return
+
+    fills = []
+    for trade in trades:
+        fills.append((trade.buy_order.user_id, trade.quantity, trade.price))
+        fills.append((trade.sell_order.user_id, -trade.quantity, trade.price))
+
+    existing = {
+        position.user_id: position
+        for position in Position.objects.filter(
+            product_id=product_id,
+            user_id__in={user_id for user_id, _, _ in fills}
+        )
+    }
+    updated, created = fold_fills(product_id, fills, existing)
+
+    if updated:
+        now = timezone.now()
+        for position in updated:
+            position.updated_at = now
+        Position.objects.bulk_update(
+            updated, ['quantity', 'average_cost', 'realized_pnl', 'updated_at']
+        )
+    Position.objects.bulk_create(created)
@@ -0,0 +1,198 @@
+from collections import defaultdict
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import DecimalField, ExpressionWrapper, F, Sum
+
+from .models import Order, Position
+
+RETRY_MESSAGE = 'Risk limits changed while checking the order; please retry.'
+
+
+def exposure_key(user_id):
+    return f'risk:exposure:{user_id}'
+
+
+def sellable_key(user_id, product_id):
+    return f'risk:sellable:{user_id}:{product_id}'
+
+
+def _cents(amount):
+    return int(amount * 100)
+
+
+def order_notional(attrs):
+    """Notional of an order; market orders are valued at the product's list price."""
+    price = attrs.get('price')
+    if price is None:
+        price = attrs['product'].price
+    return price * attrs['quantity']
+
+
+def _load_exposure(user_id):
+    notional = Order.objects.filter(
+        user_id=user_id,
+        execution_type=Order.LIMIT,
+        status__in=Order.OPEN_STATUSES
+    ).aggregate(total=Sum(ExpressionWrapper(
+        F('price') * F('remaining_quantity'),
+        output_field=DecimalField(max_digits=20, decimal_places=2)
+    )))['total']
+    return _cents(notional or Decimal('0'))
+
+
+def _load_sellable(user_id, product_ids):
+    held = dict(
+        Position.objects.filter(user_id=user_id, product_id__in=product_ids)
+        .values_list('product_id', 'quantity')
+    )
+    offered = dict(
+        Order.objects.filter(
+            user_id=user_id,
+            product_id__in=product_ids,
+            order_type=Order.SELL,
+            status__in=Order.OPEN_STATUSES
+        ).values('product_id').annotate(total=Sum('remaining_quantity'))
+        .values_list('product_id', 'total')
+    )
+    return {
+        product_id: held.get(product_id, 0) - offered.get(product_id, 0)
+        for product_id in product_ids
+    }
+
+
+def _load_state(user_id, product_ids):
+    """
+    Cached exposure (cents of open notional) and sellable quantity per
+    product. Misses are filled from the database in one query per figure.
+    """
+    keys = [exposure_key(user_id)] + [sellable_key(user_id, pid) for pid in product_ids]
+    cached = cache.get_many(keys)
+    timeout = settings.TRADING_RISK_STATE_TTL
+
+    exposure = cached.get(exposure_key(user_id))
+    if exposure is None:
+        exposure = _load_exposure(user_id)
+        cache.add(exposure_key(user_id), exposure, timeout=timeout)
+
+    sellable = {
+        product_id: cached[sellable_key(user_id, product_id)]
+        for product_id in product_ids
+        if sellable_key(user_id, product_id) in cached
+    }
+    missing = [product_id for product_id in product_ids if product_id not in sellable]
+    if missing:
+        loaded = _load_sellable(user_id, missing)
+        for product_id, quantity in loaded.items():
+            cache.add(sellable_key(user_id, product_id), quantity, timeout=timeout)
+        sellable.update(loaded)
+    return exposure, sellable
+
+
+def _static_error(attrs):
+    """Checks that need nothing but the order and its (already loaded) product."""
+    product = attrs['product']
+    if not product.is_active:
+        return 'Product is not open for trading.'
+    if product.stock and attrs['quantity'] > product.stock:
+        return f'Quantity exceeds the product stock of {product.stock}.'
+    if order_notional(attrs) > settings.TRADING_MAX_ORDER_NOTIONAL:
+        return f'Order notional exceeds {settings.TRADING_MAX_ORDER_NOTIONAL}.'
+    return None
+
+
+def _reserve(user_id, exposure_cents, sold):
+    """
+    Atomically take the accepted orders' exposure and sell quantities from
+    the cached state, backing out if a concurrent request got there first.
+    A counter that expired meanwhile is left to be reloaded.
+    """
+    applied = []
+    try:
+        if exposure_cents:
+            try:
+                total = cache.incr(exposure_key(user_id), exposure_cents)
+                applied.append((exposure_key(user_id), exposure_cents))
+                if total > _cents(settings.TRADING_MAX_OPEN_NOTIONAL):
+                    return False
+            except ValueError:
+                pass
+        for product_id, quantity in sold.items():
+            try:
+                remaining = cache.decr(sellable_key(user_id, product_id), quantity)
+                applied.append((sellable_key(user_id, product_id), -quantity))
+                if remaining < 0 and not settings.TRADING_ALLOW_SHORT_SELLING:
+                    return False
+            except ValueError:
+                pass
+        applied = []
+        return True
+    finally:
+        for key, delta in applied:
+            try:
+                cache.decr(key, delta)
+            except ValueError:
+                pass
+
+
+def check_orders(user, orders):
+    """
+    Pre-trade checks for a batch of validated order attributes from one
+    user, in submission order. Returns one error message (or None) per
+    order and reserves exposure and sellable quantity for the accepted ones.
+    """
+    errors = [_static_error(attrs) for attrs in orders]
+    if all(errors):
+        return errors
+
+    # Sellable quantity only matters while short selling is disallowed.
+    limit_sells = not settings.TRADING_ALLOW_SHORT_SELLING
+    sell_products = {
+        attrs['product'].id for attrs, error in zip(orders, errors)
+        if limit_sells and not error and attrs['order_type'] == Order.SELL
+    }
+    exposure, sellable = _load_state(user.id, sell_products)
+    limit = _cents(settings.TRADING_MAX_OPEN_NOTIONAL)
+
+    exposure_cents = 0
+    sold = defaultdict(int)
+    for index, attrs in enumerate(orders):
+        if errors[index]:
+            continue
+        cents = _cents(order_notional(attrs)) if attrs.get('price') is not None else 0
+        if exposure + exposure_cents + cents > limit:
+            errors[index] = f'Open order notional would exceed {settings.TRADING_MAX_OPEN_NOTIONAL}.'
+            continue
+        if attrs['order_type'] == Order.SELL and limit_sells:
+            product_id = attrs['product'].id
+            available = sellable[product_id] - sold[product_id]
+            if attrs['quantity'] > available:
+                errors[index] = f'Sell quantity exceeds the {max(available, 0)} units available.'
+                continue
+        # Market orders fill at once and never stay open, so they hold no
+        # exposure; with sells limited, their quantity still has to be owned.
+        exposure_cents += cents
+        if attrs['order_type'] == Order.SELL and limit_sells:
+            sold[attrs['product'].id] += attrs['quantity']
+
+    if not _reserve(user.id, exposure_cents, sold):
+        return [error or RETRY_MESSAGE for error in errors]
+    return errors
+
+
+def check_order(user, attrs):
+    return check_orders(user, [attrs])[0]
+
+
+def release_risk(pairs):
+    """
+    Drop cached state for ``(user_id, product_id)`` pairs whose orders
+    changed, so the next check reloads it from committed rows.
+    """
+    keys = set()
+    for user_id, product_id in pairs:
+        keys.add(exposure_key(user_id))
+        keys.add(sellable_key(user_id, product_id))
+    if keys:
+        cache.delete_many(keys)
@@ -1,29 +1,69 @@
 from decimal import Decimal
 
+from productsapp.models import Product
 from rest_framework import serializers
 
-from .models import Notification, Order, OrderBook, Transaction
+from .models import (Candle, Notification, Order, OrderBook, Position,
+                     Transaction)
+
+
+class ProductField(serializers.PrimaryKeyRelatedField):
+    """Looks products up in a batch's prefetched ``products`` first."""
+
+    def to_internal_value(self, data):
+        products = self.context.get('products')
+        if products is not None:
+            try:
+                return products[int(data)]
+            except (KeyError, TypeError, ValueError):
+                pass
+        return super().to_internal_value(data)
 
 
 class OrderSerializer(serializers.ModelSerializer):
     user = serializers.HiddenField(default=serializers.CurrentUserDefault())
+    product = ProductField(queryset=Product.objects.all())
     price = serializers.DecimalField(
         max_digits=10,
         decimal_places=2,
         min_value=Decimal('0.01'),
-        max_value=Decimal('999999.99')
+        max_value=Decimal('999999.99'),
+        required=False,
+        allow_null=True
     )
     quantity = serializers.IntegerField(min_value=1)
 
     class Meta:
         model = Order
         fields = [
-            'id', 'user', 'product', 'order_type', 'quantity',
+            'id', 'user', 'product', 'order_type', 'execution_type', 'quantity',
             'price', 'status', 'filled_quantity', 'remaining_quantity',
             'created_at', 'updated_at'
         ]
         read_only_fields = ['status', 'filled_quantity', 'remaining_quantity']
 
+    def validate(self, attrs):
+        execution_type = attrs.get(
+            'execution_type', getattr(self.instance, 'execution_type', Order.LIMIT)
+        )
+        price = attrs.get('price', getattr(self.instance, 'price', None))
+        if execution_type == Order.MARKET:
+            if price is not None:
+                raise serializers.ValidationError(
+                    {'price': 'Market orders execute at the resting price and take no price.'}
+                )
+        elif price is None:
+            raise serializers.ValidationError(
+                {'price': 'A limit price is required for this execution type.'}
+            )
+        else:
+            product = attrs.get('product', getattr(self.instance, 'product', None))
+            if product is not None and price % product.tick_size:
+                raise serializers.ValidationError(
+                    {'price': f'Price must be a multiple of the tick size {product.tick_size}.'}
+                )
+        return attrs
+
 
 class TransactionSerializer(serializers.ModelSerializer):
     price = serializers.DecimalField(
@@ -51,3 +91,23 @@ class NotificationSerializer(serializers.ModelSerializer):
         model = Notification
         fields = ['id', 'notification_type', 'message', 'read', 'created_at']
         read_only_fields = ['notification_type', 'message', 'created_at']
+
+
+class CandleSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Candle
+        fields = [
+            'start', 'open', 'high', 'low', 'close',
+            'volume', 'trade_count'
+        ]
+
+
+class PositionSerializer(serializers.ModelSerializer):
+    product_name = serializers.CharField(source='product.name', read_only=True)
+
+    class Meta:
+        model = Position
+        fields = [
+            'product', 'product_name', 'quantity', 'average_cost',
+            'realized_pnl', 'updated_at'
+        ]
@@ -0,0 +1,6 @@
+from django.dispatch import Signal
+
+# Sent by the matching engine with the trades of one match (``trades``)
+# and their ``product_id``. The trades are bulk-created, so post_save does
+# not fire for them.
+trades_executed = Signal()
@@ -0,0 +1,128 @@
+import logging
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Sum
+from productsapp.models import Product
+
+from .models import Order
+from .ticks import DEFAULT_TICK_SIZE, to_price, to_ticks
+
+logger = logging.getLogger(__name__)
+
+
+def snapshot_key(product_id):
+    # v2: levels are stored in ticks.
+    return f'orderbook:snapshot:v2:{product_id}'
+
+
+def _level(price, quantity, orders):
+    return {'price': str(price), 'quantity': quantity, 'orders': orders}
+
+
+def build_snapshot(book, depth=None):
+    """
+    Aggregated top-of-book levels taken straight from the in-memory book,
+    stored as ``[ticks, quantity, orders]`` rows; get_snapshot() turns
+    ticks back into prices.
+    """
+    depth = depth or settings.TRADING_ORDER_BOOK_DEPTH
+    sides = {}
+    for name, book_side in (('bids', book.bids), ('asks', book.asks)):
+        sides[name] = [
+            [level.ticks, level.quantity, len(level.orders)]
+            for level in book_side.top_levels(depth)
+        ]
+    return {
+        'product_id': book.product_id,
+        'sequence': book.sequence,
+        'depth': depth,
+        'tick_size': str(book.tick_size),
+        **sides,
+    }
+
+
+def store_snapshot(book):
+    snapshot = build_snapshot(book)
+    cache.set(
+        snapshot_key(book.product_id), snapshot,
+        timeout=settings.TRADING_ORDER_BOOK_SNAPSHOT_TTL
+    )
+    return snapshot
+
+
+def clear_snapshot(product_id):
+    cache.delete(snapshot_key(product_id))
+
+
+def _levels_from_db(product_id, order_type, depth, tick_size):
+    # Only orders the engine has processed and left resting, as in
+    # MatchingEngine._load_from_database; committed but unmatched orders
+    # may still trade.
+    ordering = '-price' if order_type == Order.BUY else 'price'
+    rows = Order.objects.filter(
+        product_id=product_id,
+        order_type=order_type,
+        execution_type=Order.LIMIT,
+        status__in=Order.OPEN_STATUSES,
+        order_book_entry__isnull=False
+    ).values('price').annotate(
+        quantity=Sum('remaining_quantity'),
+        orders=Count('id')
+    ).order_by(ordering)[:depth]
+    levels = []
+    for row in rows:
+        try:
+            ticks = to_ticks(row['price'], tick_size)
+        except ValueError:
+            # Left over from before a tick size change: it has no place on
+            # the current grid, and one bad row must not fail the endpoint.
+            logger.warning(
+                'Skipping off-grid level %s of product %s in the book snapshot',
+                row['price'], product_id
+            )
+            continue
+        levels.append([ticks, row['quantity'], row['orders']])
+    return levels
+
+
+def get_snapshot(product_id, depth):
+    """
+    Cached snapshot trimmed to ``depth`` levels. A miss (e.g. the matching
+    worker has not touched the product since Redis was flushed) is filled
+    from Postgres once with grouped queries.
+    """
+    key = snapshot_key(product_id)
+    snapshot = cache.get(key)
+    if snapshot is None:
+        full_depth = settings.TRADING_ORDER_BOOK_DEPTH
+        tick_size = (
+            Product.objects.filter(id=product_id).values_list('tick_size', flat=True).first()
+            or DEFAULT_TICK_SIZE
+        )
+        snapshot = {
+            'product_id': int(product_id),
+            'sequence': None,
+            'depth': full_depth,
+            'tick_size': str(tick_size),
+            'bids': _levels_from_db(product_id, Order.BUY, full_depth, tick_size),
+            'asks': _levels_from_db(product_id, Order.SELL, full_depth, tick_size),
+        }
+        # add() so a snapshot written by the engine meanwhile is kept.
+        cache.add(key, snapshot, timeout=settings.TRADING_ORDER_BOOK_SNAPSHOT_TTL)
+
+    tick_size = Decimal(snapshot['tick_size'])
+    return {
+        'product_id': snapshot['product_id'],
+        'sequence': snapshot['sequence'],
+        'depth': depth,
+        'bids': [
+            _level(to_price(ticks, tick_size), quantity, orders)
+            for ticks, quantity, orders in snapshot['bids'][:depth]
+        ],
+        'asks': [
+            _level(to_price(ticks, tick_size), quantity, orders)
+            for ticks, quantity, orders in snapshot['asks'][:depth]
+        ],
+    }
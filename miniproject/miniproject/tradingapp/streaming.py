@@ -0,0 +1,162 @@
+import asyncio
+import json
+import logging
+
+import redis
+import redis.asyncio as aioredis
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import JsonResponse, StreamingHttpResponse
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+
+logger = logging.getLogger(__name__)
+
+HEARTBEAT_SECONDS = 15
+
+_client = None
+
+
+def market_channel(product_id):
+    return f'stream:market:{product_id}'
+
+
+def user_channel(user_id):
+    return f'stream:user:{user_id}'
+
+
+def get_client():
+    global _client
+    if _client is None:
+        _client = redis.Redis.from_url(settings.REDIS_URL)
+    return _client
+
+
+def publish(channel, event, data):
+    """Fan an event out to every stream subscriber; never fails the caller."""
+    if not settings.TRADING_STREAMING_ENABLED:
+        return
+    try:
+        get_client().publish(
+            channel,
+            json.dumps({'event': event, 'data': data}, default=str)
+        )
+    except redis.RedisError:
+        logger.warning('Could not publish %s event on %s', event, channel, exc_info=True)
+
+
+def publish_book_changes(book, changes):
+    levels = []
+    for book_side, ticks in changes:
+        level = book_side.levels.get(ticks)
+        levels.append({
+            'side': 'bid' if book_side is book.bids else 'ask',
+            'price': str(book.price(ticks)),
+            'quantity': level.quantity if level else 0,
+            'orders': len(level.orders) if level else 0,
+        })
+    publish(market_channel(book.product_id), 'book', {
+        'product_id': book.product_id,
+        'sequence': book.sequence,
+        'levels': levels,
+    })
+
+
+def publish_trades(product_id, trades):
+    for trade in trades:
+        publish(market_channel(product_id), 'trade', {
+            'id': trade.id,
+            'product_id': product_id,
+            'buy_order': trade.buy_order_id,
+            'sell_order': trade.sell_order_id,
+            'quantity': trade.quantity,
+            'price': str(trade.price),
+            'executed_at': trade.executed_at.isoformat(),
+        })
+
+
+def publish_notifications(notifications):
+    for notification in notifications:
+        publish(user_channel(notification.user_id), 'notification', {
+            'id': notification.id,
+            'notification_type': notification.notification_type,
+            'message': notification.message,
+            'read': notification.read,
+            'created_at': notification.created_at.isoformat(),
+        })
+
+
+def _authenticate(request):
+    # EventSource cannot set headers, so the access token may also be
+    # passed as ``?token=``.
+    auth = JWTAuthentication()
+    raw_token = request.GET.get('token')
+    if raw_token:
+        return auth.get_user(auth.get_validated_token(raw_token.encode()))
+    result = auth.authenticate(request)
+    return result[0] if result else None
+
+
+def _format(message):
+    payload = json.loads(message['data'])
+    return f"event: {payload['event']}\ndata: {json.dumps(payload['data'])}\n\n"
+
+
+async def _event_stream(channels):
+    client = aioredis.Redis.from_url(settings.REDIS_URL)
+    pubsub = client.pubsub()
+    await pubsub.subscribe(*channels)
+    loop = asyncio.get_running_loop()
+    try:
+        yield ': connected\n\n'
+        last_sent = loop.time()
+        while True:
+            message = await pubsub.get_message(
+                ignore_subscribe_messages=True,
+                timeout=HEARTBEAT_SECONDS
+            )
+            if message is not None:
+                yield _format(message)
+            elif loop.time() - last_sent >= HEARTBEAT_SECONDS:
+                # Keeps proxies from closing an idle connection.
+                yield ': heartbeat\n\n'
+            else:
+                continue
+            last_sent = loop.time()
+    finally:
+        await pubsub.unsubscribe()
+        await pubsub.aclose()
+        await client.aclose()
+
+
+async def market_stream(request):
+    """
+    Server-sent events for live market data. Subscribes to book deltas and
+    trades for every ``product_id`` given, plus the caller's notifications.
+    Must be served by an ASGI server (see the ``stream`` service).
+    """
+    try:
+        user = await sync_to_async(_authenticate)(request)
+    except (AuthenticationFailed, InvalidToken):
+        user = None
+    if user is None:
+        return JsonResponse(
+            {'detail': 'Authentication credentials were not provided.'},
+            status=401
+        )
+
+    product_ids = request.GET.getlist('product_id')
+    if not all(product_id.isdigit() for product_id in product_ids):
+        return JsonResponse({'error': 'product_id must be an integer'}, status=400)
+
+    channels = [market_channel(product_id) for product_id in product_ids]
+    channels.append(user_channel(user.id))
+
+    response = StreamingHttpResponse(
+        _event_stream(channels),
+        content_type='text/event-stream'
+    )
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
@@ -0,0 +1,113 @@
+from collections import defaultdict
+
+from celery import shared_task
+from django.conf import settings
+from django.db import transaction
+
+from .archive import archive_trading_history
+from .engine import get_engine
+from .models import Order
+from .notifications import flush_pending
+
+
+# Redelivered when the worker dies mid-task and retried when it fails. Both
+# are safe: the engine skips orders it has already rested, and cancels only
+# touch orders that are still open.
+MATCHING_TASK_OPTIONS = {
+    'ignore_result': True,
+    'acks_late': True,
+    'reject_on_worker_lost': True,
+    'autoretry_for': (Exception,),
+    'retry_backoff': True,
+    'max_retries': settings.TRADING_MATCHING_MAX_RETRIES,
+}
+
+
+def matching_queue(product_id):
+    """Queue of the matching worker that owns the product's shard."""
+    shard = int(product_id) % settings.TRADING_MATCHING_SHARDS
+    return f'matching.{shard}'
+
+
+def submit_order(order):
+    transaction.on_commit(
+        lambda: match_order.apply_async(
+            args=[order.id],
+            queue=matching_queue(order.product_id)
+        )
+    )
+
+
+def submit_orders(orders):
+    """Queue a batch for matching: one task per shard, in submission order."""
+    by_queue = defaultdict(list)
+    for order in orders:
+        by_queue[matching_queue(order.product_id)].append(order.id)
+
+    def send():
+        for queue, order_ids in by_queue.items():
+            match_orders.apply_async(args=[order_ids], queue=queue)
+
+    transaction.on_commit(send)
+
+
+def submit_cancel(order):
+    transaction.on_commit(
+        lambda: cancel_orders.apply_async(
+            args=[order.product_id, [order.id]],
+            queue=matching_queue(order.product_id)
+        )
+    )
+
+
+def submit_cancel_all(user, product_id=None):
+    """Queue cancellation of a user's open orders, one task per product."""
+    open_orders = Order.objects.filter(user=user, status__in=Order.OPEN_STATUSES)
+    if product_id is not None:
+        open_orders = open_orders.filter(product_id=product_id)
+
+    by_product = defaultdict(list)
+    for order_product_id, order_id in open_orders.values_list('product_id', 'id'):
+        by_product[order_product_id].append(order_id)
+
+    for order_product_id, order_ids in by_product.items():
+        cancel_orders.apply_async(
+            args=[order_product_id, order_ids],
+            queue=matching_queue(order_product_id)
+        )
+    return sum(len(order_ids) for order_ids in by_product.values())
+
+
+@shared_task(**MATCHING_TASK_OPTIONS)
+def match_order(order_id):
+    order = Order.objects.filter(id=order_id).first()
+    if order is None or order.status not in Order.OPEN_STATUSES:
+        return
+    get_engine().process_order(order)
+
+
+@shared_task(**MATCHING_TASK_OPTIONS)
+def match_orders(order_ids):
+    orders = Order.objects.in_bulk(order_ids)
+    batch = [
+        orders[order_id] for order_id in order_ids
+        if order_id in orders and orders[order_id].status in Order.OPEN_STATUSES
+    ]
+    if batch:
+        get_engine().process_orders(batch)
+
+
+@shared_task(**MATCHING_TASK_OPTIONS)
+def cancel_orders(product_id, order_ids):
+    get_engine().cancel_orders(product_id, order_ids)
+
+
+@shared_task(ignore_result=True)
+def flush_notifications():
+    """Write buffered notifications; scheduled once per burst and by beat."""
+    flush_pending()
+
+
+@shared_task(ignore_result=True)
+def archive_history():
+    archive_trading_history()
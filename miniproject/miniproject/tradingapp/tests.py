@@ -1,3 +1,762 @@
-from django.test import TestCase
+import gzip
+import json
+import shutil
+import tempfile
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from unittest import mock, skipIf
 
-# Create your tests here.
+from django.core.cache import cache
+from django.test import SimpleTestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from miniproject.celery import app as celery_app
+from productsapp.models import Category, Product
+from rest_framework.test import APIClient
+from usersapp.models import User
+
+from .candles import update_candles
+from .engine import MatchingEngine
+from .exports import pa
+from .journal import BookJournal
+from .models import (Candle, Notification, Order, OrderArchive, OrderBook, Position,
+                     Transaction, TransactionArchive)
+from .notifications import dispatch_notifications, get_unread_count, write_notifications
+from .positions import apply_fill
+from .snapshot import get_snapshot, snapshot_key
+from .tasks import archive_history, flush_notifications, match_order
+
+
+@override_settings(
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+    TRADING_STREAMING_ENABLED=False,
+    TRADING_NOTIFICATIONS_ASYNC=False,
+)
+class TradingTestCase(TransactionTestCase):
+    """
+    Runs matching tasks inline against a fresh, journal-less engine, with
+    the cache in memory and nothing published to Redis.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.engine = MatchingEngine()
+        patcher = mock.patch('tradingapp.tasks.get_engine', lambda: self.engine)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        celery_app.conf.task_always_eager = True
+        self.addCleanup(setattr, celery_app.conf, 'task_always_eager', False)
+
+        category = Category.objects.create(name='Test', slug='test')
+        self.product = Product.objects.create(
+            name='Widget', slug='widget', description='',
+            price=Decimal('10.00'), category=category
+        )
+        self.alice = User.objects.create_user('alice', password='secret')
+        self.bob = User.objects.create_user('bob', password='secret')
+
+    def create_order(self, user, order_type, quantity, price=None, execution_type=Order.LIMIT):
+        """A committed order, as the API saves it before it is matched."""
+        return Order.objects.create(
+            user=user, product=self.product, order_type=order_type, quantity=quantity,
+            price=None if price is None else Decimal(price), execution_type=execution_type
+        )
+
+    def submit(self, user, order_type, quantity, price=None, execution_type=Order.LIMIT):
+        """Match a committed order on the test engine; returns it refreshed."""
+        order = self.create_order(user, order_type, quantity, price, execution_type)
+        self.engine.process_order(order)
+        order.refresh_from_db()
+        return order
+
+    def trades(self):
+        return list(
+            Transaction.objects.order_by('id')
+            .values_list('buy_order_id', 'sell_order_id', 'quantity', 'price')
+        )
+
+    def closed_trade(self, days_ago, quantity=1):
+        """A filled trade between Alice and Bob, executed and closed ``days_ago``."""
+        buy = self.create_order(self.alice, Order.BUY, quantity, '10.00')
+        sell = self.create_order(self.bob, Order.SELL, quantity, '10.00')
+        trade = Transaction.objects.create(buy_order=buy, sell_order=sell, quantity=quantity, price=Decimal('10.00'))
+        moment = timezone.now() - timedelta(days=days_ago)
+        Order.objects.filter(id__in=[buy.id, sell.id]).update(
+            status=Order.COMPLETED, filled_quantity=quantity, remaining_quantity=0, updated_at=moment
+        )
+        Transaction.objects.filter(id=trade.id).update(executed_at=moment)
+        return buy, sell, trade
+
+    def resting(self, engine):
+        return {
+            order_id: (order.remaining_quantity, order.status)
+            for order_id, (order, _) in engine.get_book(self.product.id).orders.items()
+        }
+
+    def api(self, user):
+        client = APIClient()
+        client.force_authenticate(user)
+        return client
+
+    def post_order(self, user, order_type, quantity, price=None, **extra):
+        return self.api(user).post('/api/orders/', {
+            'product': self.product.id,
+            'order_type': order_type,
+            'quantity': quantity,
+            'price': price,
+            **extra,
+        }, format='json')
+
+
+class RiskCheckTests(TradingTestCase):
+    def test_first_buy_and_sell_trade_under_default_settings(self):
+        response = self.post_order(self.alice, Order.BUY, 5, '10.00')
+        self.assertEqual(response.status_code, 201, response.data)
+        response = self.post_order(self.bob, Order.SELL, 5, '10.00')
+        self.assertEqual(response.status_code, 201, response.data)
+
+        trade = Transaction.objects.get()
+        self.assertEqual((trade.quantity, trade.price), (5, Decimal('10.00')))
+        self.assertEqual(
+            set(Order.objects.values_list('status', flat=True)), {Order.COMPLETED}
+        )
+
+    @override_settings(TRADING_ALLOW_SHORT_SELLING=False)
+    def test_sells_are_capped_at_the_position_when_short_selling_is_off(self):
+        response = self.post_order(self.bob, Order.SELL, 5, '10.00')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('0 units available', str(response.data))
+        self.assertFalse(Order.objects.exists())
+
+
+class PriceTimePriorityTests(TradingTestCase):
+    def test_better_prices_fill_first_then_earlier_orders(self):
+        first = self.submit(self.bob, Order.SELL, 3, '10.00')
+        second = self.submit(self.bob, Order.SELL, 2, '10.00')
+        cheapest = self.submit(self.bob, Order.SELL, 4, '9.90')
+        buy = self.submit(self.alice, Order.BUY, 8, '10.00')
+
+        self.assertEqual(self.trades(), [
+            (buy.id, cheapest.id, 4, Decimal('9.90')),
+            (buy.id, first.id, 3, Decimal('10.00')),
+            (buy.id, second.id, 1, Decimal('10.00')),
+        ])
+        self.assertEqual(buy.status, Order.COMPLETED)
+        self.assertEqual(self.resting(self.engine), {second.id: (1, Order.PARTIALLY_FILLED)})
+
+    def test_orders_outside_the_limit_do_not_trade(self):
+        sell = self.submit(self.bob, Order.SELL, 3, '10.10')
+        buy = self.submit(self.alice, Order.BUY, 3, '10.00')
+
+        self.assertEqual(self.trades(), [])
+        self.assertEqual(
+            self.resting(self.engine),
+            {sell.id: (3, Order.PENDING), buy.id: (3, Order.PENDING)}
+        )
+
+
+class TimeInForceTests(TradingTestCase):
+    def test_immediate_or_cancel_remainder_is_cancelled(self):
+        sell = self.submit(self.bob, Order.SELL, 3, '10.00')
+        buy = self.submit(self.alice, Order.BUY, 5, '10.00', Order.IMMEDIATE_OR_CANCEL)
+
+        self.assertEqual(self.trades(), [(buy.id, sell.id, 3, Decimal('10.00'))])
+        self.assertEqual((buy.filled_quantity, buy.status), (3, Order.CANCELLED))
+        self.assertEqual(self.resting(self.engine), {})
+        self.assertFalse(OrderBook.objects.filter(order=buy).exists())
+
+    def test_fill_or_kill_trades_all_or_nothing(self):
+        sell = self.submit(self.bob, Order.SELL, 3, '10.00')
+        killed = self.submit(self.alice, Order.BUY, 5, '10.00', Order.FILL_OR_KILL)
+
+        self.assertEqual((killed.filled_quantity, killed.status), (0, Order.CANCELLED))
+        self.assertEqual(self.trades(), [])
+        self.assertEqual(self.resting(self.engine), {sell.id: (3, Order.PENDING)})
+
+        filled = self.submit(self.alice, Order.BUY, 3, '10.00', Order.FILL_OR_KILL)
+        self.assertEqual(filled.status, Order.COMPLETED)
+        self.assertEqual(self.trades(), [(filled.id, sell.id, 3, Decimal('10.00'))])
+        self.assertEqual(self.resting(self.engine), {})
+
+
+    def test_order_off_the_new_tick_grid_is_cancelled(self):
+        order = self.create_order(self.alice, Order.BUY, 5, '10.03')
+        # The tick size changed after the order was validated and committed.
+        self.product.tick_size = Decimal('0.05')
+        self.product.save()
+
+        match_order(order.id)
+
+        order.refresh_from_db()
+        self.assertEqual(order.status, Order.CANCELLED)
+        self.assertFalse(OrderBook.objects.exists())
+        self.assertEqual(self.resting(self.engine), {})
+        self.assertEqual(
+            list(Notification.objects.values_list('user_id', 'notification_type')),
+            [(self.alice.id, Notification.ORDER_CANCEL)]
+        )
+
+class SelfTradePreventionTests(TradingTestCase):
+    def cross_own_order(self, mode):
+        with self.settings(TRADING_SELF_TRADE_PREVENTION=mode):
+            sell = self.submit(self.alice, Order.SELL, 5, '10.00')
+            buy = self.submit(self.alice, Order.BUY, 3, '10.00')
+        sell.refresh_from_db()
+        self.assertEqual(self.trades(), [])
+        return sell, buy
+
+    def test_cancel_newest_cancels_the_incoming_order(self):
+        sell, buy = self.cross_own_order('cancel_newest')
+        self.assertEqual(buy.status, Order.CANCELLED)
+        self.assertEqual(self.resting(self.engine), {sell.id: (5, Order.PENDING)})
+
+    def test_cancel_oldest_cancels_the_resting_order(self):
+        sell, buy = self.cross_own_order('cancel_oldest')
+        self.assertEqual(sell.status, Order.CANCELLED)
+        self.assertFalse(OrderBook.objects.filter(order=sell).exists())
+        self.assertEqual(self.resting(self.engine), {buy.id: (3, Order.PENDING)})
+
+    def test_cancel_oldest_keeps_trading_with_other_users(self):
+        with self.settings(TRADING_SELF_TRADE_PREVENTION='cancel_oldest'):
+            own = self.submit(self.alice, Order.SELL, 5, '9.90')
+            other = self.submit(self.bob, Order.SELL, 2, '10.00')
+            buy = self.submit(self.alice, Order.BUY, 3, '10.00')
+
+        own.refresh_from_db()
+        self.assertEqual(own.status, Order.CANCELLED)
+        self.assertEqual(self.trades(), [(buy.id, other.id, 2, Decimal('10.00'))])
+        self.assertEqual(self.resting(self.engine), {buy.id: (1, Order.PARTIALLY_FILLED)})
+
+    def test_decrement_shrinks_the_larger_order_and_cancels_the_smaller(self):
+        sell, buy = self.cross_own_order('decrement')
+        self.assertEqual(buy.status, Order.CANCELLED)
+        self.assertEqual((sell.quantity, sell.remaining_quantity, sell.status), (2, 2, Order.PENDING))
+        self.assertEqual(self.resting(self.engine), {sell.id: (2, Order.PENDING)})
+        level = self.engine.get_book(self.product.id).asks.top_levels(1)[0]
+        self.assertEqual(level.quantity, 2)
+
+
+class OrderApiTests(TradingTestCase):
+    def test_orders_cannot_be_edited_or_deleted(self):
+        response = self.post_order(self.alice, Order.SELL, 5, '10.00')
+        url = f'/api/orders/{response.data["id"]}/'
+        client = self.api(self.alice)
+
+        self.assertEqual(client.patch(url, {'price': '50.00'}, format='json').status_code, 405)
+        self.assertEqual(client.put(url, {}, format='json').status_code, 405)
+        self.assertEqual(client.delete(url).status_code, 405)
+
+        # The resting order is untouched and still trades at its own price.
+        self.post_order(self.bob, Order.BUY, 5, '10.00')
+        trade = Transaction.objects.get()
+        self.assertEqual((trade.quantity, trade.price), (5, Decimal('10.00')))
+
+
+class BatchMatchingTests(TradingTestCase):
+    def submit_batch(self, user, orders):
+        response = self.api(user).post('/api/orders/batch/', [
+            {'product': self.product.id, 'order_type': order_type, 'quantity': quantity, 'price': price}
+            for order_type, quantity, price in orders
+        ], format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+        return [Order.objects.get(id=result['order']['id']) for result in response.data['results']]
+
+    def assert_self_cross(self, mode, expected_statuses, preload):
+        if preload:
+            self.engine.get_book(self.product.id)
+        with self.settings(TRADING_SELF_TRADE_PREVENTION=mode):
+            buy, sell = self.submit_batch(self.alice, [(Order.BUY, 5, '10.00'), (Order.SELL, 5, '9.00')])
+        self.assertEqual((buy.status, sell.status), expected_statuses)
+        resting = [order for order in (buy, sell) if order.status in Order.OPEN_STATUSES]
+        self.assertEqual(set(self.engine.get_book(self.product.id).orders), {order.id for order in resting})
+        self.assertFalse(Transaction.objects.exists())
+
+    def outcome(self, batched):
+        """Trades and final statuses, by position in the stream, on an empty book."""
+        self.engine.reset()
+        Order.objects.all().delete()
+        stream = [
+            (self.bob, Order.SELL, 4, '10.00'),
+            (self.bob, Order.SELL, 3, '9.90'),
+            (self.alice, Order.SELL, 2, '10.10'),
+            (self.alice, Order.BUY, 5, '10.00'),
+            (self.bob, Order.BUY, 6, '10.10'),
+            (self.alice, Order.BUY, 2, '9.80'),
+        ]
+        orders = [self.create_order(*spec) for spec in stream]
+        with self.settings(TRADING_SELF_TRADE_PREVENTION='decrement'):
+            if batched:
+                self.engine.process_orders(orders)
+            else:
+                for order in orders:
+                    self.engine.process_order(order)
+        position = {order.id: index for index, order in enumerate(orders)}
+        trades = [
+            (position[buy_id], position[sell_id], quantity, price)
+            for buy_id, sell_id, quantity, price in self.trades()
+        ]
+        statuses = [
+            (order.quantity, order.remaining_quantity, order.status)
+            for order in (Order.objects.get(id=order.id) for order in orders)
+        ]
+        return trades, statuses
+
+    def test_batch_matches_like_the_same_orders_one_by_one(self):
+        batched = self.outcome(batched=True)
+        self.assertEqual(batched, self.outcome(batched=False))
+        self.assertTrue(batched[0])
+
+    def test_batch_on_a_fresh_book_matches_in_submission_order(self):
+        # The second order is the newest whether or not the book was loaded.
+        for preload in (True, False):
+            with self.subTest(preload=preload):
+                self.engine.reset()
+                Order.objects.all().delete()
+                self.assert_self_cross(
+                    'cancel_newest', (Order.PENDING, Order.CANCELLED), preload
+                )
+                self.engine.reset()
+                Order.objects.all().delete()
+                self.assert_self_cross(
+                    'cancel_oldest', (Order.CANCELLED, Order.PENDING), preload
+                )
+
+
+class JournalRecoveryTests(TradingTestCase):
+    def setUp(self):
+        super().setUp()
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.journal = BookJournal(directory, snapshot_every=3)
+
+    def test_restart_through_process_order_replays_the_journal(self):
+        engine = MatchingEngine(journal=self.journal)
+        for user, order_type, quantity, price in [
+            (self.alice, Order.BUY, 5, '9.00'),
+            (self.alice, Order.BUY, 3, '9.50'),
+            (self.bob, Order.SELL, 4, '9.50'),
+            (self.bob, Order.SELL, 6, '11.00'),
+            (self.alice, Order.BUY, 2, '11.00'),
+        ]:
+            engine.process_order(self.create_order(user, order_type, quantity, price))
+        expected = self.resting(engine)
+
+        # The first order after a restart is committed before its task loads
+        # the book; it must not push recovery onto the database path.
+        incoming = self.create_order(self.bob, Order.SELL, 1, '12.00')
+        restarted = MatchingEngine(journal=self.journal)
+        with mock.patch.object(
+            MatchingEngine, '_load_from_database',
+            side_effect=AssertionError('book was reloaded from the database')
+        ):
+            restarted.process_order(incoming)
+
+        expected[incoming.id] = (1, Order.PENDING)
+        self.assertEqual(self.resting(restarted), expected)
+
+    def depth(self, engine):
+        book = engine.get_book(self.product.id)
+        return [
+            [(level.ticks, level.quantity, [order.id for order in level.orders]) for level in side.top_levels(100)]
+            for side in (book.bids, book.asks)
+        ]
+
+    def test_replayed_book_equals_the_live_and_database_books(self):
+        engine = MatchingEngine(journal=self.journal)
+        with self.settings(TRADING_SELF_TRADE_PREVENTION='decrement'):
+            for user, order_type, quantity, price in [
+                (self.alice, Order.BUY, 5, '9.00'),
+                (self.alice, Order.BUY, 4, '9.00'),
+                (self.bob, Order.BUY, 3, '9.50'),
+                (self.bob, Order.SELL, 6, '11.00'),
+                (self.alice, Order.SELL, 5, '9.50'),
+                (self.alice, Order.SELL, 2, '10.00'),
+                (self.bob, Order.SELL, 2, '9.00'),
+                (self.alice, Order.BUY, 1, '11.00'),
+            ]:
+                engine.process_order(self.create_order(user, order_type, quantity, price))
+        cancelled = Order.objects.filter(order_type=Order.BUY, price=Decimal('9.00')).earliest('id')
+        engine.cancel_orders(self.product.id, [cancelled.id])
+        live = (self.resting(engine), self.depth(engine))
+
+        replayed = MatchingEngine(journal=self.journal)
+        with mock.patch.object(
+            MatchingEngine, '_load_from_database',
+            side_effect=AssertionError('book was reloaded from the database')
+        ):
+            self.assertEqual((self.resting(replayed), self.depth(replayed)), live)
+        reloaded = MatchingEngine()
+        self.assertEqual((self.resting(reloaded), self.depth(reloaded)), live)
+
+
+class MatchingTaskTests(TradingTestCase):
+    def test_failed_matching_is_retried(self):
+        self.post_order(self.alice, Order.BUY, 5, '10.00')
+        persist = MatchingEngine._persist
+        calls = []
+
+        def fail_once(engine, *args, **kwargs):
+            calls.append(args)
+            if len(calls) == 1:
+                raise ConnectionError('database went away')
+            return persist(engine, *args, **kwargs)
+
+        with mock.patch.object(MatchingEngine, '_persist', fail_once):
+            response = self.post_order(self.bob, Order.SELL, 5, '10.00')
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(Transaction.objects.get().quantity, 5)
+        self.assertEqual(Order.objects.get(id=response.data['id']).status, Order.COMPLETED)
+
+    def test_redelivered_order_is_matched_once(self):
+        order = self.create_order(self.alice, Order.BUY, 5, '10.00')
+        match_order(order.id)
+        match_order(order.id)
+
+        self.assertEqual(self.resting(self.engine), {order.id: (5, Order.PENDING)})
+        self.assertEqual(OrderBook.objects.filter(order=order).count(), 1)
+
+
+class TransactionListingTests(TradingTestCase):
+    def test_pages_merge_bought_and_sold_trades(self):
+        carol = User.objects.create_user('carol', password='secret')
+        expected = []
+        for index in range(7):
+            # Alice alternates sides, against Bob and against Carol.
+            counterparty = self.bob if index % 3 else carol
+            buyer, seller = (self.alice, counterparty) if index % 2 else (counterparty, self.alice)
+            trade = Transaction.objects.create(
+                buy_order=self.create_order(buyer, Order.BUY, 1, '10.00'),
+                sell_order=self.create_order(seller, Order.SELL, 1, '10.00'),
+                quantity=1, price=Decimal('10.00')
+            )
+            expected.append(trade.id)
+        # Bob and Carol trading with each other never shows up for Alice.
+        Transaction.objects.create(
+            buy_order=self.create_order(self.bob, Order.BUY, 1, '10.00'),
+            sell_order=self.create_order(carol, Order.SELL, 1, '10.00'),
+            quantity=1, price=Decimal('10.00')
+        )
+
+        client = self.api(self.alice)
+        seen, url = [], '/api/transactions/?page_size=3'
+        while url:
+            response = client.get(url)
+            self.assertEqual(response.status_code, 200)
+            seen.extend(trade['id'] for trade in response.data['results'])
+            url = response.data['next']
+        self.assertEqual(seen, expected[::-1])
+
+
+class PositionTests(SimpleTestCase):
+    def fill(self, position, quantity, price):
+        apply_fill(position, quantity, Decimal(price))
+        return (position.quantity, position.average_cost, position.realized_pnl)
+
+    def test_realized_pnl_is_measured_against_the_average_cost(self):
+        position = Position()
+        self.fill(position, 10, '10.00')
+        self.assertEqual(self.fill(position, 30, '14.00'), (40, Decimal('13.0000'), Decimal('0')))
+        # Selling part of a long realizes against the average; the rest keeps it.
+        self.assertEqual(self.fill(position, -20, '15.00'), (20, Decimal('13.0000'), Decimal('40')))
+
+    def test_closing_a_long_leaves_it_flat(self):
+        position = Position()
+        self.fill(position, 20, '13.00')
+        self.assertEqual(self.fill(position, -20, '12.00'), (0, Decimal('0'), Decimal('-20')))
+
+    def test_selling_through_zero_opens_a_short_at_the_fill_price(self):
+        position = Position()
+        self.fill(position, 5, '10.00')
+        self.assertEqual(self.fill(position, -8, '12.00'), (-3, Decimal('12.00'), Decimal('10')))
+        # Covering the short below its entry price is a gain.
+        self.assertEqual(self.fill(position, 3, '11.00'), (0, Decimal('0'), Decimal('13')))
+
+
+class PositionTrackingTests(TradingTestCase):
+    def test_trades_update_both_sides_positions(self):
+        self.post_order(self.alice, Order.BUY, 5, '10.00')
+        self.post_order(self.bob, Order.SELL, 5, '10.00')
+        self.post_order(self.alice, Order.SELL, 2, '12.00')
+        self.post_order(self.bob, Order.BUY, 2, '12.00')
+
+        positions = {
+            position.user_id: (position.quantity, position.average_cost, position.realized_pnl)
+            for position in Position.objects.filter(product=self.product)
+        }
+        self.assertEqual(positions, {
+            self.alice.id: (3, Decimal('10.0000'), Decimal('4.0000')),
+            self.bob.id: (-3, Decimal('10.0000'), Decimal('-4.0000')),
+        })
+
+
+class CandleTests(TradingTestCase):
+    def executed(self, *specs):
+        return [
+            Transaction(
+                quantity=quantity, price=Decimal(price),
+                executed_at=datetime(2024, 3, 6, 10, minute, second, tzinfo=dt_timezone.utc)
+            )
+            for minute, second, quantity, price in specs
+        ]
+
+    def bar(self, interval, hour, minute=0):
+        candle = Candle.objects.get(
+            product=self.product, interval=interval,
+            start=datetime(2024, 3, 6, hour, minute, tzinfo=dt_timezone.utc)
+        )
+        return (candle.open, candle.high, candle.low, candle.close, candle.volume, candle.trade_count)
+
+    def test_batches_extend_the_bars_they_fall_in(self):
+        update_candles(self.product.id, self.executed((0, 5, 2, '10.00'), (0, 40, 1, '12.00'), (1, 10, 4, '9.00')))
+        update_candles(self.product.id, self.executed((1, 30, 3, '13.00')))
+
+        self.assertEqual(
+            self.bar(Candle.ONE_MINUTE, 10, 0),
+            (Decimal('10.00'), Decimal('12.00'), Decimal('10.00'), Decimal('12.00'), 3, 2)
+        )
+        self.assertEqual(
+            self.bar(Candle.ONE_MINUTE, 10, 1),
+            (Decimal('9.00'), Decimal('13.00'), Decimal('9.00'), Decimal('13.00'), 7, 2)
+        )
+        self.assertEqual(
+            self.bar(Candle.ONE_HOUR, 10),
+            (Decimal('10.00'), Decimal('13.00'), Decimal('9.00'), Decimal('13.00'), 10, 4)
+        )
+        self.assertEqual(Candle.objects.filter(interval=Candle.ONE_DAY).count(), 1)
+
+    def test_range_accepts_dates_and_datetimes(self):
+        update_candles(self.product.id, self.executed((0, 5, 2, '10.00'), (1, 10, 4, '9.00'), (2, 0, 1, '11.00')))
+        client = self.api(self.alice)
+
+        def starts(**params):
+            response = client.get('/api/candles/', {'product_id': self.product.id, **params})
+            self.assertEqual(response.status_code, 200, response.data)
+            return [candle['start'][11:16] for candle in response.data]
+
+        self.assertEqual(starts(), ['10:00', '10:01', '10:02'])
+        self.assertEqual(starts(**{'from': '2024-03-06T10:01:00Z', 'to': '2024-03-06T10:02'}), ['10:01'])
+        self.assertEqual(starts(**{'from': '2024-03-06', 'to': '2024-03-07'}), ['10:00', '10:01', '10:02'])
+        self.assertEqual(starts(**{'to': '2024-03-06'}), [])
+
+        for bad in ('yesterday', '2024-02-30'):
+            response = client.get('/api/candles/', {'product_id': self.product.id, 'from': bad})
+            self.assertEqual(response.status_code, 400)
+        self.assertEqual(client.get('/api/candles/').status_code, 400)
+
+
+class MemoryRedis:
+    """The list and key commands the notification buffer uses, in memory."""
+
+    def __init__(self):
+        self.lists = defaultdict(list)
+        self.keys = {}
+
+    def rpush(self, key, *values):
+        self.lists[key].extend(values)
+
+    def lpush(self, key, *values):
+        for value in values:
+            self.lists[key].insert(0, value)
+
+    def lrange(self, key, start, end):
+        return self.lists[key][start:None if end == -1 else end + 1]
+
+    def ltrim(self, key, start, end):
+        self.lists[key] = self.lrange(key, start, end)
+
+    def set(self, key, value, nx=False, ex=None):
+        if nx and key in self.keys:
+            return None
+        self.keys[key] = value
+        return True
+
+    def delete(self, *keys):
+        for key in keys:
+            self.keys.pop(key, None)
+
+    def pipeline(self):
+        return MemoryPipeline(self)
+
+
+class MemoryPipeline:
+    def __init__(self, client):
+        self.client = client
+        self.calls = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def __getattr__(self, name):
+        return lambda *args: self.calls.append((name, args))
+
+    def execute(self):
+        return [getattr(self.client, name)(*args) for name, args in self.calls]
+
+
+class NotificationTests(TradingTestCase):
+    def notify(self, user, count):
+        return [
+            Notification(user=user, notification_type=Notification.TRADE_EXECUTION, message=f'Trade {index}')
+            for index in range(count)
+        ]
+
+    def test_unread_counter_follows_writes_and_reads(self):
+        self.assertEqual(get_unread_count(self.alice.id), 0)
+        write_notifications(self.notify(self.alice, 3) + self.notify(self.bob, 1))
+        self.assertEqual(get_unread_count(self.alice.id), 3)
+
+        client = self.api(self.alice)
+        notification = Notification.objects.filter(user=self.alice).first()
+        for _ in range(2):
+            # Marking the same notification twice only counts once.
+            client.post(f'/api/notifications/{notification.id}/mark_as_read/')
+        self.assertEqual(client.get('/api/notifications/unread_count/').data, {'unread': 2})
+        client.post('/api/notifications/mark_all_as_read/')
+        self.assertEqual(client.get('/api/notifications/unread_count/').data, {'unread': 0})
+        self.assertEqual(get_unread_count(self.bob.id), 1)
+
+    @override_settings(TRADING_NOTIFICATIONS_ASYNC=True, TRADING_NOTIFICATION_BATCH_SIZE=2)
+    def test_buffered_notifications_are_written_by_one_flush(self):
+        redis_client = MemoryRedis()
+        patcher = mock.patch('tradingapp.notifications.get_client', lambda: redis_client)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.assertEqual(get_unread_count(self.alice.id), 0)
+
+        with mock.patch('tradingapp.notifications.current_app.send_task') as send_task:
+            dispatch_notifications(self.notify(self.alice, 2))
+            dispatch_notifications(self.notify(self.alice, 1) + self.notify(self.bob, 1))
+        send_task.assert_called_once()
+        self.assertFalse(Notification.objects.exists())
+
+        flush_notifications()
+
+        self.assertEqual(Notification.objects.filter(user=self.alice).count(), 3)
+        self.assertEqual(Notification.objects.filter(user=self.bob).count(), 1)
+        self.assertEqual(redis_client.lists['notifications:pending'], [])
+        self.assertEqual(get_unread_count(self.alice.id), 3)
+
+
+@override_settings(TRADING_ARCHIVE_AFTER_DAYS=30, TRADING_ARCHIVE_BATCH_SIZE=1)
+class ArchiveTests(TradingTestCase):
+    def test_old_trades_and_closed_orders_move_to_the_archive(self):
+        old = [self.closed_trade(days_ago=90, quantity=quantity) for quantity in (2, 3)]
+        recent = self.closed_trade(days_ago=1)
+        open_order = self.create_order(self.alice, Order.BUY, 4, '9.00')
+        Order.objects.filter(id=open_order.id).update(updated_at=timezone.now() - timedelta(days=90))
+
+        archive_history()
+
+        archived_trades = {trade.id for _, _, trade in old}
+        archived_orders = {order.id for buy, sell, _ in old for order in (buy, sell)}
+        self.assertEqual(set(TransactionArchive.objects.values_list('id', flat=True)), archived_trades)
+        self.assertEqual(set(OrderArchive.objects.values_list('id', flat=True)), archived_orders)
+        self.assertEqual(list(Transaction.objects.values_list('id', flat=True)), [recent[2].id])
+        self.assertEqual(
+            set(Order.objects.values_list('id', flat=True)),
+            {recent[0].id, recent[1].id, open_order.id}
+        )
+
+        buy, sell, trade = old[1]
+        archived = TransactionArchive.objects.get(id=trade.id)
+        self.assertEqual(
+            (archived.buy_order_id, archived.sell_order_id, archived.product_id,
+             archived.buyer_id, archived.seller_id, archived.quantity, archived.price),
+            (buy.id, sell.id, self.product.id, self.alice.id, self.bob.id, 3, Decimal('10.00'))
+        )
+        order = OrderArchive.objects.get(id=sell.id)
+        self.assertEqual(
+            (order.user_id, order.order_type, order.status, order.filled_quantity),
+            (self.bob.id, Order.SELL, Order.COMPLETED, 3)
+        )
+
+        # Nothing left to move; a second run changes nothing.
+        archive_history()
+        self.assertEqual(TransactionArchive.objects.count(), 2)
+        self.assertEqual(OrderArchive.objects.count(), 4)
+
+
+@override_settings(TRADING_ARCHIVE_AFTER_DAYS=30, TRADING_EXPORT_CHUNK_SIZE=1)
+class ExportTests(TradingTestCase):
+    def setUp(self):
+        super().setUp()
+        self.admin = User.objects.create_user('admin', password='secret', is_staff=True)
+        # Archived first, then still live; the last trade is outside the range.
+        self.archived = self.closed_trade(days_ago=90, quantity=2)[2]
+        archive_history()
+        self.live = self.closed_trade(days_ago=10, quantity=3)[2]
+        self.closed_trade(days_ago=1)
+        self.params = {
+            'from': (timezone.now() - timedelta(days=100)).date().isoformat(),
+            'to': (timezone.now() - timedelta(days=5)).isoformat(),
+        }
+
+    def export(self, **params):
+        response = self.api(self.admin).get('/api/exports/transactions/', {**self.params, **params})
+        self.assertEqual(response.status_code, 200)
+        return response, b''.join(response.streaming_content)
+
+    def test_ndjson_covers_archived_then_live_rows(self):
+        response, body = self.export()
+        self.assertEqual(response['Content-Type'], 'application/gzip')
+        rows = [json.loads(line) for line in gzip.decompress(body).decode().splitlines()]
+        self.assertEqual([row['id'] for row in rows], [self.archived.id, self.live.id])
+        self.assertEqual(
+            {key: rows[1][key] for key in ('product_id', 'buyer_id', 'seller_id', 'quantity', 'price')},
+            {'product_id': self.product.id, 'buyer_id': self.alice.id,
+             'seller_id': self.bob.id, 'quantity': 3, 'price': '10.00'}
+        )
+
+    @skipIf(pa is None, 'pyarrow is not installed')
+    def test_arrow_stream_has_one_batch_per_chunk(self):
+        response, body = self.export(output='arrow')
+        self.assertEqual(response['Content-Type'], 'application/vnd.apache.arrow.stream')
+        reader = pa.ipc.open_stream(body)
+        batches = list(reader)
+        self.assertEqual(len(batches), 2)
+        rows = pa.Table.from_batches(batches).to_pylist()
+        self.assertEqual([row['id'] for row in rows], [self.archived.id, self.live.id])
+        self.assertEqual(rows[1]['price'], Decimal('10.00'))
+
+    def test_range_is_required(self):
+        response = self.api(self.admin).get('/api/exports/orders/', {'from': '2024-02-30'})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.api(self.alice).get('/api/exports/orders/', self.params).status_code, 403)
+
+
+@override_settings(TRADING_ORDER_BOOK_SNAPSHOT_TTL=30)
+class SnapshotTests(TradingTestCase):
+    def test_database_fallback_shows_only_resting_orders_on_the_grid(self):
+        for price in ('9.90', '9.95', '9.95'):
+            self.engine.process_order(self.create_order(self.alice, Order.BUY, 2, price))
+        self.engine.process_order(self.create_order(self.bob, Order.SELL, 3, '10.10'))
+        # Committed but not matched yet: it may still trade, so it is not shown.
+        self.create_order(self.alice, Order.BUY, 5, '10.00')
+        # The product moved to a coarser tick after 9.95 was placed.
+        self.product.tick_size = Decimal('0.10')
+        self.product.save()
+        cache.clear()
+
+        with self.assertLogs('tradingapp.snapshot', 'WARNING'):
+            snapshot = get_snapshot(self.product.id, 10)
+
+        self.assertEqual(snapshot['bids'], [{'price': '9.90', 'quantity': 2, 'orders': 1}])
+        self.assertEqual(snapshot['asks'], [{'price': '10.10', 'quantity': 3, 'orders': 1}])
+        self.assertEqual(self.api(self.alice).get(
+            '/api/orderbook/', {'product_id': self.product.id}
+        ).status_code, 200)
+
+    def test_snapshots_expire(self):
+        with mock.patch('tradingapp.snapshot.cache') as snapshot_cache:
+            snapshot_cache.get.return_value = None
+            get_snapshot(self.product.id, 10)
+            self.engine.process_order(self.create_order(self.alice, Order.BUY, 2, '9.90'))
+
+        key = snapshot_key(self.product.id)
+        snapshot_cache.add.assert_called_once_with(key, mock.ANY, timeout=30)
+        snapshot_cache.set.assert_called_once_with(key, mock.ANY, timeout=30)
@@ -0,0 +1,15 @@
+from decimal import Decimal
+
+DEFAULT_TICK_SIZE = Decimal('0.01')
+
+
+def to_ticks(price, tick_size):
+    """Whole number of ticks in ``price``; ValueError if it is off the tick grid."""
+    ticks, remainder = divmod(price, tick_size)
+    if remainder:
+        raise ValueError(f'{price} is not a multiple of the tick size {tick_size}')
+    return int(ticks)
+
+
+def to_price(ticks, tick_size):
+    return ticks * tick_size
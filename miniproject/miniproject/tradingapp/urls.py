@@ -1,13 +1,21 @@
 from django.urls import include, path
 from rest_framework.routers import DefaultRouter
 
-from .views import NotificationViewSet, OrderBookViewSet, OrderViewSet
+from .streaming import market_stream
+from .views import (CandleViewSet, ExportViewSet, NotificationViewSet,
+                    OrderBookViewSet, OrderViewSet, PositionViewSet,
+                    TransactionViewSet)
 
 router = DefaultRouter()
 router.register(r'orders', OrderViewSet, basename='order')
+router.register(r'transactions', TransactionViewSet, basename='transaction')
 router.register(r'orderbook', OrderBookViewSet, basename='orderbook')
 router.register(r'notifications', NotificationViewSet, basename='notification')
+router.register(r'candles', CandleViewSet, basename='candle')
+router.register(r'positions', PositionViewSet, basename='position')
+router.register(r'exports', ExportViewSet, basename='export')
 
 urlpatterns = [
     path('', include(router.urls)),
+    path('stream/', market_stream, name='market-stream'),
 ]
@@ -1,64 +1,50 @@
+from datetime import datetime, time
+
+from django.conf import settings
 from django.db import transaction
+from django.db.models import Q
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
 from drf_yasg import openapi
 from drf_yasg.utils import swagger_auto_schema
+from productsapp.models import Product
 from rest_framework import permissions, status, viewsets
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
 
-from .models import Notification, Order, OrderBook, Transaction
-from .serializers import (NotificationSerializer, OrderBookSerializer,
-                          OrderSerializer, TransactionSerializer)
+from .exports import EXPORTS, arrow_chunks, gzip_stream, ndjson_chunks, pa
+from .models import (Candle, Notification, Order, OrderBook, Position,
+                     Transaction)
+from .notifications import adjust_unread, get_unread_count
+from .pagination import CreatedAtPagination, ExecutedAtPagination
+from .risk import check_order, check_orders
+from .serializers import (CandleSerializer, NotificationSerializer,
+                          OrderBookSerializer, OrderSerializer,
+                          PositionSerializer, TransactionSerializer)
+from .snapshot import get_snapshot
+from .tasks import (submit_cancel, submit_cancel_all, submit_order,
+                    submit_orders)
 
 
 class OrderViewSet(viewsets.ModelViewSet):
     serializer_class = OrderSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = CreatedAtPagination
+    # Once submitted, an order's state belongs to the matching engine;
+    # edits and deletes would bypass the in-memory book. Cancel instead.
+    http_method_names = ['get', 'post', 'head', 'options']
 
     def get_queryset(self):
         return Order.objects.filter(user=self.request.user)
 
     def perform_create(self, serializer):
+        error = check_order(self.request.user, serializer.validated_data)
+        if error:
+            raise ValidationError({'non_field_errors': [error]})
         order = serializer.save()
-        self._process_order(order)
-
-    @transaction.atomic
-    def _process_order(self, new_order):
-        # Find matching orders
-        matching_orders = Order.objects.filter(
-            product=new_order.product,
-            status__in=[Order.PENDING, Order.PARTIALLY_FILLED],
-            order_type='sell' if new_order.order_type == 'buy' else 'buy',
-            price__lte=new_order.price if new_order.order_type == 'buy' else None,
-            price__gte=new_order.price if new_order.order_type == 'sell' else None,
-        ).exclude(user=new_order.user).order_by('price', 'created_at')
-
-        for matching_order in matching_orders:
-            if new_order.remaining_quantity == 0:
-                break
-
-            match_quantity = min(
-                new_order.remaining_quantity,
-                matching_order.remaining_quantity
-            )
-
-            # Create transaction
-            transaction_price = matching_order.price
-            Transaction.objects.create(
-                buy_order=new_order if new_order.order_type == 'buy' else matching_order,
-                sell_order=matching_order if new_order.order_type == 'buy' else new_order,
-                quantity=match_quantity,
-                price=transaction_price
-            )
-
-            # Update orders
-            for order in [new_order, matching_order]:
-                order.filled_quantity += match_quantity
-                order.remaining_quantity -= match_quantity
-                order.status = (
-                    Order.COMPLETED if order.remaining_quantity == 0
-                    else Order.PARTIALLY_FILLED
-                )
-                order.save()
+        submit_order(order)
 
     @swagger_auto_schema(
         responses={200: OrderSerializer(many=True)},
@@ -83,6 +69,18 @@ class OrderViewSet(viewsets.ModelViewSet):
                 type=openapi.TYPE_STRING,
                 enum=['pending', 'completed', 'cancelled', 'partially_filled']
             ),
+            openapi.Parameter(
+                'cursor',
+                openapi.IN_QUERY,
+                description="Opaque cursor from the previous page's next link",
+                type=openapi.TYPE_STRING
+            ),
+            openapi.Parameter(
+                'page_size',
+                openapi.IN_QUERY,
+                description="Orders per page",
+                type=openapi.TYPE_INTEGER
+            ),
         ]
     )
     def list(self, request, *args, **kwargs):
@@ -100,24 +98,150 @@ class OrderViewSet(viewsets.ModelViewSet):
         if status:
             queryset = queryset.filter(status=status)
 
-        serializer = self.get_serializer(queryset, many=True)
-        return Response(serializer.data)
+        page = self.paginate_queryset(queryset)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
 
     @swagger_auto_schema(
-        responses={200: 'Order cancelled successfully'}
+        request_body=OrderSerializer(many=True),
+        responses={201: 'Per-order results', 400: 'No order was accepted'}
+    )
+    @action(detail=False, methods=['post'])
+    def batch(self, request):
+        """
+        Submit many orders at once. Each is validated and risk-checked in
+        one pass; the accepted ones are saved in one statement and matched
+        in submission order by one task per matching shard.
+        """
+        items = request.data
+        if not isinstance(items, list) or not items:
+            return Response(
+                {'error': 'Expected a non-empty list of orders'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if len(items) > settings.TRADING_MAX_BATCH_ORDERS:
+            return Response(
+                {'error': f'At most {settings.TRADING_MAX_BATCH_ORDERS} orders per batch'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        product_ids = {
+            str(item.get('product')) for item in items
+            if isinstance(item, dict) and str(item.get('product')).isdigit()
+        }
+        context = {
+            **self.get_serializer_context(),
+            'products': Product.objects.in_bulk([int(pid) for pid in product_ids]),
+        }
+        # The list serializer's child, run item by item, so one invalid
+        # order does not reject the whole batch.
+        child = self.get_serializer(data=items, many=True, context=context).child
+        results, valid = [], []
+        for index, item in enumerate(items):
+            try:
+                attrs = child.run_validation(item)
+            except ValidationError as exc:
+                results.append({'index': index, 'status': 'rejected', 'errors': exc.detail})
+                continue
+            results.append(None)
+            valid.append((index, attrs))
+
+        risk_errors = check_orders(request.user, [attrs for _, attrs in valid])
+        accepted = []
+        for (index, attrs), error in zip(valid, risk_errors):
+            if error:
+                results[index] = {
+                    'index': index, 'status': 'rejected',
+                    'errors': {'non_field_errors': [error]}
+                }
+            else:
+                accepted.append((index, Order(**attrs, remaining_quantity=attrs['quantity'])))
+
+        if accepted:
+            with transaction.atomic():
+                orders = Order.objects.bulk_create([order for _, order in accepted])
+                submit_orders(orders)
+            for (index, _), order in zip(accepted, orders):
+                results[index] = {
+                    'index': index, 'status': 'accepted',
+                    'order': OrderSerializer(order, context=context).data
+                }
+
+        return Response(
+            {'accepted': len(accepted), 'rejected': len(items) - len(accepted), 'results': results},
+            status=status.HTTP_201_CREATED if accepted else status.HTTP_400_BAD_REQUEST
+        )
+
+    @swagger_auto_schema(
+        responses={202: 'Order cancellation accepted'}
     )
     @action(detail=True, methods=['post'])
     def cancel(self, request, pk=None):
         order = self.get_object()
         if order.status not in [Order.COMPLETED, Order.CANCELLED]:
-            order.status = Order.CANCELLED
-            order.save()
-            return Response({'message': 'Order cancelled successfully'})
+            submit_cancel(order)
+            return Response(
+                {'message': 'Order cancellation accepted'},
+                status=status.HTTP_202_ACCEPTED
+            )
         return Response(
             {'error': 'Cannot cancel completed or already cancelled order'},
             status=status.HTTP_400_BAD_REQUEST
         )
 
+    @swagger_auto_schema(
+        request_body=openapi.Schema(
+            type=openapi.TYPE_OBJECT,
+            properties={
+                'product_id': openapi.Schema(
+                    type=openapi.TYPE_INTEGER,
+                    description="Only cancel orders for this product"
+                ),
+            }
+        ),
+        responses={202: 'Cancellation of open orders accepted'}
+    )
+    @action(detail=False, methods=['post'])
+    def cancel_all(self, request):
+        product_id = request.data.get('product_id')
+        if product_id is not None and not str(product_id).isdigit():
+            return Response(
+                {'error': 'product_id must be an integer'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        count = submit_cancel_all(request.user, product_id)
+        return Response(
+            {'message': 'Cancellation of open orders accepted', 'orders': count},
+            status=status.HTTP_202_ACCEPTED
+        )
+
+
+class TransactionViewSet(viewsets.ReadOnlyModelViewSet):
+    serializer_class = TransactionSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    pagination_class = ExecutedAtPagination
+
+    def _filtered(self, queryset):
+        product_id = self.request.query_params.get('product_id')
+        if product_id and product_id.isdigit():
+            queryset = queryset.filter(buy_order__product_id=product_id)
+        return queryset
+
+    def get_queryset(self):
+        user = self.request.user
+        return self._filtered(Transaction.objects.filter(Q(buyer=user) | Q(seller=user)))
+
+    def list(self, request, *args, **kwargs):
+        # One range scan of each side's index, merged by the paginator; an
+        # OR across both would be read through the global executed_at index.
+        sides = [
+            self._filtered(Transaction.objects.filter(buyer=request.user)),
+            self._filtered(Transaction.objects.filter(seller=request.user)),
+        ]
+        page = self.paginate_queryset(sides)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+
 
 class OrderBookViewSet(viewsets.ReadOnlyModelViewSet):
     serializer_class = OrderBookSerializer
@@ -127,7 +251,7 @@ class OrderBookViewSet(viewsets.ReadOnlyModelViewSet):
         return OrderBook.objects.all()
 
     @swagger_auto_schema(
-        responses={200: OrderBookSerializer(many=True)},
+        responses={200: 'Aggregated bid and ask price levels'},
         manual_parameters=[
             openapi.Parameter(
                 'product_id',
@@ -136,49 +260,241 @@ class OrderBookViewSet(viewsets.ReadOnlyModelViewSet):
                 type=openapi.TYPE_INTEGER,
                 required=True
             ),
+            openapi.Parameter(
+                'depth',
+                openapi.IN_QUERY,
+                description="Number of price levels per side (default 10)",
+                type=openapi.TYPE_INTEGER
+            ),
         ]
     )
     def list(self, request, *args, **kwargs):
         product_id = request.query_params.get('product_id')
-        if not product_id:
+        if not product_id or not product_id.isdigit():
             return Response(
                 {'error': 'product_id is required'},
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        buy_orders = Order.objects.filter(
-            product_id=product_id,
-            order_type='buy',
-            status__in=[Order.PENDING, Order.PARTIALLY_FILLED]
-        ).order_by('-price')[:10]
+        depth = request.query_params.get('depth', '10')
+        if not depth.isdigit() or int(depth) < 1:
+            return Response(
+                {'error': 'depth must be a positive integer'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        depth = min(int(depth), settings.TRADING_ORDER_BOOK_DEPTH)
+
+        return Response(get_snapshot(int(product_id), depth))
 
-        sell_orders = Order.objects.filter(
-            product_id=product_id,
-            order_type='sell',
-            status__in=[Order.PENDING, Order.PARTIALLY_FILLED]
-        ).order_by('price')[:10]
 
-        return Response({
-            'buy_orders': OrderSerializer(buy_orders, many=True).data,
-            'sell_orders': OrderSerializer(sell_orders, many=True).data,
-        })
+def parse_moment(value):
+    """ISO date or datetime from a query parameter, made timezone aware."""
+    moment = parse_datetime(value)
+    if moment is None:
+        day = parse_date(value)
+        if day is None:
+            raise ValueError(value)
+        moment = datetime.combine(day, time.min)
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+
+class CandleViewSet(viewsets.GenericViewSet):
+    serializer_class = CandleSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_queryset(self):
+        return Candle.objects.all()
+
+    @swagger_auto_schema(
+        responses={200: CandleSerializer(many=True)},
+        manual_parameters=[
+            openapi.Parameter(
+                'product_id',
+                openapi.IN_QUERY,
+                description="Filter by product ID",
+                type=openapi.TYPE_INTEGER,
+                required=True
+            ),
+            openapi.Parameter(
+                'interval',
+                openapi.IN_QUERY,
+                description="Bar interval",
+                type=openapi.TYPE_STRING,
+                enum=list(Candle.INTERVAL_SECONDS)
+            ),
+            openapi.Parameter(
+                'from',
+                openapi.IN_QUERY,
+                description="Start of range (ISO date or datetime, inclusive)",
+                type=openapi.TYPE_STRING
+            ),
+            openapi.Parameter(
+                'to',
+                openapi.IN_QUERY,
+                description="End of range (ISO date or datetime, exclusive)",
+                type=openapi.TYPE_STRING
+            ),
+        ]
+    )
+    def list(self, request, *args, **kwargs):
+        product_id = request.query_params.get('product_id')
+        if not product_id or not product_id.isdigit():
+            return Response(
+                {'error': 'product_id is required'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        interval = request.query_params.get('interval', Candle.ONE_MINUTE)
+        if interval not in Candle.INTERVAL_SECONDS:
+            return Response(
+                {'error': f"interval must be one of {', '.join(Candle.INTERVAL_SECONDS)}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        queryset = self.get_queryset().filter(product_id=product_id, interval=interval)
+        try:
+            if request.query_params.get('from'):
+                queryset = queryset.filter(
+                    start__gte=parse_moment(request.query_params['from'])
+                )
+            if request.query_params.get('to'):
+                queryset = queryset.filter(
+                    start__lt=parse_moment(request.query_params['to'])
+                )
+        except ValueError:
+            return Response(
+                {'error': 'from and to must be ISO dates or datetimes'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        # Most recent bars within the range, returned oldest first.
+        candles = reversed(queryset.order_by('-start')[:settings.TRADING_CANDLE_LIMIT])
+        serializer = self.get_serializer(candles, many=True)
+        return Response(serializer.data)
+
+
+class PositionViewSet(viewsets.ReadOnlyModelViewSet):
+    serializer_class = PositionSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_queryset(self):
+        # One indexed lookup on (user, product); closed positions with
+        # realized P&L stay listed.
+        queryset = Position.objects.filter(user=self.request.user).select_related('product')
+        product_id = self.request.query_params.get('product_id')
+        if product_id and product_id.isdigit():
+            queryset = queryset.filter(product_id=product_id)
+        return queryset
+
+
+class ExportViewSet(viewsets.ViewSet):
+    """
+    Bulk exports for analytics consumers, streamed straight from
+    server-side cursors over live and archived rows.
+    """
+    permission_classes = [permissions.IsAdminUser]
+
+    export_parameters = [
+        openapi.Parameter(
+            'from',
+            openapi.IN_QUERY,
+            description="Start of range (ISO date or datetime, inclusive)",
+            type=openapi.TYPE_STRING,
+            required=True
+        ),
+        openapi.Parameter(
+            'to',
+            openapi.IN_QUERY,
+            description="End of range (ISO date or datetime, exclusive)",
+            type=openapi.TYPE_STRING,
+            required=True
+        ),
+        openapi.Parameter(
+            'output',
+            openapi.IN_QUERY,
+            description="ndjson (gzipped, default) or arrow (Arrow IPC stream, needs pyarrow)",
+            type=openapi.TYPE_STRING,
+            enum=['ndjson', 'arrow']
+        ),
+    ]
+
+    def _export(self, request, export):
+        try:
+            start = parse_moment(request.query_params['from'])
+            end = parse_moment(request.query_params['to'])
+        except (KeyError, ValueError):
+            return Response(
+                {'error': 'from and to are required ISO dates or datetimes'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        output = request.query_params.get('output', 'ndjson')
+        if output == 'arrow' and pa is None:
+            return Response(
+                {'error': 'Arrow output needs pyarrow installed on the server'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if output not in ('ndjson', 'arrow'):
+            return Response(
+                {'error': 'output must be ndjson or arrow'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        rows = export.rows(start, end)
+        filename = f"{export.name}-{start:%Y%m%d}-{end:%Y%m%d}"
+        if output == 'arrow':
+            response = StreamingHttpResponse(
+                arrow_chunks(export, rows),
+                content_type='application/vnd.apache.arrow.stream'
+            )
+            filename += '.arrows'
+        else:
+            response = StreamingHttpResponse(
+                gzip_stream(ndjson_chunks(export, rows)),
+                content_type='application/gzip'
+            )
+            filename += '.ndjson.gz'
+        response['Content-Disposition'] = f'attachment; filename={filename}'
+        return response
+
+    @swagger_auto_schema(manual_parameters=export_parameters)
+    @action(detail=False, methods=['get'])
+    def transactions(self, request):
+        return self._export(request, EXPORTS['transactions'])
+
+    @swagger_auto_schema(manual_parameters=export_parameters)
+    @action(detail=False, methods=['get'])
+    def orders(self, request):
+        return self._export(request, EXPORTS['orders'])
 
 
 class NotificationViewSet(viewsets.ReadOnlyModelViewSet):
     serializer_class = NotificationSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = CreatedAtPagination
 
     def get_queryset(self):
         return Notification.objects.filter(user=self.request.user)
 
+    @swagger_auto_schema(
+        responses={200: 'Number of unread notifications'}
+    )
+    @action(detail=False, methods=['get'])
+    def unread_count(self, request):
+        return Response({'unread': get_unread_count(request.user.id)})
+
     @action(detail=True, methods=['post'])
     def mark_as_read(self, request, pk=None):
         notification = self.get_object()
-        notification.read = True
-        notification.save()
+        # Only a row that actually flips from unread moves the counter.
+        updated = self.get_queryset().filter(pk=notification.pk, read=False).update(read=True)
+        adjust_unread({request.user.id: -updated})
         return Response({'status': 'notification marked as read'})
 
     @action(detail=False, methods=['post'])
     def mark_all_as_read(self, request):
-        self.get_queryset().update(read=True)
+        updated = self.get_queryset().filter(read=False).update(read=True)
+        adjust_unread({request.user.id: -updated})
         return Response({'status': 'all notifications marked as read'})